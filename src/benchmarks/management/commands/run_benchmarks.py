@@ -0,0 +1,77 @@
+import os
+from datetime import datetime, timezone
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import (
+    override_settings, setup_databases, setup_test_environment, teardown_databases, teardown_test_environment
+)
+
+from benchmarks.runner import BenchmarkRunner, compare_results, environment, load_results, save_results
+from benchmarks.scenarios import SCENARIOS
+from dataset.generator import DatasetGenerator, SCALE_PROFILES
+
+BASELINE_PATH = os.path.normpath(os.path.join(os.path.dirname(__file__), '..', '..', 'baseline.json'))
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the API endpoints on generated datasets in a test database'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scales', nargs='+', choices=SCALE_PROFILES, default=['small'],
+                            help='Dataset profiles to benchmark on')
+        parser.add_argument('--scenarios', nargs='+', choices=[scenario.name for scenario in SCENARIOS],
+                            help='Benchmark only these scenarios')
+        parser.add_argument('--iterations', type=int, default=20, help='Measured requests per scenario')
+        parser.add_argument('--warmup', type=int, default=3, help='Not measured requests before the measured ones')
+        parser.add_argument('--seed', type=int, default=0, help='Seed of the generated datasets')
+        parser.add_argument('--output', default='benchmark_results.json', help='Where to write the JSON results')
+        parser.add_argument('--compare', nargs='?', const=BASELINE_PATH,
+                            help='Baseline to compare with, the committed benchmarks/baseline.json by default')
+        parser.add_argument('--latency-tolerance', type=float, default=0.25, help='Allowed p50 growth, 0.25 is 25%%')
+        parser.add_argument('--memory-tolerance', type=float, default=0.25, help='Allowed peak memory growth')
+        parser.add_argument('--keepdb', action='store_true', help='Keep the test database between runs')
+
+    def handle(self, *args, **options):
+        runner = BenchmarkRunner(
+            iterations=options['iterations'],
+            warmup=options['warmup'],
+            scenarios=options['scenarios'],
+            log=self.stdout.write,
+        )
+        results = {
+            'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'environment': environment(),
+            'iterations': options['iterations'],
+            'scales': {},
+        }
+
+        setup_test_environment()
+        old_config = setup_databases(verbosity=0, interactive=False, keepdb=options['keepdb'])
+        try:
+            # Logging slow queries and tracing allocations would add queries and time to the measured requests
+            with override_settings(SLOW_QUERY_THRESHOLD_MS=-1, ALLOCATION_PROFILE_VIEWS=[]):
+                for scale in options['scales']:
+                    call_command('flush', interactive=False, verbosity=0)
+                    # The flush starts the primary keys again, cached rows of the previous scale would be read
+                    cache.clear()
+                    generator = DatasetGenerator.from_profile(scale, seed=options['seed'])
+                    results['scales'][scale] = runner.run(generator, scale)
+        finally:
+            teardown_databases(old_config, verbosity=0, keepdb=options['keepdb'])
+            teardown_test_environment()
+
+        save_results(results, options['output'])
+        self.stdout.write(self.style.SUCCESS(f'Results are saved to {options["output"]}'))
+
+        if options['compare']:
+            regressions = compare_results(
+                results,
+                load_results(options['compare']),
+                latency_tolerance=options['latency_tolerance'],
+                memory_tolerance=options['memory_tolerance'],
+            )
+            if regressions:
+                raise CommandError('Regressions against the baseline:\n' + '\n'.join(regressions))
+            self.stdout.write(self.style.SUCCESS(f'No regressions against {options["compare"]}'))
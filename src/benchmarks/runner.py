@@ -0,0 +1,154 @@
+import json
+import math
+import platform
+import statistics
+import time
+import tracemalloc
+
+import django
+from django.db import connection
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from dataset.loader import DatasetLoader
+from monitoring.metrics import QueryCounter
+from .scenarios import BENCHMARK_PASSWORD, SCENARIOS, BenchmarkFixtures
+
+METRICS = ('p50_ms', 'p95_ms', 'p99_ms', 'mean_ms', 'queries', 'sql_ms', 'peak_memory_kb')
+
+
+def percentile(values, percent):
+    """
+    Nearest-rank percentile of a non empty list.
+    """
+    values = sorted(values)
+    return values[max(math.ceil(percent / 100 * len(values)) - 1, 0)]
+
+
+class BenchmarkRunner:
+    """
+    Loads a dataset and drives every scenario through the test client.
+
+    Latency, query count and SQL time are measured over `iterations` requests after `warmup` ones,
+    peak Python memory is measured by one more request under tracemalloc, which would slow down the timed ones.
+    """
+
+    def __init__(self, iterations=20, warmup=3, scenarios=None, log=print):
+        self.iterations = iterations
+        self.warmup = warmup
+        self.scenarios = [s for s in SCENARIOS if scenarios is None or s.name in scenarios]
+        self.log = log
+
+    def run(self, generator, name):
+        self.log(f'Loading {name} dataset {generator.counts}')
+        loader = DatasetLoader(
+            generator, checkpoint=f'benchmark-{name}', password=BENCHMARK_PASSWORD, log=lambda message: None
+        )
+        loader.run()
+        fixtures = BenchmarkFixtures()
+
+        results = {}
+        for scenario in self.scenarios:
+            results[scenario.name] = self.measure(scenario, fixtures)
+            self.log(f'{name} {scenario.name}: ' + ', '.join(f'{key}={results[scenario.name][key]}' for key in METRICS))
+        return results
+
+    def measure(self, scenario, fixtures):
+        client = APIClient()
+        if scenario.role is not None:
+            client.credentials(HTTP_AUTHORIZATION='Token ' + fixtures.tokens[scenario.role])
+
+        def prepare():
+            url = reverse(scenario.url_name, kwargs=scenario.resolve(scenario.url_kwargs, fixtures))
+            return url, scenario.resolve(scenario.query, fixtures), scenario.resolve(scenario.data, fixtures)
+
+        def request(url, query, data):
+            if scenario.method == 'get':
+                response = client.get(url, query)
+            else:
+                response = getattr(client, scenario.method)(url, data, format='json')
+            if response.streaming:
+                b''.join(response.streaming_content)
+            return response
+
+        for _ in range(self.warmup):
+            request(*prepare())
+
+        durations, queries, sql_seconds = [], [], []
+        for _ in range(self.iterations):
+            arguments = prepare()
+            timer = QueryCounter()
+            with connection.execute_wrapper(timer):
+                started = time.perf_counter()
+                response = request(*arguments)
+                durations.append(time.perf_counter() - started)
+            queries.append(timer.queries)
+            sql_seconds.append(timer.seconds)
+
+        arguments = prepare()
+        tracemalloc.start()
+        try:
+            request(*arguments)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+        return {
+            'status': response.status_code,
+            'p50_ms': round(percentile(durations, 50) * 1000, 3),
+            'p95_ms': round(percentile(durations, 95) * 1000, 3),
+            'p99_ms': round(percentile(durations, 99) * 1000, 3),
+            'mean_ms': round(statistics.mean(durations) * 1000, 3),
+            'queries': max(queries),
+            'sql_ms': round(statistics.median(sql_seconds) * 1000, 3),
+            'peak_memory_kb': round(peak / 1024, 1),
+        }
+
+
+def environment():
+    return {
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'database': connection.vendor,
+        'machine': platform.machine(),
+    }
+
+
+def compare_results(results, baseline, latency_tolerance=0.25, memory_tolerance=0.25, noise_ms=1.0, noise_kb=64):
+    """
+    Compare results with a baseline of the same format and return the list of regressions.
+
+    Any growth of the query count or change of the status is a regression. Median latency and peak memory are
+    allowed to grow by the given fraction plus noise_ms and noise_kb, the tail percentiles of a short run are
+    too noisy to fail on.
+    """
+    regressions = []
+    for scale, scenarios in results['scales'].items():
+        for name, current in scenarios.items():
+            expected = baseline.get('scales', {}).get(scale, {}).get(name)
+            if expected is None:
+                continue
+            label = f'{scale} {name}'
+
+            if current['status'] != expected['status']:
+                regressions.append(f'{label}: status {expected["status"]} -> {current["status"]}')
+            if current['queries'] > expected['queries']:
+                regressions.append(f'{label}: queries {expected["queries"]} -> {current["queries"]}')
+            if current['p50_ms'] > expected['p50_ms'] * (1 + latency_tolerance) + noise_ms:
+                regressions.append(f'{label}: p50 {expected["p50_ms"]}ms -> {current["p50_ms"]}ms')
+            if current['peak_memory_kb'] > expected['peak_memory_kb'] * (1 + memory_tolerance) + noise_kb:
+                regressions.append(
+                    f'{label}: peak memory {expected["peak_memory_kb"]}KB -> {current["peak_memory_kb"]}KB'
+                )
+    return regressions
+
+
+def load_results(path):
+    with open(path) as file:
+        return json.load(file)
+
+
+def save_results(results, path):
+    with open(path, 'w') as file:
+        json.dump(results, file, indent=2, sort_keys=True)
+        file.write('\n')
@@ -0,0 +1,162 @@
+import itertools
+
+from django.db.models import Count
+from rest_framework.authtoken.models import Token
+
+from companies.models import Company
+from posts.models import Post
+from users.models import User
+
+BENCHMARK_ADMIN_EMAIL = 'benchmark_admin@email.com'
+# Password of every user of the loaded dataset
+BENCHMARK_PASSWORD = 'benchmark'
+BULK_SIZE = 100
+# Users of one bulk import, each password is hashed so it is kept smaller than BULK_SIZE
+IMPORT_SIZE = 10
+
+
+class BenchmarkFixtures:
+    """
+    Users and objects the scenarios need, taken from the loaded dataset.
+
+    The client is the user with the most posts, so the client endpoints are measured on the heaviest owner.
+    new_post() and new_user() make the rows a delete scenario removes, one for every request.
+    """
+
+    def __init__(self):
+        self.client = User.objects.filter(user_type='client', company_id__isnull=False).annotate(
+            posts=Count('post')
+        ).order_by('-posts', 'id').first()
+        self.admin, _ = User.objects.get_or_create(
+            email=BENCHMARK_ADMIN_EMAIL, defaults={'user_type': 'admin', 'company_id': self.client.company_id}
+        )
+        self.tokens = {
+            'admin': Token.objects.get_or_create(user=self.admin)[0].key,
+            'client': Token.objects.get_or_create(user=self.client)[0].key,
+        }
+        self.company_id = self.client.company_id_id
+        self.post_ids = list(Post.objects.filter(user_id=self.client).order_by('id').values_list('id', flat=True)[:BULK_SIZE])
+        self.post = Post.objects.get(id=self.post_ids[0])
+        self.company_prefix = Company.objects.order_by('id').values_list('name', flat=True).first()[:2]
+        self._counter = itertools.count()
+
+    def next_id(self):
+        return next(self._counter)
+
+    def new_post(self):
+        return Post.objects.create(
+            title=f'benchmark_delete_{self.next_id()}', text='Benchmark text', topic='dev', user_id=self.client
+        )
+
+    def new_user(self):
+        return User.objects.create(
+            email=f'benchmark_delete_{self.next_id()}@email.com', company_id=self.client.company_id
+        )
+
+
+class Scenario:
+    """
+    One request to benchmark, url_kwargs, query and data may be callables taking BenchmarkFixtures.
+    They are resolved for every request before it is measured. A scenario without a role is sent anonymously.
+    """
+
+    def __init__(self, name, method, url_name, role='admin', url_kwargs=None, query=None, data=None):
+        self.name = name
+        self.method = method
+        self.url_name = url_name
+        self.role = role
+        self.url_kwargs = url_kwargs
+        self.query = query
+        self.data = data
+
+    def resolve(self, value, fixtures):
+        return value(fixtures) if callable(value) else value
+
+
+def bulk_update_data(fixtures):
+    return {'posts_to_update': [
+        {'id': post_id, 'text': f'Benchmark text {fixtures.next_id()}'} for post_id in fixtures.post_ids
+    ]}
+
+
+def bulk_create_data(fixtures):
+    batch = fixtures.next_id()
+    return {'posts': [
+        {'title': f'benchmark_{batch}_{index}', 'text': 'Benchmark text', 'topic': 'dev', 'user_id': fixtures.client.id}
+        for index in range(BULK_SIZE)
+    ]}
+
+
+def bulk_upsert_data(fixtures):
+    return {'posts': [
+        {'title': f'benchmark_upsert_{index}', 'text': f'Benchmark text {fixtures.next_id()}', 'topic': 'dev',
+         'user_id': fixtures.client.id}
+        for index in range(BULK_SIZE)
+    ]}
+
+
+def post_create_data(fixtures):
+    return {'title': f'benchmark_create_{fixtures.next_id()}', 'text': 'Benchmark text', 'topic': 'dev',
+            'user_id': fixtures.client.id}
+
+
+def user_create_data(fixtures):
+    return {'email': f'benchmark_create_{fixtures.next_id()}@email.com', 'password': BENCHMARK_PASSWORD,
+            'user_type': 'client', 'company_id': fixtures.company_id}
+
+
+def bulk_import_data(fixtures):
+    batch = fixtures.next_id()
+    return {'users': [
+        {'email': f'benchmark_import_{batch}_{index}@email.com', 'password': BENCHMARK_PASSWORD,
+         'company_id': fixtures.company_id}
+        for index in range(IMPORT_SIZE)
+    ]}
+
+
+def company_create_data(fixtures):
+    return {'name': f'benchmark_{fixtures.next_id()}', 'url': 'https://benchmark.com', 'address': 'address',
+            'date_created': '2021-01-01'}
+
+
+def login_data(fixtures):
+    return {'email': fixtures.client.email, 'password': BENCHMARK_PASSWORD}
+
+
+SCENARIOS = [
+    Scenario('posts_list', 'get', 'posts:all_posts'),
+    Scenario('posts_filter', 'get', 'posts:all_posts', query={'topic': 'news'}),
+    Scenario('posts_search', 'get', 'posts:all_posts', query={'q': 'market'}),
+    Scenario('posts_autocomplete', 'get', 'posts:autocomplete_posts', query={'prefix': 'ma'}),
+    Scenario('company_posts', 'get', 'posts:one_company_posts', role='client'),
+    Scenario('post_detail', 'get', 'posts:one_post', role='client', url_kwargs=lambda f: {'post_id': f.post.id}),
+    Scenario('post_create', 'post', 'posts:create_post', role='client', data=post_create_data),
+    Scenario('post_update', 'patch', 'posts:one_post', role='client', url_kwargs=lambda f: {'post_id': f.post.id},
+             data=lambda f: {'text': f'Benchmark text {f.next_id()}'}),
+    Scenario('post_delete', 'delete', 'posts:one_post', role='client',
+             url_kwargs=lambda f: {'post_id': f.new_post().id}),
+    Scenario('post_bulk_update', 'patch', 'posts:bulk_update_post', role='client', data=bulk_update_data),
+    Scenario('post_bulk_create', 'post', 'posts:bulk_create_post', role='client', data=bulk_create_data),
+    Scenario('post_bulk_upsert', 'post', 'posts:bulk_upsert_post', role='client', data=bulk_upsert_data),
+    Scenario('users_list', 'get', 'users:all_users'),
+    Scenario('user_detail', 'get', 'users:one_user', url_kwargs=lambda f: {'user_id': f.client.id}),
+    Scenario('user_create', 'post', 'users:create_user', data=user_create_data),
+    Scenario('user_update', 'patch', 'users:one_user', url_kwargs=lambda f: {'user_id': f.client.id},
+             data=lambda f: {'first_name': f'Name {f.next_id()}'}),
+    Scenario('user_delete', 'delete', 'users:one_user', url_kwargs=lambda f: {'user_id': f.new_user().id}),
+    Scenario('users_bulk_import', 'post', 'users:bulk_import_users', data=bulk_import_data),
+    Scenario('account', 'get', 'users:account'),
+    Scenario('account_update', 'patch', 'users:account', data=lambda f: {'last_name': f'Name {f.next_id()}'}),
+    Scenario('login', 'post', 'users:login', role=None, data=login_data),
+    Scenario('companies_partial', 'get', 'companies:all_companies', url_kwargs={'view': 'partial'}),
+    Scenario('companies_full', 'get', 'companies:all_companies', url_kwargs={'view': 'full'}),
+    Scenario('companies_full_stream', 'get', 'companies:all_companies', url_kwargs={'view': 'full'},
+             query={'stream': 'true'}),
+    Scenario('company_detail', 'get', 'companies:one_company', url_kwargs=lambda f: {'company_id': f.company_id}),
+    Scenario('company_create', 'post', 'companies:create_company', data=company_create_data),
+    Scenario('company_update', 'patch', 'companies:one_company', url_kwargs=lambda f: {'company_id': f.company_id},
+             data=lambda f: {'address': f'Address {f.next_id()}'}),
+    Scenario('client_company', 'get', 'companies:client_company', role='client'),
+    Scenario('companies_autocomplete', 'get', 'companies:autocomplete_companies',
+             query=lambda f: {'prefix': f.company_prefix}),
+]
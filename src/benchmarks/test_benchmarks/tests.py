@@ -0,0 +1,46 @@
+from django.test import TestCase
+
+from benchmarks.runner import BenchmarkRunner, compare_results, percentile, METRICS
+from benchmarks.scenarios import SCENARIOS
+from dataset.generator import DatasetGenerator
+
+
+class BenchmarkRunnerTestCase(TestCase):
+
+    def test_run_every_scenario(self):
+        runner = BenchmarkRunner(iterations=2, warmup=0, log=lambda message: None)
+
+        results = runner.run(DatasetGenerator(companies=2, users=10, posts=300), 'test')
+
+        self.assertEqual(set(results), {scenario.name for scenario in SCENARIOS})
+        for name, result in results.items():
+            self.assertIn(result['status'], (200, 201), name)
+            self.assertTrue(set(METRICS) <= set(result))
+            if name != 'account':
+                # The user of a cached token is the account itself, it is served without queries
+                self.assertGreater(result['queries'], 0, name)
+            self.assertLessEqual(result['p50_ms'], result['p99_ms'])
+
+    def test_percentile(self):
+        values = list(range(1, 101))
+
+        self.assertEqual(percentile(values, 50), 50)
+        self.assertEqual(percentile(values, 95), 95)
+        self.assertEqual(percentile(values, 99), 99)
+        self.assertEqual(percentile([7], 99), 7)
+
+    def test_compare_results(self):
+        baseline = {'scales': {'small': {
+            'posts_list': {'status': 200, 'p50_ms': 10.0, 'queries': 2, 'peak_memory_kb': 400.0},
+            'users_list': {'status': 200, 'p50_ms': 10.0, 'queries': 2, 'peak_memory_kb': 400.0},
+        }}}
+        results = {'scales': {'small': {
+            'posts_list': {'status': 200, 'p50_ms': 11.0, 'queries': 2, 'peak_memory_kb': 420.0},
+            'users_list': {'status': 500, 'p50_ms': 20.0, 'queries': 3, 'peak_memory_kb': 900.0},
+            'account': {'status': 200, 'p50_ms': 1.0, 'queries': 2, 'peak_memory_kb': 30.0},
+        }}}
+
+        regressions = compare_results(results, baseline)
+
+        self.assertEqual(len(regressions), 4)
+        self.assertTrue(all(regression.startswith('small users_list') for regression in regressions))
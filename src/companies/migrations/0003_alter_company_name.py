@@ -0,0 +1,18 @@
+# Generated by Django 3.2.9 on 2026-10-18 05:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('companies', '0002_auto_20211109_1844'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='company',
+            name='name',
+            field=models.CharField(db_index=True, max_length=50, verbose_name='Company Name'),
+        ),
+    ]
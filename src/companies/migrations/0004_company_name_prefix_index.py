@@ -0,0 +1,18 @@
+# Generated by Django 3.2.9 on 2026-10-18 06:10
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('companies', '0003_alter_company_name'),
+    ]
+
+    operations = [
+        # Serves `name__istartswith`, which Django renders as UPPER("name"::text) LIKE UPPER('prefix%')
+        migrations.RunSQL(
+            'CREATE INDEX companies_company_name_upper_like ON companies_company (UPPER(name::text) text_pattern_ops);',
+            'DROP INDEX IF EXISTS companies_company_name_upper_like;',
+        ),
+    ]
@@ -2,7 +2,7 @@ from django.db import models
 
 
 class Company(models.Model):
-    name = models.CharField('Company Name', max_length=50, null=False, blank=False)
+    name = models.CharField('Company Name', max_length=50, null=False, blank=False, db_index=True)
     url = models.URLField('Link on company page', null=False, blank=True)
     address = models.CharField('Company Address', max_length=200, null=False, blank=True)
     date_created = models.DateField('Foundation Date', null=False, blank=False)
@@ -1,5 +1,9 @@
 import logging
+from collections import defaultdict
+from itertools import islice
 
+from django.conf import settings
+from rest_framework.renderers import JSONRenderer
 from rest_framework.serializers import ModelSerializer
 from rest_framework import serializers
 
@@ -17,26 +21,62 @@ class CompanySerializer(ModelSerializer):
 
     @staticmethod
     def generate_full_result(companies):
+        """
+        Attach employees and their posts to already serialized companies.
+
+        Employees of all companies and all of their posts are loaded with one query each and grouped
+        in memory by foreign key, so the query count does not depend on the number of rows.
+        """
+        company_ids = [company.get('id') for company in companies]
+
+        users = User.objects.filter(company_id__in=company_ids).order_by('id')
+        users_by_company = defaultdict(list)
+        for user in UserSerializer(users, many=True).data:
+            users_by_company[user.get('company_id')].append(user)
+
+        posts = Post.objects.filter(user_id__company_id__in=company_ids).order_by('id')
+        posts_by_user = defaultdict(list)
+        for post in PostSerializer(posts, many=True).data:
+            posts_by_user[post.get('user_id')].append(post)
+
         result = []
         for company in companies:
             company_data = {}
             company_data.update(company)
 
-            company_id = company.get('id')
-            users = User.objects.select_related('company_id').filter(company_id=company_id)
-            user_serializer = UserSerializer(users, many=True)
+            employees = users_by_company[company.get('id')]
+            for user in employees:
+                user['posts'] = posts_by_user[user.get('id')]
 
-            for user in user_serializer.data:
-                user_id = user.get('id')
-                posts = Post.objects.select_related('user_id').filter(user_id=user_id)
-                post_serializer = PostSerializer(posts, many=True)
-                user['posts'] = post_serializer.data
-
-            company_data['employees'] = user_serializer.data
+            company_data['employees'] = employees
 
             result.append(company_data)
         return result
 
+    @staticmethod
+    def stream_full_result(companies, chunk_size=None):
+        """
+        Yield the same JSON document as generate_full_result rendered by JSONRenderer, piece by piece.
+
+        Companies are read through a server-side cursor and expanded chunk_size (COMPANIES_STREAM_CHUNK_SIZE)
+        companies at a time with the two queries of generate_full_result. The peak memory is bounded by the
+        subtrees (employees and their posts) of one chunk of companies, not of one company: a smaller chunk
+        holds less at once and needs two more queries for every chunk.
+        """
+        chunk_size = chunk_size or settings.COMPANIES_STREAM_CHUNK_SIZE
+        renderer = JSONRenderer()
+        companies = companies.iterator(chunk_size=chunk_size)
+        separator = b''
+        yield b'['
+        while True:
+            chunk = CompanySerializer(list(islice(companies, chunk_size)), many=True).data
+            if not chunk:
+                break
+            for full_company in CompanySerializer.generate_full_result(chunk):
+                yield separator + renderer.render(full_company)
+                separator = b','
+        yield b']'
+
 
 class CompanyUpdateSerializer(ModelSerializer):
     name = serializers.CharField(required=False)
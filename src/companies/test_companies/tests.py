@@ -1,14 +1,21 @@
+import json
+
+from django.test import override_settings
 from django.urls import reverse
 from rest_framework import status
+from rest_framework.renderers import JSONRenderer
 from rest_framework.test import APITestCase, APIClient
 
 from companies.serializers import CompanySerializer
+from posts.models import Post
+from posts.serializers import PostSerializer
 from users.models import User
 from companies.models import Company
 from users.tests_users.conftest import init_login_super_user, init_login_simple_user
+from test_task.query_budget import QueryBudgetMixin
 
 
-class CompanyAPITestCase(APITestCase):
+class CompanyAPITestCase(QueryBudgetMixin, APITestCase):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.api_client = APIClient()
@@ -65,18 +72,18 @@ class CompanyAPITestCase(APITestCase):
 
     @init_login_super_user
     def test_companies_lst_partial(self):
-        companies = Company.objects.all()
+        companies = Company.objects.order_by('id')
         serializer = CompanySerializer(companies, many=True)
         url = reverse('companies:all_companies', args=('partial', ))
 
         response = self.client.get(url)
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(response.data, serializer.data)
+        self.assertEqual(response.data['results'], serializer.data)
 
     @init_login_super_user
     def test_companies_lst_full(self):
-        companies = Company.objects.all()
+        companies = Company.objects.order_by('id')
         serializer = CompanySerializer(companies, many=True)
         expected_response = CompanySerializer.generate_full_result(serializer.data)
         url = reverse('companies:all_companies', args=('full', ))
@@ -84,7 +91,106 @@ class CompanyAPITestCase(APITestCase):
         response = self.client.get(url)
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(response.data, expected_response)
+        self.assertEqual(response.data['results'], expected_response)
+
+    @init_login_super_user
+    def test_companies_lst_full_stream(self):
+        Company.objects.create(name='Компанія 2', date_created='1999-01-01')
+        companies = CompanySerializer(Company.objects.order_by('id'), many=True).data
+        expected_response = CompanySerializer.generate_full_result(companies)
+        url = reverse('companies:all_companies', args=('full', ))
+
+        response = self.client.get(url, {'stream': 'true'})
+        content = b''.join(response.streaming_content)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertEqual(json.loads(content), json.loads(json.dumps(expected_response)))
+        self.assertEqual(content, JSONRenderer().render(expected_response))
+
+    @override_settings(COMPANIES_STREAM_CHUNK_SIZE=1)
+    def test_stream_full_result_chunks(self):
+        Company.objects.create(name='name_2', date_created='1999-01-01')
+        companies = Company.objects.order_by('id')
+        expected_response = CompanySerializer.generate_full_result(CompanySerializer(companies, many=True).data)
+
+        with self.assertNumQueries(5):
+            content = b''.join(CompanySerializer.stream_full_result(companies))
+
+        self.assertEqual(content, JSONRenderer().render(expected_response))
+
+    def test_generate_full_result_shape(self):
+        post = Post.objects.create(title='Title', user_id=self.simple_user, text='Text', topic='news')
+        serializer = CompanySerializer(Company.objects.filter(id=self.company_1.id), many=True)
+
+        result = CompanySerializer.generate_full_result(serializer.data)
+
+        employees = result[0]['employees']
+        self.assertEqual(result[0]['id'], self.company_1.id)
+        self.assertEqual([user['id'] for user in employees], [self.super_admin.id, self.simple_user.id])
+        self.assertEqual(employees[0]['posts'], [])
+        self.assertEqual(employees[1]['posts'], [PostSerializer(post).data])
+
+    def test_generate_full_result_constant_queries(self):
+        companies = CompanySerializer(Company.objects.all(), many=True).data
+        with self.assertNumQueries(2):
+            CompanySerializer.generate_full_result(companies)
+
+        for company_index in range(5):
+            company = Company.objects.create(name=f'company_{company_index}', date_created='2001-10-21')
+            for user_index in range(5):
+                user = User.objects.create(email=f'user_{company_index}_{user_index}@email.com', company_id=company)
+                Post.objects.bulk_create(
+                    Post(title=f'title_{company_index}_{user_index}_{post_index}', user_id=user, text='text')
+                    for post_index in range(3)
+                )
+
+        companies = CompanySerializer(Company.objects.all(), many=True).data
+        with self.assertNumQueries(2):
+            CompanySerializer.generate_full_result(companies)
+
+    def add_companies_with_posts(self, prefix):
+        for company_index in range(3):
+            company = Company.objects.create(name=f'{prefix}_{company_index}', date_created='2001-10-21')
+            for user_index in range(3):
+                user = User.objects.create(email=f'{prefix}_{company_index}_{user_index}@email.com', company_id=company)
+                Post.objects.bulk_create(
+                    Post(title=f'{prefix}_{company_index}_{user_index}_{post_index}', user_id=user, text='text')
+                    for post_index in range(3)
+                )
+
+    @init_login_super_user
+    def test_companies_lst_constant_queries(self):
+        for view, query in (('partial', {}), ('full', {}), ('full', {'stream': 'true'})):
+            with self.subTest(view=view, query=query):
+                url = reverse('companies:all_companies', args=(view, ))
+                prefix = f'{view}_{len(query)}'
+
+                self.assertQueriesConstant(lambda: self.client.get(url, query), lambda: self.add_companies_with_posts(prefix))
+
+    @init_login_super_user
+    def test_companies_lst_cursor_pagination(self):
+        company_2 = Company.objects.create(name='name_2', date_created='1999-01-01')
+        url = reverse('companies:all_companies', args=('partial', ))
+
+        response = self.client.get(url, {'page_size': 1})
+        next_response = self.client.get(response.data['next'])
+
+        self.assertEqual([company['id'] for company in response.data['results']], [self.company_1.id])
+        self.assertEqual([company['id'] for company in next_response.data['results']], [company_2.id])
+        self.assertIsNone(next_response.data['next'])
+
+    @init_login_super_user
+    def test_autocomplete_companies(self):
+        Company.objects.create(name='Other', date_created='1999-01-01')
+        url = reverse('companies:autocomplete_companies')
+
+        response = self.client.get(url, {'prefix': 'NAME'})
+        empty_response = self.client.get(url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['results'], [{'id': self.company_1.id, 'name': self.company_1.name}])
+        self.assertEqual(empty_response.data['results'], [])
 
     @init_login_super_user
     def test_negative_get_company_wrong_id(self):
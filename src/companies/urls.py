@@ -1,6 +1,6 @@
 from django.contrib import admin
 from django.urls import path
-from .views import CompaniesView, CompanyView, CompanyCreateView, ClientCompanyView
+from .views import CompaniesView, CompanyView, CompanyCreateView, ClientCompanyView, CompanyAutocompleteView
 
 app_name = 'companies'
 
@@ -9,4 +9,5 @@ urlpatterns = [
     path('company/<int:company_id>', CompanyView.as_view(), name='one_company'),
     path('company/create', CompanyCreateView.as_view(), name='create_company'),
     path('my_company/', ClientCompanyView.as_view(), name='client_company'),
+    path('autocomplete/', CompanyAutocompleteView.as_view(), name='autocomplete_companies'),
 ]
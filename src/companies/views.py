@@ -1,25 +1,32 @@
+from django.http import StreamingHttpResponse
 from drf_yasg import openapi
 from drf_yasg.utils import swagger_auto_schema
-from rest_framework.authentication import TokenAuthentication
 from rest_framework.permissions import IsAuthenticated
-from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 
+from monitoring.views import TimedAPIView
+from test_task.autocomplete import PREFIX_PARAM, LIMIT_PARAM, get_autocomplete_limit
+from test_task.identity_map import get_object
+from test_task.pagination import IdCursorPagination, CURSOR_PARAM, PAGE_SIZE_PARAM
 from users.custom_permissions import IsAdminOrSuperAdmin, IsEmployeeOrAccessDenied
 from .models import Company
 from .serializers import CompanySerializer, CompanyUpdateSerializer
 
+STREAM_PARAM = openapi.Parameter('stream', openapi.IN_QUERY, type=openapi.TYPE_BOOLEAN)
 
-class CompaniesView(APIView):
-    authentication_classes = [TokenAuthentication]
+
+class CompaniesView(TimedAPIView):
     permission_classes = [IsAuthenticated, IsAdminOrSuperAdmin]
+    pagination_class = IdCursorPagination
 
     @swagger_auto_schema(
         operation_summary='List of all companies',
-        operation_description='Return list of all companies if view=partial or list of all companies with all '
-                              'users in this company and all posts of this users',
+        operation_description='Return one page of companies if view=partial or one page of companies with all '
+                              'users in this company and all posts of this users. With view=full and stream=true '
+                              'all companies are streamed as one JSON list without pagination',
         operation_id='All Companies',
+        manual_parameters=[CURSOR_PARAM, PAGE_SIZE_PARAM, STREAM_PARAM],
         responses={
             200: CompanySerializer(many=True),
             400: openapi.Response(description='Error', examples={
@@ -35,18 +42,25 @@ class CompaniesView(APIView):
         if view not in ['partial', 'full']:
             response = {'error': f'View option must be partial or full not {view}'}
             return Response(response, status=status.HTTP_400_BAD_REQUEST)
-        elif view == 'partial':
-            serializer = CompanySerializer(companies, many=True)
+
+        if view == 'full' and request.GET.get('stream', 'false') == 'true':
+            content = CompanySerializer.stream_full_result(companies.order_by('id'))
+            return StreamingHttpResponse(content, content_type='application/json', status=status.HTTP_200_OK)
+
+        paginator = self.pagination_class()
+        page = paginator.paginate_queryset(companies, request, view=self)
+
+        if view == 'partial':
+            serializer = CompanySerializer(page, many=True)
             response = serializer.data
         else:
-            serializer = CompanySerializer(companies, many=True)
+            serializer = CompanySerializer(page, many=True)
             response = CompanySerializer.generate_full_result(serializer.data)
 
-        return Response(response, status=status.HTTP_200_OK)
+        return paginator.get_paginated_response(response)
 
 
-class CompanyView(APIView):
-    authentication_classes = [TokenAuthentication]
+class CompanyView(TimedAPIView):
     permission_classes = [IsAuthenticated, IsAdminOrSuperAdmin]
 
     @swagger_auto_schema(
@@ -64,7 +78,7 @@ class CompanyView(APIView):
     )
     def get(self, request, company_id):
         try:
-            company = Company.objects.get(id=company_id)
+            company = get_object(Company, company_id, cached=True)
         except Company.DoesNotExist:
             response = {'error': f'Company with id={company_id} does not exist'}
             return Response(response, status=status.HTTP_404_NOT_FOUND)
@@ -113,8 +127,7 @@ class CompanyView(APIView):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
-class CompanyCreateView(APIView):
-    authentication_classes = [TokenAuthentication]
+class CompanyCreateView(TimedAPIView):
     permission_classes = [IsAuthenticated, IsAdminOrSuperAdmin]
 
     @swagger_auto_schema(
@@ -142,8 +155,7 @@ class CompanyCreateView(APIView):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
-class ClientCompanyView(APIView):
-    authentication_classes = [TokenAuthentication]
+class ClientCompanyView(TimedAPIView):
     permission_classes = [IsAuthenticated, IsEmployeeOrAccessDenied]
 
     @swagger_auto_schema(
@@ -155,6 +167,33 @@ class ClientCompanyView(APIView):
         }
     )
     def get(self, request):
-        company = Company.objects.get(id=request.user.company_id.id)
+        company = get_object(Company, request.user.company_id_id, cached=True)
         serializer = CompanySerializer(company)
         return Response(serializer.data, status=status.HTTP_200_OK)
+
+
+class CompanyAutocompleteView(TimedAPIView):
+    permission_classes = [IsAuthenticated, IsAdminOrSuperAdmin]
+
+    @swagger_auto_schema(
+        operation_summary='Autocomplete company names',
+        operation_description='Return up to limit companies whose name starts with prefix, case insensitive',
+        operation_id='Autocomplete Companies',
+        manual_parameters=[PREFIX_PARAM, LIMIT_PARAM],
+        responses={
+            200: openapi.Response(description='Success', examples={
+                "application/json": {
+                    "results": [{"id": 1, "name": "Company Name"}],
+                }
+            }),
+        }
+    )
+    def get(self, request):
+        prefix = request.GET.get('prefix', '')
+        if not prefix:
+            return Response({'results': []}, status=status.HTTP_200_OK)
+
+        companies = Company.objects.filter(name__istartswith=prefix).order_by('name').values('id', 'name')
+        companies = companies[:get_autocomplete_limit(request)]
+
+        return Response({'results': list(companies)}, status=status.HTTP_200_OK)
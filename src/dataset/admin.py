@@ -0,0 +1,7 @@
+from django.contrib import admin
+from .models import DatasetCheckpoint
+
+
+@admin.register(DatasetCheckpoint)
+class DatasetCheckpointAdmin(admin.ModelAdmin):
+    list_display = ('name', 'updated', 'id')
@@ -0,0 +1,8 @@
+from django.apps import AppConfig
+
+
+class DatasetConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'dataset'
+    verbose_name = 'Dataset'
+    verbose_name_plural = 'Datasets'
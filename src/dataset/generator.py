@@ -0,0 +1,203 @@
+import numpy as np
+
+TOPICS = np.array(['test', 'new', 'hot', 'news', 'people', 'dev', 'music', 'games'])
+TOPIC_WEIGHTS = np.array([0.05, 0.2, 0.15, 0.2, 0.1, 0.1, 0.1, 0.1])
+
+FIRST_NAMES = np.array([
+    'Adam', 'Alex', 'Alice', 'Amelia', 'Anna', 'Anton', 'Ben', 'Bohdan', 'Carla', 'Chris', 'Daniel', 'Daria',
+    'David', 'Denys', 'Elena', 'Emily', 'Emma', 'Eva', 'Fedir', 'George', 'Grace', 'Hanna', 'Ihor', 'Iryna',
+    'Jack', 'James', 'Julia', 'Kate', 'Kyrylo', 'Laura', 'Leo', 'Liam', 'Lucy', 'Maria', 'Mark', 'Max', 'Mia',
+    'Mykola', 'Nadia', 'Nick', 'Noah', 'Oleh', 'Olga', 'Oliver', 'Olivia', 'Paul', 'Petro', 'Roman', 'Sara',
+    'Sofia', 'Taras', 'Tom', 'Vira', 'Viktor', 'Yana', 'Yuriy', 'Zoe',
+])
+LAST_NAMES = np.array([
+    'Anderson', 'Bondarenko', 'Brown', 'Clark', 'Davis', 'Evans', 'Garcia', 'Hall', 'Harris', 'Hill', 'Hughes',
+    'Johnson', 'Jones', 'Kovalenko', 'Kravchenko', 'Lee', 'Lewis', 'Lysenko', 'Martin', 'Melnyk', 'Miller',
+    'Moore', 'Morris', 'Oliynyk', 'Parker', 'Petrenko', 'Robinson', 'Savchenko', 'Scott', 'Shevchenko', 'Smith',
+    'Taylor', 'Thomas', 'Thompson', 'Tkachenko', 'Walker', 'White', 'Williams', 'Wilson', 'Wright', 'Young',
+])
+DOMAINS = np.array(['gmail.com', 'yahoo.com', 'hotmail.com', 'ukr.net', 'outlook.com', 'i.ua'])
+DOMAIN_WEIGHTS = np.array([0.45, 0.1, 0.1, 0.2, 0.1, 0.05])
+PHONE_OPERATORS = np.array(['50', '63', '66', '67', '68', '73', '93', '95', '96', '97', '98', '99'])
+COMPANY_WORDS = np.array([
+    'Alpha', 'Atlas', 'Blue', 'Bright', 'Cloud', 'Core', 'Data', 'Delta', 'Digital', 'Eagle', 'First', 'Global',
+    'Green', 'Hyper', 'Iron', 'Kyiv', 'Lion', 'Matrix', 'Meta', 'Net', 'North', 'Nova', 'Omega', 'Pixel', 'Prime',
+    'Quantum', 'Red', 'Silver', 'Smart', 'Solar', 'Star', 'Stone', 'Swift', 'Tech', 'Unity', 'Vector', 'West',
+])
+COMPANY_SUFFIXES = np.array(['LLC', 'Inc', 'Group', 'Labs', 'Systems', 'Solutions', 'Soft', 'Partners'])
+STREETS = np.array([
+    'Main St', 'Oak Ave', 'Park Rd', 'Shevchenko St', 'Khreshchatyk St', 'Lake Dr', 'Hill St', 'River Rd',
+    'Sadova St', 'Market St', 'Peremohy Ave', 'Central Ave',
+])
+CITIES = np.array(['Kyiv', 'Lviv', 'Kharkiv', 'Odesa', 'Dnipro', 'London', 'Berlin', 'Warsaw', 'New York'])
+WORDS = np.array([
+    'about', 'account', 'after', 'again', 'answer', 'area', 'back', 'best', 'build', 'business', 'call', 'case',
+    'change', 'city', 'close', 'code', 'company', 'data', 'day', 'design', 'early', 'every', 'fact', 'family',
+    'feature', 'find', 'first', 'game', 'good', 'great', 'group', 'hand', 'help', 'home', 'idea', 'important',
+    'issue', 'keep', 'kind', 'large', 'last', 'later', 'learn', 'level', 'life', 'line', 'little', 'local',
+    'long', 'make', 'market', 'money', 'month', 'music', 'name', 'need', 'news', 'night', 'number', 'office',
+    'open', 'order', 'part', 'people', 'place', 'plan', 'point', 'power', 'problem', 'program', 'question',
+    'quick', 'real', 'release', 'report', 'result', 'right', 'room', 'school', 'service', 'side', 'small',
+    'start', 'state', 'story', 'study', 'system', 'team', 'test', 'thing', 'time', 'today', 'update', 'user',
+    'version', 'water', 'week', 'work', 'world', 'year',
+])
+
+SCALE_PROFILES = {
+    'small': {'companies': 10, 'users': 200, 'posts': 6000},
+    'medium': {'companies': 100, 'users': 20000, 'posts': 1000000},
+    'xl': {'companies': 1000, 'users': 1000000, 'posts': 10000000},
+}
+
+STAGE_SEEDS = {'companies': 1, 'users': 2, 'posts': 3}
+BLOCK_SIZE = 10000
+
+
+def zipf_cdf(size, skew, rng):
+    """
+    Cumulative weights of `size` items with Zipf-like popularity 1 / rank ** skew, ranks are shuffled by rng
+    so the most popular items are not simply the first ones.
+    """
+    ranks = rng.permutation(size) + 1
+    cdf = np.cumsum(1.0 / ranks ** skew)
+    return cdf / cdf[-1]
+
+
+def sample_cdf(cdf, rng, size):
+    return np.minimum(np.searchsorted(cdf, rng.random(size), side='right'), len(cdf) - 1)
+
+
+class DatasetGenerator:
+    """
+    Synthetic companies, users and posts sampled with NumPy, a block of BLOCK_SIZE rows at a time.
+
+    Every block is seeded by (seed, stage, block number), so any range of rows can be generated on its own,
+    only the current block is kept in memory and a resumed load produces exactly the rows an uninterrupted one would.
+    Users point to companies and posts point to users by their index in the dataset, both picked with Zipf-like
+    skew: a few companies have most of the users and a few users write most of the posts.
+    """
+
+    def __init__(self, companies, users, posts, seed=0, company_skew=1.0, user_skew=0.8):
+        self.counts = {
+            'companies': companies,
+            'users': users,
+            'posts': posts,
+        }
+        self.seed = seed
+        self.company_skew = company_skew
+        self.user_skew = user_skew
+        self._cdf = {}
+        self._block = None
+
+    @classmethod
+    def from_profile(cls, profile, seed=0, **counts):
+        """
+        Generator of a named scale profile, counts given as keyword arguments override the profile ones.
+        """
+        if profile not in SCALE_PROFILES:
+            raise ValueError(f'Profile must be one of {", ".join(SCALE_PROFILES)} not {profile}')
+        params = dict(SCALE_PROFILES[profile], **{name: value for name, value in counts.items() if value is not None})
+        return cls(seed=seed, **params)
+
+    def params(self):
+        return {
+            'generator': 'numpy',
+            'seed': self.seed,
+            'counts': self.counts,
+            'skew': {'companies': self.company_skew, 'users': self.user_skew},
+        }
+
+    def companies(self, start, stop):
+        return self._rows('companies', start, stop)
+
+    def users(self, start, stop):
+        return self._rows('users', start, stop)
+
+    def posts(self, start, stop):
+        return self._rows('posts', start, stop)
+
+    def _rows(self, stage, start, stop):
+        stop = min(stop, self.counts[stage])
+        if start >= stop:
+            return
+        for block in range(start // BLOCK_SIZE, (stop - 1) // BLOCK_SIZE + 1):
+            block_start = block * BLOCK_SIZE
+            rows = self._get_block(stage, block)
+            for row in rows[max(start - block_start, 0):stop - block_start]:
+                # Loaders change rows in place, every caller gets its own copies
+                yield dict(row)
+
+    def _get_block(self, stage, block):
+        if self._block is None or self._block[:2] != (stage, block):
+            block_start = block * BLOCK_SIZE
+            block_stop = min(block_start + BLOCK_SIZE, self.counts[stage])
+            rng = np.random.default_rng([self.seed, STAGE_SEEDS[stage], block])
+            rows = getattr(self, f'_make_{stage}')(rng, block_start, block_stop)
+            self._block = (stage, block, rows)
+        return self._block[2]
+
+    def _get_cdf(self, stage, skew):
+        if stage not in self._cdf:
+            rng = np.random.default_rng([self.seed, 0, STAGE_SEEDS[stage]])
+            self._cdf[stage] = zipf_cdf(self.counts[stage], skew, rng)
+        return self._cdf[stage]
+
+    def _make_companies(self, rng, start, stop):
+        size = stop - start
+        first = COMPANY_WORDS[rng.integers(len(COMPANY_WORDS), size=size)].tolist()
+        second = COMPANY_WORDS[rng.integers(len(COMPANY_WORDS), size=size)].tolist()
+        suffixes = COMPANY_SUFFIXES[rng.integers(len(COMPANY_SUFFIXES), size=size)].tolist()
+        houses = rng.integers(1, 200, size=size).tolist()
+        streets = STREETS[rng.integers(len(STREETS), size=size)].tolist()
+        cities = CITIES[rng.integers(len(CITIES), size=size)].tolist()
+        dates = np.datetime_as_string(np.datetime64('1990-01-01') + rng.integers(0, 11000, size=size)).tolist()
+
+        return [
+            {
+                'name': f'{first[i]} {second[i]} {suffixes[i]}',
+                'url': f'https://{first[i].lower()}-{second[i].lower()}-{start + i}.com/',
+                'address': f'{houses[i]} {streets[i]}, {cities[i]}',
+                'date_created': dates[i],
+            }
+            for i in range(size)
+        ]
+
+    def _make_users(self, rng, start, stop):
+        size = stop - start
+        first_names = FIRST_NAMES[rng.integers(len(FIRST_NAMES), size=size)].tolist()
+        last_names = LAST_NAMES[rng.integers(len(LAST_NAMES), size=size)].tolist()
+        domains = DOMAINS[sample_cdf(np.cumsum(DOMAIN_WEIGHTS), rng, size)].tolist()
+        passwords = rng.integers(0, 2 ** 63, size=size).tolist()
+        operators = PHONE_OPERATORS[rng.integers(len(PHONE_OPERATORS), size=size)].tolist()
+        numbers = rng.integers(0, 10 ** 7, size=size).tolist()
+        companies = sample_cdf(self._get_cdf('companies', self.company_skew), rng, size).tolist()
+
+        return [
+            {
+                'email': f'{first_names[i]}.{last_names[i]}.{start + i}@{domains[i]}'.lower(),
+                'password': f'{passwords[i]:016x}',
+                'first_name': first_names[i],
+                'last_name': last_names[i],
+                'user_type': 'client',
+                'telephone_number': f'+380{operators[i]}{numbers[i]:07d}',
+                'company_index': companies[i],
+            }
+            for i in range(size)
+        ]
+
+    def _make_posts(self, rng, start, stop):
+        size = stop - start
+        title_words = WORDS[rng.integers(len(WORDS), size=size)].tolist()
+        text_lengths = rng.integers(4, 12, size=size).tolist()
+        text_words = WORDS[rng.integers(len(WORDS), size=(size, 11))].tolist()
+        topics = TOPICS[sample_cdf(np.cumsum(TOPIC_WEIGHTS), rng, size)].tolist()
+        users = sample_cdf(self._get_cdf('users', self.user_skew), rng, size).tolist()
+
+        return [
+            {
+                'title': f'{title_words[i]}_{start + i}',
+                'text': ' '.join(text_words[i][:text_lengths[i]]).capitalize() + '.',
+                'topic': topics[i],
+                'user_index': users[i],
+            }
+            for i in range(size)
+        ]
@@ -0,0 +1,176 @@
+import csv
+import io
+import os
+import time
+from array import array
+from contextlib import ExitStack
+
+from django.core.files import File
+from django.db import connection, transaction
+
+from companies.models import Company
+from posts.models import Post
+from users.bulk_import import hash_passwords
+from users.hashing import hashing_service
+from users.models import User
+from .models import DatasetCheckpoint
+
+
+class DatasetError(Exception):
+    pass
+
+
+def append_ids(ranges, ids):
+    """
+    Add ids to a list of [first, last] ranges, ids of one bulk insert are usually one range.
+    """
+    for row_id in ids:
+        if ranges and ranges[-1][1] + 1 == row_id:
+            ranges[-1][1] = row_id
+        else:
+            ranges.append([row_id, row_id])
+
+
+def expand_ids(ranges):
+    ids = array('q')
+    for first, last in ranges:
+        ids.extend(range(first, last + 1))
+    return ids
+
+
+class DatasetLoader:
+    """
+    Loads a generated dataset in batches: companies and users with bulk_create, posts with COPY on Postgres.
+
+    After every batch the progress and the ids of created companies and users are saved to a DatasetCheckpoint
+    in the same transaction, so an interrupted load resumes from the first batch that was not committed.
+    """
+    STAGES = ('companies', 'users', 'posts')
+
+    def __init__(self, generator, batch_size=5000, checkpoint='default', workers=None, password=None,
+                 images_dir=None, log=print):
+        self.generator = generator
+        self.batch_size = batch_size
+        self.checkpoint_name = checkpoint
+        self.workers = workers
+        self.password = password
+        self.images_dir = images_dir
+        self.log = log
+        self._hashed_password = None
+        self._ids = {}
+
+    def run(self, resume=False):
+        checkpoint = self._get_checkpoint(resume)
+        for stage in self.STAGES:
+            self._load_stage(stage, checkpoint)
+        return checkpoint.state['loaded']
+
+    def _get_checkpoint(self, resume):
+        params = self.generator.params()
+        checkpoint = DatasetCheckpoint.objects.filter(name=self.checkpoint_name).first()
+
+        if checkpoint is None:
+            if resume:
+                raise DatasetError(f'Checkpoint {self.checkpoint_name} does not exist')
+            state = {
+                'params': params,
+                'loaded': {stage: 0 for stage in self.STAGES},
+                'ids': {'companies': [], 'users': []},
+            }
+            return DatasetCheckpoint.objects.create(name=self.checkpoint_name, state=state)
+
+        if not resume:
+            raise DatasetError(f'Checkpoint {self.checkpoint_name} already exist, resume it or use another name')
+        if checkpoint.state['params'] != params:
+            raise DatasetError(f'Checkpoint {self.checkpoint_name} was made for another dataset: '
+                               f'{checkpoint.state["params"]}')
+        return checkpoint
+
+    def _load_stage(self, stage, checkpoint):
+        state = checkpoint.state
+        count = self.generator.counts[stage]
+        first = state['loaded'][stage]
+        started = time.monotonic()
+
+        for start in range(first, count, self.batch_size):
+            stop = min(start + self.batch_size, count)
+            rows = list(getattr(self.generator, stage)(start, stop))
+            if stage == 'users':
+                self._hash_passwords(rows)
+
+            with transaction.atomic():
+                ids = getattr(self, f'_insert_{stage}')(rows, start, state)
+                if stage in state['ids']:
+                    append_ids(state['ids'][stage], ids)
+                    self._ids.pop(stage, None)
+                state['loaded'][stage] = stop
+                checkpoint.save(update_fields=['state', 'updated'])
+
+            rate = (stop - first) / max(time.monotonic() - started, 1e-6)
+            self.log(f'{stage}: {stop}/{count} loaded, {rate:.0f} rows/s')
+
+    def _hash_passwords(self, rows):
+        if self.password:
+            if self._hashed_password is None:
+                self._hashed_password = hashing_service.make_password(self.password)
+            passwords = [self._hashed_password] * len(rows)
+        else:
+            passwords = hash_passwords([row['password'] for row in rows], workers=self.workers)
+
+        for row, password in zip(rows, passwords):
+            row['password'] = password
+
+    def _get_ids(self, stage, state):
+        if stage not in self._ids:
+            self._ids[stage] = expand_ids(state['ids'][stage])
+        return self._ids[stage]
+
+    def _insert_companies(self, rows, start, state):
+        with ExitStack() as files:
+            companies = [
+                Company(logo=self._open_image(files, start + index), **row) for index, row in enumerate(rows)
+            ]
+            return [company.id for company in Company.objects.bulk_create(companies)]
+
+    def _insert_users(self, rows, start, state):
+        company_ids = self._get_ids('companies', state)
+        image_offset = self.generator.counts['companies'] + start
+
+        with ExitStack() as files:
+            users = []
+            for index, row in enumerate(rows):
+                company_id = company_ids[row.pop('company_index')]
+                avatar = self._open_image(files, image_offset + index)
+                users.append(User(company_id_id=company_id, avatar=avatar, **row))
+            return [user.id for user in User.objects.bulk_create(users)]
+
+    def _insert_posts(self, rows, start, state):
+        user_ids = self._get_ids('users', state)
+
+        if connection.vendor != 'postgresql':
+            posts = [
+                Post(title=row['title'], text=row['text'], topic=row['topic'], user_id_id=user_ids[row['user_index']])
+                for row in rows
+            ]
+            Post.objects.bulk_create(posts)
+            return []
+
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, quoting=csv.QUOTE_ALL)
+        for row in rows:
+            writer.writerow([row['title'], row['text'], row['topic'], user_ids[row['user_index']]])
+        buffer.seek(0)
+
+        with connection.cursor() as cursor:
+            cursor.copy_expert(
+                f'COPY {Post._meta.db_table} (title, text, topic, user_id_id) FROM STDIN WITH (FORMAT csv)', buffer
+            )
+        return []
+
+    def _open_image(self, files, index):
+        if not self.images_dir:
+            return None
+        path = os.path.join(self.images_dir, f'{index}.jpg')
+        if not os.path.exists(path):
+            return None
+        return File(files.enter_context(open(path, 'rb')), name=os.path.basename(path))
@@ -0,0 +1,48 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from dataset.generator import DatasetGenerator, SCALE_PROFILES
+from dataset.loader import DatasetLoader, DatasetError
+
+
+class Command(BaseCommand):
+    help = 'Generate companies, users and posts and load them into the database in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--profile', choices=SCALE_PROFILES, default='small', help='Scale of the dataset')
+        parser.add_argument('--companies', type=int, help='Number of companies, overrides the profile one')
+        parser.add_argument('--users', type=int, help='Number of users, overrides the profile one')
+        parser.add_argument('--posts', type=int, help='Number of posts, overrides the profile one')
+        parser.add_argument('--seed', type=int, default=0, help='Seed of the generated data')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Rows per INSERT or COPY')
+        parser.add_argument('--workers', type=int, help='Processes hashing passwords, PASSWORD_HASHING_WORKERS by default')
+        parser.add_argument('--password', help='One password for all users, hashed once instead of per user')
+        parser.add_argument('--images-dir', help='Directory with <index>.jpg company logos and user avatars')
+        parser.add_argument('--checkpoint', default='default', help='Name of the checkpoint saved after every batch')
+        parser.add_argument('--resume', action='store_true', help='Continue the load saved in the checkpoint')
+
+    def handle(self, *args, **options):
+        generator = DatasetGenerator.from_profile(
+            options['profile'],
+            seed=options['seed'],
+            companies=options['companies'],
+            users=options['users'],
+            posts=options['posts'],
+        )
+        loader = DatasetLoader(
+            generator,
+            batch_size=options['batch_size'],
+            checkpoint=options['checkpoint'],
+            workers=options['workers'],
+            password=options['password'],
+            images_dir=options['images_dir'],
+            log=self.stdout.write,
+        )
+
+        try:
+            loaded = loader.run(resume=options['resume'])
+        except DatasetError as e:
+            raise CommandError(e)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Successfully load {loaded["companies"]} companies, {loaded["users"]} users and {loaded["posts"]} posts'
+        ))
@@ -0,0 +1,27 @@
+# Generated by Django 3.2.9 on 2026-10-18 05:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DatasetCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True, verbose_name='Checkpoint Name')),
+                ('state', models.JSONField(default=dict, verbose_name='Loader State')),
+                ('updated', models.DateTimeField(auto_now=True, verbose_name='Last Update')),
+            ],
+            options={
+                'verbose_name': 'Dataset Checkpoint',
+                'verbose_name_plural': 'Dataset Checkpoints',
+            },
+        ),
+    ]
@@ -0,0 +1,17 @@
+from django.db import models
+
+
+class DatasetCheckpoint(models.Model):
+    """
+    Progress of one load_dataset run, saved in the same transaction as every loaded batch.
+    """
+    name = models.CharField('Checkpoint Name', max_length=50, unique=True, null=False, blank=False)
+    state = models.JSONField('Loader State', default=dict)
+    updated = models.DateTimeField('Last Update', auto_now=True)
+
+    def __str__(self):
+        return self.name
+
+    class Meta:
+        verbose_name = 'Dataset Checkpoint'
+        verbose_name_plural = 'Dataset Checkpoints'
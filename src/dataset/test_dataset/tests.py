@@ -0,0 +1,114 @@
+from collections import Counter
+from io import StringIO
+from unittest.mock import patch
+
+from django.core.management import call_command, CommandError
+from django.db.models import Count
+from django.test import TestCase
+
+from companies.models import Company
+from dataset.generator import DatasetGenerator, SCALE_PROFILES
+from dataset.loader import DatasetLoader, append_ids, expand_ids
+from dataset.models import DatasetCheckpoint
+from posts.models import Post
+from users.models import User
+
+
+class DatasetLoaderTestCase(TestCase):
+
+    def test_load_dataset_command(self):
+        call_command('load_dataset', companies=3, users=7, posts=28, batch_size=5, password='testpassword',
+                     stdout=StringIO())
+
+        posts_per_user = User.objects.annotate(posts=Count('post')).values_list('posts', flat=True)
+
+        self.assertEqual(Company.objects.count(), 3)
+        self.assertEqual(User.objects.filter(company_id__isnull=False).count(), 7)
+        self.assertEqual(Post.objects.count(), 28)
+        self.assertEqual(sum(posts_per_user), 28)
+        self.assertTrue(User.objects.first().check_password('testpassword'))
+        self.assertEqual(DatasetCheckpoint.objects.get(name='default').state['loaded'],
+                         {'companies': 3, 'users': 7, 'posts': 28})
+
+    def test_load_dataset_hashes_every_password(self):
+        generator = DatasetGenerator(companies=1, users=2, posts=0)
+        passwords = [user['password'] for user in generator.users(0, 2)]
+
+        DatasetLoader(generator, workers=2, log=lambda message: None).run()
+
+        for user, password in zip(User.objects.order_by('id'), passwords):
+            self.assertTrue(user.check_password(password))
+
+    def test_load_dataset_resume(self):
+        generator = DatasetGenerator(companies=2, users=4, posts=20)
+        expected_titles = [post['title'] for post in generator.posts(0, 20)]
+        insert_posts = DatasetLoader._insert_posts
+        calls = []
+
+        def failing_insert_posts(loader, rows, start, state):
+            calls.append(start)
+            if len(calls) == 3:
+                raise RuntimeError('Connection lost')
+            return insert_posts(loader, rows, start, state)
+
+        with patch.object(DatasetLoader, '_insert_posts', failing_insert_posts):
+            with self.assertRaises(RuntimeError):
+                DatasetLoader(generator, batch_size=6, password='testpassword', log=lambda message: None).run()
+
+        self.assertEqual(Post.objects.count(), 12)
+
+        DatasetLoader(generator, batch_size=6, password='testpassword', log=lambda message: None).run(resume=True)
+
+        self.assertEqual(User.objects.count(), 4)
+        self.assertEqual(list(Post.objects.order_by('id').values_list('title', flat=True)), expected_titles)
+
+    def test_negative_load_dataset_resume_another_dataset(self):
+        call_command('load_dataset', companies=1, users=1, posts=1, password='testpassword', stdout=StringIO())
+
+        with self.assertRaises(CommandError):
+            call_command('load_dataset', companies=2, users=1, posts=1, resume=True, stdout=StringIO())
+        with self.assertRaises(CommandError):
+            call_command('load_dataset', companies=1, users=1, posts=1, stdout=StringIO())
+
+    def test_id_ranges(self):
+        ranges = []
+
+        append_ids(ranges, [1, 2, 3])
+        append_ids(ranges, [4, 10, 11])
+
+        self.assertEqual(ranges, [[1, 4], [10, 11]])
+        self.assertEqual(list(expand_ids(ranges)), [1, 2, 3, 4, 10, 11])
+
+
+class DatasetGeneratorTestCase(TestCase):
+
+    def test_generator_is_reproducible(self):
+        generator = DatasetGenerator(companies=5, users=50, posts=25000, seed=3)
+        posts = list(generator.posts(0, 25000))
+        users = list(generator.users(0, 50))
+
+        self.assertEqual(len(posts), 25000)
+        self.assertEqual(list(DatasetGenerator(companies=5, users=50, posts=25000, seed=3).posts(9990, 20010)),
+                         posts[9990:20010])
+        self.assertEqual(list(generator.users(10, 20)), users[10:20])
+        self.assertNotEqual(list(DatasetGenerator(companies=5, users=50, posts=25000, seed=4).posts(0, 100)),
+                            posts[:100])
+        self.assertEqual(len({post['title'] for post in posts}), 25000)
+        self.assertEqual(len({user['email'] for user in users}), 50)
+
+    def test_generator_skew(self):
+        generator = DatasetGenerator(companies=100, users=1000, posts=20000)
+        posts_per_user = Counter(post['user_index'] for post in generator.posts(0, 20000))
+        users_per_company = Counter(user['company_index'] for user in generator.users(0, 1000))
+
+        self.assertTrue(all(0 <= index < 1000 for index in posts_per_user))
+        self.assertTrue(all(0 <= index < 100 for index in users_per_company))
+        self.assertGreater(posts_per_user.most_common(1)[0][1], 20 * 20000 / 1000)
+        self.assertGreater(users_per_company.most_common(1)[0][1], 10 * 1000 / 100)
+
+    def test_generator_profiles(self):
+        generator = DatasetGenerator.from_profile('medium', users=10)
+
+        self.assertEqual(generator.counts, dict(SCALE_PROFILES['medium'], users=10))
+        with self.assertRaises(ValueError):
+            DatasetGenerator.from_profile('huge')
@@ -0,0 +1,84 @@
+from django.contrib import admin
+from django.db.models import Sum
+from django.http import HttpResponse
+from django.shortcuts import get_object_or_404
+from django.urls import path, reverse
+from django.utils import timezone
+from django.utils.html import format_html
+
+from .models import ProfileSession, SlowQuery
+from .profiler import format_collapsed, merge_collapsed, sessions_changed
+
+
+@admin.register(ProfileSession)
+class ProfileSessionAdmin(admin.ModelAdmin):
+    list_display = ('id', 'url_name', 'duration', 'interval', 'created', 'ends', 'active', 'samples', 'download')
+    fields = ('url_name', 'duration', 'interval')
+    actions = ('stop_sessions', )
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(total_samples=Sum('results__samples'))
+
+    def get_urls(self):
+        urls = [
+            path('<int:session_id>/collapsed/', self.admin_site.admin_view(self.collapsed_view),
+                 name='monitoring_profilesession_collapsed'),
+        ]
+        return urls + super().get_urls()
+
+    @admin.display(boolean=True)
+    def active(self, session):
+        return session.is_active
+
+    @admin.display(description='Samples')
+    def samples(self, session):
+        return session.total_samples or 0
+
+    @admin.display(description='Collapsed Stacks')
+    def download(self, session):
+        url = reverse('admin:monitoring_profilesession_collapsed', args=(session.id, ))
+        return format_html('<a href="{}">Download</a>', url)
+
+    @admin.action(description='Stop selected profile sessions')
+    def stop_sessions(self, request, queryset):
+        now = timezone.now()
+        queryset.filter(ends__gt=now).update(ends=now)
+        sessions_changed()
+
+    def collapsed_view(self, request, session_id):
+        """
+        Stacks of all worker processes merged in the collapsed format, ready for flamegraph.pl or speedscope.
+        """
+        session = get_object_or_404(ProfileSession, id=session_id)
+        stacks = merge_collapsed(session.results.values_list('stacks', flat=True))
+
+        response = HttpResponse(format_collapsed(stacks), content_type='text/plain; charset=utf-8')
+        response['Content-Disposition'] = f'attachment; filename="profile-{session.id}.collapsed"'
+        return response
+
+
+@admin.register(SlowQuery)
+class SlowQueryAdmin(admin.ModelAdmin):
+    list_display = ('id', 'created', 'duration', 'view', 'short_sql', 'explained')
+    list_filter = ('view', )
+    search_fields = ('sql', )
+    fields = ('created', 'duration', 'view', 'sql', 'params', 'stack', 'formatted_plan')
+    readonly_fields = fields
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    @admin.display(description='SQL')
+    def short_sql(self, query):
+        return query.sql[:120]
+
+    @admin.display(boolean=True)
+    def explained(self, query):
+        return bool(query.plan)
+
+    @admin.display(description='EXPLAIN Plan')
+    def formatted_plan(self, query):
+        return format_html('<pre>{}</pre>', query.plan)
@@ -0,0 +1,136 @@
+import json
+import logging
+import os
+import threading
+import tracemalloc
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+PROJECT_DIR = str(settings.BASE_DIR) + os.sep
+IGNORED_TRACES = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, os.path.abspath(__file__)),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+    tracemalloc.Filter(False, '<unknown>'),
+)
+
+# tracemalloc is global to the process, only one request at a time is traced
+trace_lock = threading.Lock()
+
+
+def short_path(filename):
+    """
+    File of an allocation site relative to the project or to site-packages, like django/db/models/base.py.
+    """
+    _, separator, package_path = filename.rpartition(f'site-packages{os.sep}')
+    if separator:
+        return package_path
+    if filename.startswith(PROJECT_DIR):
+        return os.path.relpath(filename, PROJECT_DIR)
+    return filename
+
+
+class AllocationTrace:
+    """
+    Python memory allocated between start() and stop(): the peak over the starting size and the sites
+    that allocated the most of the memory still held at the end, like the serialized and rendered response.
+
+    Tracing is started and stopped by the trace itself unless it was already on (PYTHONTRACEMALLOC),
+    then the peak is reset with tracemalloc.reset_peak() on Python 3.9+ and is unknown on older ones.
+    """
+
+    def __init__(self):
+        self.owner = False
+        self.before = None
+        self.start_size = 0
+
+    def start(self):
+        self.owner = not tracemalloc.is_tracing()
+        if self.owner:
+            tracemalloc.start()
+        self.before = tracemalloc.take_snapshot().filter_traces(IGNORED_TRACES)
+        if hasattr(tracemalloc, 'reset_peak'):
+            tracemalloc.reset_peak()
+        self.start_size = tracemalloc.get_traced_memory()[0]
+
+    def stop(self, top=10):
+        current, peak = tracemalloc.get_traced_memory()
+        after = tracemalloc.take_snapshot().filter_traces(IGNORED_TRACES)
+        if self.owner:
+            tracemalloc.stop()
+
+        known_peak = self.owner or hasattr(tracemalloc, 'reset_peak')
+        sites = [stat for stat in after.compare_to(self.before, 'lineno') if stat.size_diff > 0][:top]
+        return {
+            'peak_kb': round((peak - self.start_size) / 1024, 1) if known_peak else None,
+            'allocated_kb': round((current - self.start_size) / 1024, 1),
+            'top': [
+                {
+                    'site': f'{short_path(stat.traceback[0].filename)}:{stat.traceback[0].lineno}',
+                    'size_kb': round(stat.size_diff / 1024, 1),
+                    'count': stat.count_diff,
+                }
+                for stat in sites
+            ],
+        }
+
+
+class AllocationProfilerMiddleware:
+    """
+    Traces the Python allocations of requests to the url names in ALLOCATION_PROFILE_VIEWS and logs
+    the peak and the top ALLOCATION_PROFILE_TOP allocating sites as one JSON line.
+
+    Tracing slows a request down several times and sees the allocations of every thread, so a request
+    is skipped while another one is traced. A streamed response is traced until the stream is consumed.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.views = set(settings.ALLOCATION_PROFILE_VIEWS)
+        self.top = settings.ALLOCATION_PROFILE_TOP
+
+    def __call__(self, request):
+        response = self.get_response(request)
+
+        trace = getattr(request, 'allocation_trace', None)
+        if trace is None:
+            return response
+        if response.streaming:
+            response.streaming_content = self.stream(request, response, trace, response.streaming_content)
+        else:
+            self.report(request, response, trace)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if request.resolver_match.view_name not in self.views or not trace_lock.acquire(blocking=False):
+            return
+        try:
+            request.allocation_trace = AllocationTrace()
+            request.allocation_trace.start()
+        except Exception:
+            trace_lock.release()
+            raise
+
+    def stream(self, request, response, trace, content):
+        try:
+            yield from content
+        finally:
+            self.report(request, response, trace)
+
+    def report(self, request, response, trace):
+        try:
+            allocations = trace.stop(top=self.top)
+        finally:
+            trace_lock.release()
+
+        record = {
+            'method': request.method,
+            'path': request.path,
+            'view': request.resolver_match.view_name,
+            'status': response.status_code,
+            **allocations,
+        }
+        request.allocations = record
+        logger.info(json.dumps(record), extra={'allocations': record})
@@ -0,0 +1,261 @@
+import atexit
+import glob
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+# Upper bounds in seconds of the request latency histogram buckets, +Inf is added on export
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+METRICS = {
+    'http_requests_total': ('counter', 'Finished requests by view, method and status.'),
+    'http_request_duration_seconds': ('histogram', 'Request latency by view.'),
+    'http_requests_in_flight': ('gauge', 'Requests being processed by view.'),
+    'db_queries_total': ('counter', 'Executed SQL queries by view.'),
+    'db_query_duration_seconds_total': ('counter', 'Time spent in SQL queries by view.'),
+    'auth_token_cache_total': ('counter', 'Token authentication cache lookups by result (hit or miss).'),
+    'password_hashing_total': ('counter', 'Password hashing operations by result (completed, rejected or failed).'),
+    'password_hashing_in_flight': ('gauge', 'Password hashing operations waiting or running.'),
+    'password_hashing_queue_depth': ('gauge', 'Password hashing operations waiting for a free process.'),
+    'object_cache_total': ('counter', 'Object cache lookups by model and result (hit, negative_hit or miss).'),
+}
+
+
+def pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class MetricsRegistry:
+    """
+    Counters, gauges and fixed-bucket histograms of one process, keyed by metric name and labels.
+
+    With a directory every process writes a snapshot of its metrics to <directory>/metrics-<pid>.json
+    at most every flush_interval seconds, and collect() adds up the snapshots of all processes.
+    Gauges of processes that are not alive anymore are dropped, their counters are kept.
+    """
+
+    def __init__(self, directory=None, flush_interval=1.0, buckets=LATENCY_BUCKETS):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._flushed = 0.0
+        self._values = defaultdict(float)
+        self._histograms = {}
+
+    def _check_pid(self):
+        # A forked worker starts with empty metrics instead of a copy of the parent ones
+        if self._pid != os.getpid():
+            self._reset()
+
+    def inc(self, name, labels, value=1):
+        with self._lock:
+            self._check_pid()
+            self._values[(name, labels)] += value
+
+    def dec(self, name, labels, value=1):
+        self.inc(name, labels, -value)
+
+    def observe(self, name, labels, value):
+        with self._lock:
+            self._check_pid()
+            histogram = self._histograms.get((name, labels))
+            if histogram is None:
+                histogram = self._histograms[(name, labels)] = [[0] * len(self.buckets), 0.0, 0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    histogram[0][index] += 1
+                    break
+            histogram[1] += value
+            histogram[2] += 1
+
+    def snapshot(self):
+        with self._lock:
+            self._check_pid()
+            return {
+                'pid': self._pid,
+                'values': [[name, list(labels), value] for (name, labels), value in self._values.items()],
+                'histograms': [
+                    [name, list(labels), list(buckets), total, count]
+                    for (name, labels), (buckets, total, count) in self._histograms.items()
+                ],
+            }
+
+    def flush(self, force=False):
+        if not self.directory or (not force and time.monotonic() - self._flushed < self.flush_interval):
+            return
+        self._flushed = time.monotonic()
+        snapshot = self.snapshot()
+        path = os.path.join(self.directory, f'metrics-{snapshot["pid"]}.json')
+        os.makedirs(self.directory, exist_ok=True)
+        with open(f'{path}.tmp', 'w') as file:
+            json.dump(snapshot, file)
+        os.replace(f'{path}.tmp', path)
+
+    def _snapshots(self):
+        own = self.snapshot()
+        yield own
+        if not self.directory:
+            return
+        for path in glob.glob(os.path.join(self.directory, 'metrics-*.json')):
+            try:
+                with open(path) as file:
+                    snapshot = json.load(file)
+            except (OSError, ValueError):
+                continue
+            if snapshot['pid'] != own['pid']:
+                yield snapshot
+
+    def collect(self):
+        """
+        Sum of the metrics of all processes as (values, histograms) keyed by (name, labels).
+        """
+        values = defaultdict(float)
+        histograms = {}
+        for snapshot in self._snapshots():
+            alive = snapshot['pid'] == os.getpid() or pid_alive(snapshot['pid'])
+            for name, labels, value in snapshot['values']:
+                if alive or METRICS[name][0] != 'gauge':
+                    values[(name, tuple(map(tuple, labels)))] += value
+            for name, labels, buckets, total, count in snapshot['histograms']:
+                key = (name, tuple(map(tuple, labels)))
+                histogram = histograms.setdefault(key, [[0] * len(buckets), 0.0, 0])
+                histogram[0] = [a + b for a, b in zip(histogram[0], buckets)]
+                histogram[1] += total
+                histogram[2] += count
+        return values, histograms
+
+    def render(self):
+        """
+        All metrics in the Prometheus text exposition format.
+        """
+        values, histograms = self.collect()
+        lines = []
+        for name, (metric_type, description) in METRICS.items():
+            lines.append(f'# HELP {name} {description}')
+            lines.append(f'# TYPE {name} {metric_type}')
+            if metric_type == 'histogram':
+                for (metric, labels), (buckets, total, count) in sorted(histograms.items()):
+                    if metric != name:
+                        continue
+                    cumulative = 0
+                    for bound, bucket in zip(self.buckets, buckets):
+                        cumulative += bucket
+                        lines.append(f'{name}_bucket{format_labels(labels + (("le", str(bound)), ))} {cumulative}')
+                    lines.append(f'{name}_bucket{format_labels(labels + (("le", "+Inf"), ))} {count}')
+                    lines.append(f'{name}_sum{format_labels(labels)} {format_value(total)}')
+                    lines.append(f'{name}_count{format_labels(labels)} {count}')
+            else:
+                for (metric, labels), value in sorted(values.items()):
+                    if metric == name:
+                        lines.append(f'{name}{format_labels(labels)} {format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+def format_labels(labels):
+    if not labels:
+        return ''
+    escaped = (
+        (key, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')) for key, value in labels
+    )
+    return '{' + ','.join(f'{key}="{value}"' for key, value in escaped) + '}'
+
+
+def format_value(value):
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+registry = MetricsRegistry(directory=settings.METRICS_DIR, flush_interval=settings.METRICS_FLUSH_INTERVAL)
+atexit.register(registry.flush, force=True)
+
+
+SAVEPOINT_STATEMENTS = ('SAVEPOINT', 'RELEASE SAVEPOINT', 'ROLLBACK TO SAVEPOINT')
+
+
+class QueryCounter:
+    """
+    connection.execute_wrapper that counts queries and sums their time, with keep_sql the SQL of every query
+    is kept in statements. With skip_savepoints savepoints are not counted, outside of a test transaction
+    atomic blocks do not make them.
+    """
+
+    def __init__(self, keep_sql=False, skip_savepoints=False):
+        self.keep_sql = keep_sql
+        self.skip_savepoints = skip_savepoints
+        self.queries = 0
+        self.seconds = 0.0
+        self.statements = []
+
+    def __call__(self, execute, sql, params, many, context):
+        if self.skip_savepoints and sql.startswith(SAVEPOINT_STATEMENTS):
+            return execute(sql, params, many, context)
+
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.seconds += time.perf_counter() - started
+            if self.keep_sql:
+                self.statements.append(sql)
+
+
+class MetricsMiddleware:
+    """
+    Records latency, status, in-flight requests and queries of every request, labelled by url name.
+    A request whose view raises is recorded with status 500 and the exception is re-raised.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        counter = QueryCounter()
+        started = time.perf_counter()
+        status_code = 500
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(counter))
+                response = self.get_response(request)
+            status_code = response.status_code
+            return response
+        finally:
+            view = getattr(request, 'metrics_view', None)
+            if view is not None:
+                registry.dec('http_requests_in_flight', (('view', view), ))
+            self.record(request, status_code, time.perf_counter() - started, counter)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.metrics_view = view_name(request)
+        registry.inc('http_requests_in_flight', (('view', request.metrics_view), ))
+
+    @staticmethod
+    def record(request, status_code, duration, counter):
+        view = (('view', view_name(request)), )
+        registry.inc('http_requests_total', view + (('method', request.method), ('status', str(status_code))))
+        registry.observe('http_request_duration_seconds', view, duration)
+        registry.inc('db_queries_total', view, counter.queries)
+        registry.inc('db_query_duration_seconds_total', view, counter.seconds)
+        registry.flush()
+
+
+def view_name(request):
+    match = getattr(request, 'resolver_match', None)
+    return match.view_name if match else 'unmatched'
@@ -0,0 +1,45 @@
+# Generated by Django 3.2.9 on 2026-10-18 06:27
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProfileSession',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('url_name', models.CharField(blank=True, help_text='Sample only requests to this url name, like posts:all_posts', max_length=100, verbose_name='URL Name')),
+                ('duration', models.PositiveIntegerField(default=30, verbose_name='Duration, s')),
+                ('interval', models.PositiveIntegerField(default=10, verbose_name='Sampling Interval, ms')),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='Created')),
+                ('ends', models.DateTimeField(db_index=True, editable=False, verbose_name='Ends At')),
+            ],
+            options={
+                'verbose_name': 'Profile Session',
+                'verbose_name_plural': 'Profile Sessions',
+            },
+        ),
+        migrations.CreateModel(
+            name='ProfileResult',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('pid', models.IntegerField(verbose_name='Process Id')),
+                ('samples', models.PositiveIntegerField(default=0, verbose_name='Samples')),
+                ('stacks', models.TextField(blank=True, verbose_name='Collapsed Stacks')),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='Created')),
+                ('session', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='results', to='monitoring.profilesession')),
+            ],
+            options={
+                'verbose_name': 'Profile Result',
+                'verbose_name_plural': 'Profile Results',
+            },
+        ),
+    ]
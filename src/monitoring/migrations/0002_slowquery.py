@@ -0,0 +1,31 @@
+# Generated by Django 3.2.9 on 2026-10-18 06:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('monitoring', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SlowQuery',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='Created')),
+                ('duration', models.FloatField(verbose_name='Duration, ms')),
+                ('view', models.CharField(blank=True, db_index=True, max_length=100, verbose_name='View')),
+                ('sql', models.TextField(verbose_name='Normalized SQL')),
+                ('params', models.TextField(blank=True, verbose_name='Redacted Parameters')),
+                ('stack', models.TextField(blank=True, verbose_name='Stack')),
+                ('plan', models.TextField(blank=True, verbose_name='EXPLAIN (ANALYZE, BUFFERS)')),
+            ],
+            options={
+                'verbose_name': 'Slow Query',
+                'verbose_name_plural': 'Slow Queries',
+                'ordering': ('-id',),
+            },
+        ),
+    ]
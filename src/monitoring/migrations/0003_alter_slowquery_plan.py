@@ -0,0 +1,18 @@
+# Generated by Django 3.2.9 on 2026-10-18 07:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('monitoring', '0002_slowquery'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='slowquery',
+            name='plan',
+            field=models.TextField(blank=True, verbose_name='EXPLAIN Plan'),
+        ),
+    ]
@@ -0,0 +1,68 @@
+from datetime import timedelta
+
+from django.db import models
+from django.utils import timezone
+
+
+class ProfileSession(models.Model):
+    """
+    One run of the sampling profiler, every worker process samples its requests until `ends`.
+    """
+    url_name = models.CharField('URL Name', max_length=100, null=False, blank=True,
+                                help_text='Sample only requests to this url name, like posts:all_posts')
+    duration = models.PositiveIntegerField('Duration, s', default=30)
+    interval = models.PositiveIntegerField('Sampling Interval, ms', default=10)
+    created = models.DateTimeField('Created', auto_now_add=True)
+    ends = models.DateTimeField('Ends At', db_index=True, editable=False)
+
+    def save(self, *args, **kwargs):
+        if self.ends is None:
+            self.ends = timezone.now() + timedelta(seconds=self.duration)
+        super().save(*args, **kwargs)
+
+    @property
+    def is_active(self):
+        return self.ends > timezone.now()
+
+    def __str__(self):
+        return f'Profile {self.id} {self.url_name or "all urls"}'
+
+    class Meta:
+        verbose_name = 'Profile Session'
+        verbose_name_plural = 'Profile Sessions'
+
+
+class ProfileResult(models.Model):
+    """
+    Collapsed stacks sampled by one worker process during a ProfileSession.
+    """
+    session = models.ForeignKey(ProfileSession, on_delete=models.CASCADE, related_name='results')
+    pid = models.IntegerField('Process Id')
+    samples = models.PositiveIntegerField('Samples', default=0)
+    stacks = models.TextField('Collapsed Stacks', blank=True)
+    created = models.DateTimeField('Created', auto_now_add=True)
+
+    class Meta:
+        verbose_name = 'Profile Result'
+        verbose_name_plural = 'Profile Results'
+
+
+class SlowQuery(models.Model):
+    """
+    Query slower than SLOW_QUERY_THRESHOLD_MS, the table keeps only the last SLOW_QUERY_LOG_SIZE of them.
+    """
+    created = models.DateTimeField('Created', auto_now_add=True)
+    duration = models.FloatField('Duration, ms')
+    view = models.CharField('View', max_length=100, blank=True, db_index=True)
+    sql = models.TextField('Normalized SQL')
+    params = models.TextField('Redacted Parameters', blank=True)
+    stack = models.TextField('Stack', blank=True)
+    plan = models.TextField('EXPLAIN Plan', blank=True)
+
+    def __str__(self):
+        return f'{self.duration:.1f}ms {self.view}'
+
+    class Meta:
+        verbose_name = 'Slow Query'
+        verbose_name_plural = 'Slow Queries'
+        ordering = ('-id', )
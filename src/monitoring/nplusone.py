@@ -0,0 +1,135 @@
+import logging
+import os
+import random
+import re
+import sys
+from collections import Counter, defaultdict
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+STRING_RE = re.compile(r"'(?:[^']|'')*'")
+NUMBER_RE = re.compile(r'\b\d+(?:\.\d+)?\b')
+IN_LIST_RE = re.compile(r'\bIN \((?:[^()]*)\)', re.IGNORECASE)
+SPACES_RE = re.compile(r'\s+')
+
+PROJECT_DIR = str(settings.BASE_DIR) + os.sep
+THIS_FILE = os.path.abspath(__file__)
+COMPREHENSIONS = {'<listcomp>', '<dictcomp>', '<setcomp>', '<genexpr>'}
+
+
+class NPlusOneDetected(Exception):
+    pass
+
+
+def normalize_sql(sql):
+    """
+    Statement template of a query: literals become ?, IN lists become IN (...) and spaces are collapsed,
+    so the same lookup for different rows gives the same template.
+    """
+    sql = STRING_RE.sub('?', sql)
+    sql = NUMBER_RE.sub('?', sql)
+    sql = IN_LIST_RE.sub('IN (...)', sql)
+    return SPACES_RE.sub(' ', sql).strip()
+
+
+def caller(frame):
+    """
+    Name and place of the innermost project frame, like PostsSerializer.get_user (posts/serializers.py:27).
+
+    Frames of Django, DRF and other installed packages and of comprehensions are skipped, so a lazy related lookup
+    is attributed to the serializer, view or permission function that touched the relation.
+    """
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if filename.startswith(PROJECT_DIR) and filename != THIS_FILE and 'site-packages' not in filename \
+                and frame.f_code.co_name not in COMPREHENSIONS:
+            return f'{qualified_name(frame)} ({os.path.relpath(filename, PROJECT_DIR)}:{frame.f_lineno})'
+        frame = frame.f_back
+    return 'unknown'
+
+
+def qualified_name(frame):
+    code = frame.f_code
+    qualname = getattr(code, 'co_qualname', None)
+    if qualname:
+        return qualname
+    owner = frame.f_locals.get('self', frame.f_locals.get('cls'))
+    if owner is not None:
+        owner = owner if isinstance(owner, type) else type(owner)
+        return f'{owner.__name__}.{code.co_name}'
+    return code.co_name
+
+
+class QueryTemplateRecorder:
+    """
+    connection.execute_wrapper that counts SELECT statements by template and the project frames running them.
+
+    Writes are not counted, bulk inserts and updates legitimately run the same statement once per batch.
+    """
+
+    def __init__(self):
+        self.templates = Counter()
+        self.callers = defaultdict(Counter)
+
+    def __call__(self, execute, sql, params, many, context):
+        if sql.lstrip()[:6].upper() == 'SELECT':
+            template = normalize_sql(sql)
+            self.templates[template] += 1
+            self.callers[template][caller(sys._getframe(1))] += 1
+        return execute(sql, params, many, context)
+
+    def repeated(self, threshold):
+        """
+        Templates run more than threshold times as (template, count, callers with their counts).
+        """
+        return [
+            (template, count, self.callers[template].most_common())
+            for template, count in self.templates.most_common()
+            if count > threshold
+        ]
+
+
+def format_report(path, repeated):
+    lines = [f'Possible N+1 queries in {path}:']
+    for template, count, callers in repeated:
+        lines.append(f'  {count}x {template}')
+        lines.extend(f'    {caller_count}x from {name}' for name, caller_count in callers)
+    return '\n'.join(lines)
+
+
+class NPlusOneMiddleware:
+    """
+    Groups the SQL of a request by statement template and reports templates run more than NPLUSONE_THRESHOLD times.
+
+    With NPLUSONE_RAISE (tests) every request is checked and a report raises NPlusOneDetected,
+    otherwise NPLUSONE_SAMPLE_RATE of requests are checked and reports are logged as warnings.
+    Streamed responses are checked only up to the start of the stream.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.threshold = settings.NPLUSONE_THRESHOLD
+        self.raise_errors = settings.NPLUSONE_RAISE
+        self.sample_rate = settings.NPLUSONE_SAMPLE_RATE
+
+    def __call__(self, request):
+        if not self.raise_errors and random.random() >= self.sample_rate:
+            return self.get_response(request)
+
+        recorder = QueryTemplateRecorder()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(recorder))
+            response = self.get_response(request)
+
+        repeated = recorder.repeated(self.threshold)
+        if repeated:
+            report = format_report(request.path, repeated)
+            if self.raise_errors:
+                raise NPlusOneDetected(report)
+            logger.warning(report, extra={'path': request.path, 'templates': [item[:2] for item in repeated]})
+        return response
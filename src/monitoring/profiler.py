@@ -0,0 +1,202 @@
+import logging
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import ProfileSession, ProfileResult
+
+logger = logging.getLogger(__name__)
+
+MAX_DEPTH = 128
+
+# Changed whenever a session is added, stopped or deleted, controllers read the sessions only after it changes
+SESSIONS_VERSION_KEY = 'profiler:sessions-version'
+NOT_LOADED = object()
+
+# Ident of every thread serving a request -> url name of the request
+active_requests = {}
+
+
+def frame_name(frame):
+    code = frame.f_code
+    return f'{frame.f_globals.get("__name__", "?")}:{getattr(code, "co_qualname", code.co_name)}'
+
+
+def collapse_stack(frame):
+    """
+    Stack of a frame in the collapsed format of flamegraph tools, outermost frame first: a:f;b:g;c:h
+    """
+    names = []
+    while frame is not None and len(names) < MAX_DEPTH:
+        names.append(frame_name(frame))
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+
+def format_collapsed(stacks):
+    return ''.join(f'{stack} {count}\n' for stack, count in stacks.most_common())
+
+
+def merge_collapsed(texts):
+    stacks = Counter()
+    for text in texts:
+        for line in text.splitlines():
+            stack, _, count = line.rpartition(' ')
+            if stack:
+                stacks[stack] += int(count)
+    return stacks
+
+
+class Sampler(threading.Thread):
+    """
+    Takes the stacks of the threads serving requests every interval seconds until the deadline,
+    only requests to url_name when it is set, and saves them as a ProfileResult of the session.
+    """
+
+    def __init__(self, session_id, url_name, interval, deadline):
+        super().__init__(name=f'profiler-sampler-{session_id}', daemon=True)
+        self.session_id = session_id
+        self.url_name = url_name
+        self.interval = interval
+        self.deadline = deadline
+
+    def run(self):
+        try:
+            stacks, samples = self.collect()
+            self.save_result(stacks, samples)
+        except Exception:
+            logger.exception('Profile session %s failed', self.session_id)
+        finally:
+            connection.close()
+
+    def stop(self):
+        self.deadline = time.monotonic()
+
+    def collect(self):
+        stacks = Counter()
+        samples = 0
+        while time.monotonic() < self.deadline:
+            time.sleep(self.interval)
+            frames = sys._current_frames()
+            for thread_id, url_name in list(active_requests.items()):
+                frame = frames.get(thread_id)
+                if frame is None or (self.url_name and url_name != self.url_name):
+                    continue
+                stacks[collapse_stack(frame)] += 1
+                samples += 1
+        return stacks, samples
+
+    def save_result(self, stacks, samples):
+        ProfileResult.objects.create(
+            session_id=self.session_id, pid=os.getpid(), samples=samples, stacks=format_collapsed(stacks)
+        )
+
+
+def sessions_changed():
+    """
+    Makes the controllers of all worker processes read the sessions on their next poll.
+    Call it after changing sessions with QuerySet.update(), it sends no signals.
+    """
+    transaction.on_commit(lambda: cache.set(SESSIONS_VERSION_KEY, uuid.uuid4().hex, None))
+
+
+@receiver(post_save, sender=ProfileSession)
+@receiver(post_delete, sender=ProfileSession)
+def session_saved(sender, **kwargs):
+    sessions_changed()
+
+
+class ProfilerController:
+    """
+    Background thread of a worker process which checks the sessions version in the cache every
+    poll_interval seconds, and only when it has changed reads the active ProfileSessions from the database
+    to run a Sampler for a new one or stop the sampler of a session stopped from the admin.
+    """
+
+    def __init__(self, poll_interval):
+        self.poll_interval = poll_interval
+        self.samplers = {}
+        self._version = NOT_LOADED
+        self._lock = threading.Lock()
+        self._pid = None
+
+    def ensure_started(self):
+        # Threads do not survive a fork, every worker process starts its own controller
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid != os.getpid():
+                self._pid = os.getpid()
+                self.samplers = {}
+                self._version = NOT_LOADED
+                threading.Thread(target=self.run, name='profiler-controller', daemon=True).start()
+
+    def run(self):
+        while True:
+            try:
+                self.poll()
+            except Exception:
+                logger.exception('Profiler poll failed')
+            finally:
+                connection.close()
+            time.sleep(self.poll_interval)
+
+    def poll(self):
+        version = cache.get(SESSIONS_VERSION_KEY)
+        if version == self._version:
+            return
+
+        now = timezone.now()
+        sessions = {session.id: session for session in ProfileSession.objects.filter(ends__gt=now)}
+        self._version = version
+
+        for session_id, sampler in list(self.samplers.items()):
+            if not sampler.is_alive():
+                continue
+            if session_id not in sessions:
+                sampler.stop()
+
+        for session_id, session in sessions.items():
+            if session_id in self.samplers:
+                continue
+            deadline = time.monotonic() + (session.ends - now).total_seconds()
+            sampler = Sampler(session_id, session.url_name, session.interval / 1000, deadline)
+            self.samplers[session_id] = sampler
+            sampler.start()
+
+
+controller = ProfilerController(poll_interval=settings.PROFILER_POLL_INTERVAL)
+
+
+class ProfilerMiddleware:
+    """
+    Marks the threads serving requests with their url names for the sampler and keeps the controller running.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.enabled = settings.PROFILER_ENABLED
+
+    def __call__(self, request):
+        if not self.enabled:
+            return self.get_response(request)
+
+        controller.ensure_started()
+        try:
+            return self.get_response(request)
+        finally:
+            active_requests.pop(threading.get_ident(), None)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if self.enabled:
+            active_requests[threading.get_ident()] = request.resolver_match.view_name
@@ -0,0 +1,137 @@
+import datetime
+import decimal
+import json
+import os
+import random
+import sys
+import time
+import traceback
+import uuid
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections, transaction
+
+from .models import SlowQuery
+from .nplusone import normalize_sql
+
+PROJECT_DIR = str(settings.BASE_DIR) + os.sep
+THIS_FILE = os.path.abspath(__file__)
+# Parameters of these types are kept, any other value like emails, passwords and search terms is redacted
+SAFE_PARAM_TYPES = (bool, int, float, decimal.Decimal, datetime.date, datetime.time, datetime.timedelta, uuid.UUID)
+
+
+def redact_params(params):
+    if params is None:
+        return None
+    if isinstance(params, dict):
+        return {key: redact_params(value) for key, value in params.items()}
+    if isinstance(params, (list, tuple)):
+        return [redact_params(value) for value in params]
+    if isinstance(params, SAFE_PARAM_TYPES):
+        return str(params) if not isinstance(params, (bool, int, float)) else params
+    return '<redacted>'
+
+
+def project_stack(frame):
+    """
+    Project frames of the stack, outermost first, without Django, DRF and other installed packages.
+    """
+    return ''.join(traceback.format_list([
+        summary for summary in traceback.extract_stack(frame)
+        if summary.filename.startswith(PROJECT_DIR) and summary.filename != THIS_FILE
+        and 'site-packages' not in summary.filename
+    ]))
+
+
+class SlowQueryRecorder:
+    """
+    connection.execute_wrapper that keeps the queries of one request slower than threshold seconds.
+
+    The plan of a sample of slow SELECT statements is taken with EXPLAIN in a savepoint, so a failing EXPLAIN
+    does not break the transaction of the request. EXPLAIN only plans the statement, with analyze it is
+    run again with EXPLAIN (ANALYZE, BUFFERS) on the connection of the request.
+    """
+
+    def __init__(self, request, threshold, explain_rate, analyze=False):
+        self.request = request
+        self.threshold = threshold
+        self.explain_rate = explain_rate
+        self.explain_sql = 'EXPLAIN (ANALYZE, BUFFERS)' if analyze else 'EXPLAIN'
+        self.queries = []
+        self._explaining = False
+
+    def __call__(self, execute, sql, params, many, context):
+        if self._explaining:
+            return execute(sql, params, many, context)
+
+        started = time.perf_counter()
+        result = execute(sql, params, many, context)
+        duration = time.perf_counter() - started
+        if duration >= self.threshold:
+            self.record(sql, params, many, context['connection'], duration, sys._getframe(1))
+        return result
+
+    def record(self, sql, params, many, connection, duration, frame):
+        match = getattr(self.request, 'resolver_match', None)
+        plan = ''
+        if not many and connection.vendor == 'postgresql' and sql.lstrip()[:6].upper() == 'SELECT' \
+                and random.random() < self.explain_rate:
+            plan = self.explain(sql, params, connection)
+        self.queries.append(SlowQuery(
+            duration=round(duration * 1000, 3),
+            view=match.view_name if match else '',
+            sql=normalize_sql(sql),
+            params=json.dumps(redact_params(params)),
+            stack=project_stack(frame),
+            plan=plan,
+        ))
+
+    def explain(self, sql, params, connection):
+        self._explaining = True
+        try:
+            with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+                cursor.execute(f'{self.explain_sql} {sql}', params)
+                return '\n'.join(row[0] for row in cursor.fetchall())
+        except Exception as error:
+            return f'EXPLAIN failed: {error}'
+        finally:
+            self._explaining = False
+
+
+def save_slow_queries(queries, size):
+    """
+    Saves the queries and deletes all but the last size ones, so the table works as a ring buffer.
+    """
+    created = SlowQuery.objects.bulk_create(queries)
+    SlowQuery.objects.filter(id__lte=created[-1].id - size).delete()
+
+
+class SlowQueryMiddleware:
+    """
+    Logs queries of requests slower than SLOW_QUERY_THRESHOLD_MS to the SlowQuery table shown in the admin,
+    with their view, redacted parameters, project stack and for SLOW_QUERY_EXPLAIN_RATE of the SELECT ones
+    the EXPLAIN plan, with SLOW_QUERY_EXPLAIN_ANALYZE the EXPLAIN (ANALYZE, BUFFERS) one.
+    The SQL of a streamed response runs after the request and is not logged.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.threshold = settings.SLOW_QUERY_THRESHOLD_MS / 1000
+        self.explain_rate = settings.SLOW_QUERY_EXPLAIN_RATE
+        self.analyze = settings.SLOW_QUERY_EXPLAIN_ANALYZE
+        self.size = settings.SLOW_QUERY_LOG_SIZE
+
+    def __call__(self, request):
+        if self.threshold < 0:
+            return self.get_response(request)
+
+        recorder = SlowQueryRecorder(request, self.threshold, self.explain_rate, self.analyze)
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(recorder))
+            response = self.get_response(request)
+
+        if recorder.queries:
+            save_slow_queries(recorder.queries, self.size)
+        return response
@@ -0,0 +1,503 @@
+import datetime
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from datetime import timedelta
+from unittest.mock import patch
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import JsonResponse
+from django.test import Client, RequestFactory, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from companies.models import Company
+from monitoring import profiler
+from monitoring.allocations import short_path, trace_lock
+from monitoring.metrics import MetricsMiddleware, MetricsRegistry
+from monitoring.models import ProfileResult, ProfileSession, SlowQuery
+from monitoring.nplusone import NPlusOneDetected, NPlusOneMiddleware, normalize_sql
+from monitoring.slow_queries import redact_params, save_slow_queries
+from monitoring.timing import RequestTimings
+from posts.models import Post
+from users.models import User
+
+
+def posts_with_authors(request):
+    posts = Post.objects.order_by('id')
+    return JsonResponse({'authors': [post.user_id.email for post in posts]})
+
+
+def posts_with_authors_joined(request):
+    posts = Post.objects.select_related('user_id').order_by('id')
+    return JsonResponse({'authors': [post.user_id.email for post in posts]})
+
+
+@override_settings(NPLUSONE_THRESHOLD=3, NPLUSONE_RAISE=True)
+class NPlusOneMiddlewareTestCase(TestCase):
+
+    def setUp(self):
+        for index in range(5):
+            user = User.objects.create(email=f'user_{index}@email.com')
+            Post.objects.create(title=f'title_{index}', text='text', user_id=user)
+        self.request = RequestFactory().get('/api/v1/posts/all/')
+
+    def test_normalize_sql(self):
+        self.assertEqual(
+            normalize_sql('SELECT  "a" FROM "t" WHERE "t"."id" IN (1, 2, 3) AND "t"."name" = \'it\'\'s\' LIMIT 21'),
+            'SELECT "a" FROM "t" WHERE "t"."id" IN (...) AND "t"."name" = ? LIMIT ?',
+        )
+        self.assertEqual(
+            normalize_sql('SELECT "a" FROM "t" WHERE "t"."id" = %s'),
+            normalize_sql('SELECT "a"\n FROM "t" WHERE "t"."id" = %s'),
+        )
+
+    def test_negative_n_plus_one_raises_with_caller(self):
+        middleware = NPlusOneMiddleware(posts_with_authors)
+
+        with self.assertRaises(NPlusOneDetected) as error:
+            middleware(self.request)
+
+        self.assertIn('5x SELECT', str(error.exception))
+        self.assertIn('from posts_with_authors (monitoring/test_monitoring/tests.py', str(error.exception))
+
+    def test_no_n_plus_one(self):
+        response = NPlusOneMiddleware(posts_with_authors_joined)(self.request)
+
+        self.assertEqual(response.status_code, 200)
+
+    @override_settings(NPLUSONE_RAISE=False, NPLUSONE_SAMPLE_RATE=1.0)
+    def test_negative_n_plus_one_logged_in_production(self):
+        middleware = NPlusOneMiddleware(posts_with_authors)
+
+        with self.assertLogs('monitoring.nplusone', level='WARNING') as logs:
+            response = middleware(self.request)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Possible N+1 queries in /api/v1/posts/all/', logs.output[0])
+
+    @override_settings(NPLUSONE_RAISE=False, NPLUSONE_SAMPLE_RATE=0.0)
+    def test_n_plus_one_not_sampled(self):
+        response = NPlusOneMiddleware(posts_with_authors)(self.request)
+
+        self.assertEqual(response.status_code, 200)
+
+    def test_raise_only_in_tests(self):
+        env = {name: value for name, value in os.environ.items() if name != 'NPLUSONE_RAISE'}
+        completed = subprocess.run(
+            [sys.executable, 'manage.py', 'shell', '-c', 'from django.conf import settings; print(settings.NPLUSONE_RAISE)'],
+            cwd=settings.BASE_DIR, env=env, capture_output=True, text=True,
+        )
+
+        self.assertEqual(completed.stdout.strip(), 'False')
+
+
+class ServerTimingTestCase(TestCase):
+
+    def setUp(self):
+        self.admin = User.objects.create(email='admin@email.com', user_type='admin')
+        self.token = Token.objects.create(user=self.admin)
+        Post.objects.create(title='title', text='text', user_id=self.admin)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+
+    def test_server_timing_header(self):
+        response = self.client.get(reverse('posts:all_posts'))
+        metrics = dict(
+            (part.split(';')[0], part) for part in response['Server-Timing'].split(', ')
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(list(metrics), ['auth', 'permissions', 'sql', 'serialize', 'render', 'total'])
+        self.assertRegex(metrics['sql'], r'^sql;dur=[\d.]+;desc="\d+ queries"$')
+        self.assertRegex(metrics['auth'], r'^auth;dur=[\d.]+;desc="Authentication"$')
+
+    def test_server_timing_log(self):
+        with self.assertLogs('monitoring.timing', level='INFO') as logs:
+            self.client.get(reverse('posts:all_posts'), {'q': 'title'})
+
+        record = json.loads(logs.records[0].getMessage())
+
+        self.assertEqual(record['view'], 'posts:all_posts')
+        self.assertEqual(record['status'], 200)
+        self.assertEqual(record['queries'], 2)
+        self.assertEqual(set(record['timings_ms']), {'auth', 'permissions', 'sql', 'serialize', 'render', 'total'})
+        self.assertLessEqual(record['timings_ms']['sql'], record['timings_ms']['total'])
+
+    def test_server_timing_nested_phase(self):
+        timings = RequestTimings()
+        with patch('monitoring.timing.time.perf_counter', side_effect=[0.0, 1.0, 1.25, 1.5, 2.0, 4.0]):
+            timings.start('handler')
+            with timings.phase('permissions'):
+                timings(lambda *args: None, 'SELECT 1', None, False, {})
+            timings.stop('handler')
+
+        self.assertEqual(timings.durations['handler'], 3.0)
+        self.assertEqual(timings.durations['permissions'], 1.0)
+        self.assertEqual(dict(timings.phase_sql), {'permissions': 0.25})
+        self.assertEqual(timings.metrics()['serialize'], 3000.0)
+
+    def test_server_timing_unauthorized(self):
+        response = Client().get(reverse('posts:all_posts'))
+
+        self.assertEqual(response.status_code, 401)
+        self.assertIn('auth;dur=', response['Server-Timing'])
+        self.assertNotIn('serialize;dur=', response['Server-Timing'])
+
+
+class MetricsTestCase(TestCase):
+
+    def setUp(self):
+        self.admin = User.objects.create(email='admin@email.com', user_type='admin')
+        self.token = Token.objects.create(user=self.admin)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+
+        self.registry = MetricsRegistry()
+        for target in ('monitoring.metrics.registry', 'monitoring.views.registry'):
+            patcher = patch(target, self.registry)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_metrics_endpoint(self):
+        self.client.get(reverse('posts:all_posts'))
+        self.client.get(reverse('posts:all_posts'))
+        Client().get(reverse('posts:all_posts'))
+
+        response = Client().get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer secret')
+        content = response.content.decode()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        self.assertIn('# TYPE http_request_duration_seconds histogram', content)
+        self.assertIn('http_requests_total{view="posts:all_posts",method="GET",status="200"} 2', content)
+        self.assertIn('http_requests_total{view="posts:all_posts",method="GET",status="401"} 1', content)
+        self.assertIn('http_request_duration_seconds_bucket{view="posts:all_posts",le="+Inf"} 3', content)
+        self.assertIn('http_request_duration_seconds_count{view="posts:all_posts"} 3', content)
+        self.assertIn('http_requests_in_flight{view="posts:all_posts"} 0', content)
+        self.assertIn('http_requests_in_flight{view="metrics"} 1', content)
+        self.assertRegex(content, r'db_queries_total\{view="posts:all_posts"\} [1-9]')
+
+    def test_metrics_of_failed_request(self):
+        def failing_view(request):
+            User.objects.count()
+            raise ValueError('failed')
+
+        request = RequestFactory().get('/failing/')
+        middleware = MetricsMiddleware(failing_view)
+        with self.assertRaises(ValueError):
+            middleware(request)
+
+        values, histograms = self.registry.collect()
+        view = (('view', 'unmatched'), )
+        self.assertEqual(values[('http_requests_total', view + (('method', 'GET'), ('status', '500')))], 1)
+        self.assertEqual(values[('db_queries_total', view)], 1)
+        self.assertEqual(histograms[('http_request_duration_seconds', view)][2], 1)
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_negative_metrics_endpoint_wrong_token(self):
+        response = Client().get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer wrong')
+        token_response = Client().get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer secret')
+
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(token_response.status_code, 200)
+
+    @override_settings(METRICS_TOKEN=None)
+    def test_negative_metrics_endpoint_without_token_setting(self):
+        response = Client().get(reverse('metrics'))
+        bearer_response = Client().get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer None')
+
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(bearer_response.status_code, 401)
+
+    def test_metrics_of_all_processes(self):
+        view = (('view', 'posts:all_posts'), )
+        finished_process = subprocess.Popen(['true'])
+        finished_process.wait()
+
+        with tempfile.TemporaryDirectory() as directory:
+            registry = MetricsRegistry(directory=directory)
+            registry.inc('http_requests_in_flight', view)
+            registry.observe('http_request_duration_seconds', view, 0.02)
+            for pid in (os.getppid(), finished_process.pid):
+                worker = MetricsRegistry(directory=directory)
+                worker.inc('http_requests_in_flight', view)
+                worker.observe('http_request_duration_seconds', view, 0.2)
+                snapshot = dict(worker.snapshot(), pid=pid)
+                with open(os.path.join(directory, f'metrics-{pid}.json'), 'w') as file:
+                    json.dump(snapshot, file)
+
+            content = registry.render()
+
+        self.assertIn('http_requests_in_flight{view="posts:all_posts"} 2', content)
+        self.assertIn('http_request_duration_seconds_bucket{view="posts:all_posts",le="0.025"} 1', content)
+        self.assertIn('http_request_duration_seconds_bucket{view="posts:all_posts",le="0.25"} 3', content)
+        self.assertIn('http_request_duration_seconds_count{view="posts:all_posts"} 3', content)
+        self.assertIn('http_request_duration_seconds_sum{view="posts:all_posts"} 0.42', content)
+
+
+def busy_request(stop):
+    while not stop.is_set():
+        sum(range(1000))
+
+
+class ProfilerTestCase(TestCase):
+
+    def setUp(self):
+        self.session = ProfileSession.objects.create(url_name='posts:all_posts', duration=30, interval=1)
+
+    def sample(self, url_name, seconds=0.2):
+        stop = threading.Event()
+        worker = threading.Thread(target=busy_request, args=(stop, ))
+        worker.start()
+        profiler.active_requests[worker.ident] = url_name
+        try:
+            sampler = profiler.Sampler(self.session.id, self.session.url_name, 0.001, time.monotonic() + seconds)
+            return sampler.collect()
+        finally:
+            profiler.active_requests.pop(worker.ident, None)
+            stop.set()
+            worker.join()
+
+    def test_sampler_collects_stacks_of_requests(self):
+        stacks, samples = self.sample('posts:all_posts')
+
+        self.assertGreater(samples, 0)
+        self.assertEqual(sum(stacks.values()), samples)
+        self.assertTrue(all('test_monitoring.tests:busy_request' in stack for stack in stacks))
+        self.assertTrue(all(stack.startswith('threading:') for stack in stacks))
+
+    def test_sampler_filters_url_name(self):
+        stacks, samples = self.sample('posts:one_post', seconds=0.05)
+
+        self.assertEqual(samples, 0)
+        self.assertEqual(stacks, Counter())
+
+    def test_save_result_and_merge(self):
+        sampler = profiler.Sampler(self.session.id, '', 0.01, time.monotonic())
+        sampler.save_result(Counter({'a:f;b:g': 3, 'a:f': 1}), 4)
+        sampler.save_result(Counter({'a:f;b:g': 2}), 2)
+
+        results = ProfileResult.objects.filter(session=self.session)
+        self.assertEqual(sorted(result.samples for result in results), [2, 4])
+        self.assertEqual(
+            profiler.merge_collapsed(result.stacks for result in results),
+            Counter({'a:f;b:g': 5, 'a:f': 1}),
+        )
+
+    def test_controller_starts_and_stops_samplers(self):
+        ended = ProfileSession.objects.create(duration=30)
+        ProfileSession.objects.filter(id=ended.id).update(ends=timezone.now() - timedelta(seconds=1))
+        controller = profiler.ProfilerController(poll_interval=1)
+
+        with patch.object(profiler.Sampler, 'start'), patch.object(profiler.Sampler, 'is_alive', return_value=True):
+            controller.poll()
+            self.assertEqual(list(controller.samplers), [self.session.id])
+            sampler = controller.samplers[self.session.id]
+            self.assertEqual(sampler.url_name, 'posts:all_posts')
+            self.assertEqual(sampler.interval, 0.001)
+
+            ProfileSession.objects.filter(id=self.session.id).update(ends=timezone.now())
+            with self.captureOnCommitCallbacks(execute=True):
+                profiler.sessions_changed()
+            controller.poll()
+
+        self.assertLessEqual(sampler.deadline, time.monotonic())
+
+    def test_controller_reads_sessions_after_version_changed(self):
+        controller = profiler.ProfilerController(poll_interval=1)
+
+        with patch.object(profiler.Sampler, 'start'):
+            controller.poll()
+            with self.assertNumQueries(0):
+                controller.poll()
+
+            with self.captureOnCommitCallbacks(execute=True):
+                session = ProfileSession.objects.create(duration=30)
+            with self.assertNumQueries(1):
+                controller.poll()
+
+        self.assertEqual(sorted(controller.samplers), [self.session.id, session.id])
+
+    def test_admin_stop_sessions_changes_version(self):
+        admin = User.objects.create_superuser('admin@email.com', 'password')
+        client = Client()
+        client.force_login(admin)
+        version = cache.get(profiler.SESSIONS_VERSION_KEY)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = client.post(reverse('admin:monitoring_profilesession_changelist'), {
+                'action': 'stop_sessions', '_selected_action': [self.session.id],
+            })
+
+        self.session.refresh_from_db()
+        self.assertEqual(response.status_code, 302)
+        self.assertFalse(self.session.is_active)
+        self.assertNotEqual(cache.get(profiler.SESSIONS_VERSION_KEY), version)
+
+    def test_admin_download_collapsed_stacks(self):
+        admin = User.objects.create_superuser('admin@email.com', 'password')
+        for stacks in ('a:f;b:g 3\na:f 1\n', 'a:f;b:g 2\n'):
+            ProfileResult.objects.create(session=self.session, pid=1, samples=1, stacks=stacks)
+        client = Client()
+        client.force_login(admin)
+
+        list_response = client.get(reverse('admin:monitoring_profilesession_changelist'))
+        response = client.get(reverse('admin:monitoring_profilesession_collapsed', args=(self.session.id, )))
+
+        self.assertEqual(list_response.status_code, 200)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Disposition'], f'attachment; filename="profile-{self.session.id}.collapsed"')
+        self.assertEqual(response.content.decode(), 'a:f;b:g 5\na:f 1\n')
+
+    def test_negative_admin_download_anonymous(self):
+        response = Client().get(reverse('admin:monitoring_profilesession_collapsed', args=(self.session.id, )))
+
+        self.assertEqual(response.status_code, 302)
+
+
+@override_settings(ALLOCATION_PROFILE_VIEWS=['posts:all_posts', 'companies:all_companies'], ALLOCATION_PROFILE_TOP=5)
+class AllocationProfilerTestCase(TestCase):
+
+    def setUp(self):
+        company = Company.objects.create(name='company', url='https://company.com', address='address',
+                                         date_created='2021-01-01')
+        self.admin = User.objects.create(email='admin@email.com', user_type='admin', company_id=company)
+        self.token = Token.objects.create(user=self.admin)
+        for index in range(50):
+            Post.objects.create(title=f'title_{index}', text='text ' * 100, user_id=self.admin)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+
+    def test_allocations_logged(self):
+        with self.assertLogs('monitoring.allocations', level='INFO') as logs:
+            response = self.client.get(reverse('posts:all_posts'))
+
+        record = json.loads(logs.records[0].getMessage())
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(record['view'], 'posts:all_posts')
+        self.assertGreater(record['peak_kb'], 0)
+        self.assertGreaterEqual(record['peak_kb'], record['allocated_kb'])
+        self.assertTrue(1 <= len(record['top']) <= 5)
+        self.assertRegex(record['top'][0]['site'], r'^\S+\.py:\d+$')
+        self.assertFalse(trace_lock.locked())
+
+    def test_allocations_of_streamed_response(self):
+        with self.assertLogs('monitoring.allocations', level='INFO') as logs:
+            response = self.client.get(reverse('companies:all_companies', args=('full', )), {'stream': 'true'})
+            self.assertEqual(logs.records, [])
+            content = json.loads(b''.join(response.streaming_content))
+
+        record = json.loads(logs.records[0].getMessage())
+
+        self.assertEqual(len(content[0]['employees'][0]['posts']), 50)
+        self.assertEqual(record['view'], 'companies:all_companies')
+        self.assertGreater(record['peak_kb'], 0)
+        self.assertFalse(trace_lock.locked())
+
+    def test_other_views_not_traced(self):
+        with self.assertLogs('monitoring.allocations', level='INFO') as logs:
+            self.client.get(reverse('posts:all_posts'))
+            self.client.get(reverse('users:account'))
+
+        self.assertEqual(len(logs.records), 1)
+
+    def test_request_skipped_while_another_traced(self):
+        with trace_lock, patch('monitoring.allocations.logger') as logger:
+            response = self.client.get(reverse('posts:all_posts'))
+
+        self.assertEqual(response.status_code, 200)
+        logger.info.assert_not_called()
+
+    def test_short_path(self):
+        self.assertEqual(short_path('/usr/lib/python3/site-packages/django/db/models/base.py'),
+                         'django/db/models/base.py')
+        self.assertEqual(short_path(os.path.join(settings.BASE_DIR, 'posts', 'views.py')), 'posts/views.py')
+
+
+@override_settings(SLOW_QUERY_THRESHOLD_MS=0, SLOW_QUERY_EXPLAIN_RATE=1.0)
+class SlowQueryTestCase(TestCase):
+
+    def setUp(self):
+        self.admin = User.objects.create(email='admin@email.com', user_type='admin')
+        self.token = Token.objects.create(user=self.admin)
+        Post.objects.create(title='title', text='text', user_id=self.admin)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+
+    def test_slow_queries_logged_with_plan(self):
+        self.client.get(reverse('posts:all_posts'), {'q': 'title'})
+
+        queries = list(SlowQuery.objects.order_by('id'))
+        search = queries[-1]
+
+        self.assertEqual({query.view for query in queries}, {'posts:all_posts'})
+        self.assertIn('"posts_post"', search.sql)
+        self.assertNotIn('title', search.params)
+        self.assertIn('posts/views.py', search.stack)
+        self.assertIn('cost=', search.plan)
+        self.assertNotIn('actual time=', search.plan)
+
+    @override_settings(SLOW_QUERY_EXPLAIN_ANALYZE=True)
+    def test_slow_queries_explain_analyze(self):
+        self.client.get(reverse('posts:all_posts'), {'q': 'title'})
+
+        search = SlowQuery.objects.order_by('id').last()
+        self.assertIn('actual time=', search.plan)
+        self.assertIn('Execution Time', search.plan)
+
+    @override_settings(SLOW_QUERY_EXPLAIN_RATE=0.0)
+    def test_slow_queries_not_explained(self):
+        self.client.get(reverse('posts:all_posts'))
+
+        self.assertTrue(SlowQuery.objects.exists())
+        self.assertFalse(SlowQuery.objects.exclude(plan='').exists())
+
+    def test_writes_not_explained(self):
+        self.client.post(reverse('posts:create_post'), {'title': 'new', 'text': 'text'}, format='json')
+
+        insert = SlowQuery.objects.get(sql__startswith='INSERT INTO "posts_post"')
+        self.assertEqual(insert.plan, '')
+        self.assertEqual(Post.objects.count(), 2)
+
+    @override_settings(SLOW_QUERY_THRESHOLD_MS=-1)
+    def test_negative_slow_query_log_off(self):
+        self.client.get(reverse('posts:all_posts'))
+
+        self.assertFalse(SlowQuery.objects.exists())
+
+    def test_ring_buffer(self):
+        for index in range(5):
+            save_slow_queries([SlowQuery(duration=index, sql='SELECT ?')], size=3)
+
+        self.assertEqual(list(SlowQuery.objects.values_list('duration', flat=True)), [4, 3, 2])
+
+    def test_redact_params(self):
+        self.assertEqual(
+            redact_params(('user@email.com', 5, None, True, ['%title%'], datetime.date(2021, 1, 1))),
+            ['<redacted>', 5, None, True, ['<redacted>'], '2021-01-01'],
+        )
+
+    def test_admin_slow_query(self):
+        admin = User.objects.create_superuser('super@email.com', 'password')
+        self.client.get(reverse('posts:all_posts'), {'q': 'title'})
+        client = Client()
+        client.force_login(admin)
+
+        list_response = client.get(reverse('admin:monitoring_slowquery_changelist'))
+        query = SlowQuery.objects.exclude(plan='').first()
+        response = client.get(reverse('admin:monitoring_slowquery_change', args=(query.id, )))
+
+        self.assertEqual(list_response.status_code, 200)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'cost=')
@@ -0,0 +1,142 @@
+import json
+import logging
+import time
+from collections import defaultdict
+from contextlib import ExitStack, contextmanager, nullcontext
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+# Server-Timing metrics in the order they are sent, with their descriptions
+METRICS = (
+    ('auth', 'Authentication'),
+    ('permissions', 'Permission classes'),
+    ('sql', 'SQL'),
+    ('serialize', 'View and serializers without SQL'),
+    ('render', 'Rendering'),
+    ('total', 'Total'),
+)
+
+
+class RequestTimings:
+    """
+    Durations of the phases of one request, also a connection.execute_wrapper that sums the SQL time
+    of the whole request and of every phase.
+
+    A phase started inside another one, like object permissions inside the handler, is not counted in the
+    enclosing phase, neither its time nor its SQL.
+    """
+
+    def __init__(self):
+        self.durations = defaultdict(float)
+        self.phase_sql = defaultdict(float)
+        self.sql = 0.0
+        self.queries = 0
+        self.current = None
+        self._started = {}
+        self._nested = defaultdict(float)
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - started
+            self.sql += duration
+            self.queries += 1
+            self.phase_sql[self.current] += duration
+
+    @contextmanager
+    def phase(self, name):
+        self.start(name)
+        try:
+            yield
+        finally:
+            self.stop(name)
+
+    def start(self, name):
+        self._started[name] = (time.perf_counter(), self.current)
+        self.current = name
+
+    def stop(self, name):
+        if name not in self._started:
+            return
+        started, previous = self._started.pop(name)
+        duration = time.perf_counter() - started
+        self.durations[name] += duration - self._nested.pop(name, 0.0)
+        if previous is not None:
+            self._nested[previous] += duration
+        self.current = previous
+
+    def metrics(self):
+        """
+        Milliseconds of every measured metric, serialize is the view handler time without its SQL.
+        """
+        values = {name: self.durations[name] for name in ('auth', 'permissions', 'render', 'total')
+                  if name in self.durations}
+        values['sql'] = self.sql
+        if 'handler' in self.durations:
+            values['serialize'] = max(self.durations['handler'] - self.phase_sql['handler'], 0.0)
+        return {name: round(values[name] * 1000, 3) for name, _ in METRICS if name in values}
+
+    def header(self):
+        metrics = self.metrics()
+        parts = []
+        for name, description in METRICS:
+            value = metrics.get(name)
+            if value is None:
+                continue
+            if name == 'sql':
+                description = f'{self.queries} queries'
+            parts.append(f'{name};dur={value};desc="{description}"')
+        return ', '.join(parts)
+
+
+def timing_phase(request, name):
+    """
+    Context manager timing a phase of the request, does nothing without ServerTimingMiddleware.
+    """
+    timings = getattr(request, 'server_timing', None)
+    return timings.phase(name) if timings is not None else nullcontext()
+
+
+class ServerTimingMiddleware:
+    """
+    Measures every request, sends the phases as a Server-Timing header and logs them as one JSON line.
+
+    Phases inside DRF are measured by views based on monitoring.views.TimedAPIView and by
+    monitoring.renderers.TimedJSONRenderer, SQL time by an execute_wrapper.
+    The SQL of a streamed response runs after the request and is not included.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.send_header = settings.SERVER_TIMING_HEADER
+
+    def __call__(self, request):
+        timings = RequestTimings()
+        request.server_timing = timings
+
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(timings))
+            response = self.get_response(request)
+        timings.durations['total'] = time.perf_counter() - started
+
+        if self.send_header:
+            response['Server-Timing'] = timings.header()
+
+        match = request.resolver_match
+        record = {
+            'method': request.method,
+            'path': request.path,
+            'view': match.view_name if match else None,
+            'status': response.status_code,
+            'queries': timings.queries,
+            'timings_ms': timings.metrics(),
+        }
+        logger.info(json.dumps(record), extra={'server_timing': record})
+        return response
@@ -0,0 +1,50 @@
+from django.conf import settings
+from django.http import HttpResponse
+from rest_framework.views import APIView
+
+from .metrics import registry
+from .timing import timing_phase
+
+
+class ServerTimingMixin:
+    """
+    APIView mixin that times authentication, permission classes and the handler of the request.
+    """
+
+    def perform_authentication(self, request):
+        with timing_phase(request, 'auth'):
+            super().perform_authentication(request)
+
+    def check_permissions(self, request):
+        with timing_phase(request, 'permissions'):
+            super().check_permissions(request)
+
+    def check_object_permissions(self, request, obj):
+        with timing_phase(request, 'permissions'):
+            super().check_object_permissions(request, obj)
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        timings = getattr(request, 'server_timing', None)
+        if timings is not None:
+            timings.start('handler')
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        timings = getattr(request, 'server_timing', None)
+        if timings is not None:
+            timings.stop('handler')
+        return super().finalize_response(request, response, *args, **kwargs)
+
+
+class TimedAPIView(ServerTimingMixin, APIView):
+    pass
+
+
+def metrics(request):
+    """
+    Metrics of all worker processes in the Prometheus text format, the scraper has to send METRICS_TOKEN
+    as a bearer token. Without METRICS_TOKEN every request is refused.
+    """
+    if not settings.METRICS_TOKEN or request.headers.get('Authorization') != f'Bearer {settings.METRICS_TOKEN}':
+        return HttpResponse('Unauthorized', status=401, content_type='text/plain')
+    return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,18 @@
+# Generated by Django 3.2.9 on 2026-10-18 06:10
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0003_post_search_vector'),
+    ]
+
+    operations = [
+        # Serves `title__istartswith`, which Django renders as UPPER("title"::text) LIKE UPPER('prefix%')
+        migrations.RunSQL(
+            'CREATE INDEX posts_post_title_upper_like ON posts_post (UPPER(title::text) text_pattern_ops);',
+            'DROP INDEX IF EXISTS posts_post_title_upper_like;',
+        ),
+    ]
@@ -0,0 +1,34 @@
+from django.db import migrations
+
+BATCH_SIZE = 10000
+
+
+def backfill_search_vector(apps, schema_editor):
+    """
+    Fill search_vector of the existing posts through the trigger of 0003, one id range per statement.
+    The migration is not atomic, every batch is committed on its own and holds row locks only on its range.
+    """
+    Post = apps.get_model('posts', 'Post')
+    table = schema_editor.quote_name(Post._meta.db_table)
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(f'SELECT MIN(id), MAX(id) FROM {table}')
+        first_id, last_id = cursor.fetchone()
+        if first_id is None:
+            return
+        for start in range(first_id, last_id + 1, BATCH_SIZE):
+            cursor.execute(
+                f'UPDATE {table} SET id = id WHERE id >= %s AND id < %s AND search_vector IS NULL',
+                [start, start + BATCH_SIZE],
+            )
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('posts', '0004_post_title_prefix_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_search_vector, migrations.RunPython.noop),
+    ]
@@ -1,11 +1,53 @@
-from django.db import models
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
+from django.db import connections, models, router
+
+
+class PostManager(models.Manager):
+    def bulk_upsert(self, posts, batch_size, owner_only=False):
+        """
+        Insert posts or update text and topic of the existing posts with the same title,
+        with one `INSERT ... ON CONFLICT (title) DO UPDATE` statement per batch.
+
+        With owner_only an existing post is updated only when its user_id is the one of the item. The owner is
+        checked by the same statement under the row lock, so a concurrent request can not change it in between.
+
+        Return (ids of created posts, ids of updated posts, indexes of posts not updated because of another owner).
+        """
+        created, updated, foreign = [], [], []
+        sql = (
+            'INSERT INTO {table} (title, text, topic, user_id_id) VALUES {values} '
+            'ON CONFLICT (title) DO UPDATE SET text = EXCLUDED.text, topic = EXCLUDED.topic {where}'
+            'RETURNING id, title, (xmax = 0) AS inserted'
+        )
+        table = self.model._meta.db_table
+        where = f'WHERE {table}.user_id_id = EXCLUDED.user_id_id ' if owner_only else ''
+
+        with connections[self._db or router.db_for_write(self.model)].cursor() as cursor:
+            for start in range(0, len(posts), batch_size):
+                batch = posts[start:start + batch_size]
+                values = ', '.join(['(%s, %s, %s, %s)'] * len(batch))
+                params = [value for post in batch for value in (post['title'], post['text'], post['topic'], post['user_id'])]
+                cursor.execute(sql.format(table=table, values=values, where=where), params)
+
+                written = set()
+                for post_id, title, inserted in cursor.fetchall():
+                    (created if inserted else updated).append(post_id)
+                    written.add(title)
+                foreign.extend(start + index for index, post in enumerate(batch) if post['title'] not in written)
+
+        return created, updated, foreign
 
 
 class Post(models.Model):
     title = models.CharField('Title Post', max_length=40, unique=True, null=False, blank=False)
     user_id = models.ForeignKey('users.User', on_delete=models.CASCADE)
     text = models.TextField('Text for Post')
-    topic = models.CharField('Topic Post', max_length=20, null=False, blank=True)
+    topic = models.CharField('Topic Post', max_length=20, null=False, blank=True, db_index=True)
+    # Filled by a database trigger from title, topic and text (see migration 0003)
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    objects = PostManager()
 
     def __str__(self):
         return self.title
@@ -13,3 +55,6 @@ class Post(models.Model):
     class Meta:
         verbose_name = 'Post'
         verbose_name_plural = 'Posts'
+        indexes = [
+            GinIndex(fields=['search_vector']),
+        ]
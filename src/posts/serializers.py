@@ -1,4 +1,5 @@
 import logging
+from collections import Counter, defaultdict
 
 from rest_framework.serializers import ModelSerializer
 from rest_framework import serializers
@@ -11,7 +12,7 @@ from users.serializers import UserSerializer
 class PostSerializer(ModelSerializer):
     class Meta:
         model = Post
-        fields = '__all__'
+        exclude = ('search_vector', )
 
 
 class PostsSerializer(ModelSerializer):
@@ -48,3 +49,54 @@ class PostBulkUpdateSerializer(ModelSerializer):
     class Meta:
         model = Post
         fields = ('posts_to_update', )
+
+
+class PostBulkItemSerializer(ModelSerializer):
+    """
+    One post of a bulk request.
+
+    Title uniqueness and user existence are not validated per item, use validate_batch for the whole list.
+    """
+    title = serializers.CharField(required=True, max_length=40)
+    text = serializers.CharField(required=True)
+    topic = serializers.CharField(required=False, allow_blank=True, max_length=20, default='')
+    user_id = serializers.IntegerField(required=False, min_value=1)
+
+    class Meta:
+        model = Post
+        fields = ('title', 'text', 'topic', 'user_id')
+
+    @staticmethod
+    def validate_batch(posts, request_user, check_titles=True):
+        """
+        Validate already cleaned posts of one bulk request with one query for all user ids
+        and one query for all titles. Missing user_id defaults to the request user.
+
+        Return dict item index -> field errors.
+        """
+        errors = defaultdict(dict)
+
+        for post in posts:
+            post.setdefault('user_id', request_user.id)
+
+        user_ids = {post['user_id'] for post in posts}
+        existed_users = set(User.objects.filter(id__in=user_ids).values_list('id', flat=True))
+
+        titles = [post['title'] for post in posts]
+        existed_titles = set()
+        if check_titles:
+            existed_titles = set(Post.objects.filter(title__in=titles).values_list('title', flat=True))
+        title_counts = Counter(titles)
+
+        for index, post in enumerate(posts):
+            if request_user.user_type == 'client' and post['user_id'] != request_user.id:
+                errors[index]['user_id'] = ["You're can't create post for another user"]
+            elif post['user_id'] not in existed_users:
+                errors[index]['user_id'] = [f'User with id={post["user_id"]} does not exist']
+
+            if post['title'] in existed_titles:
+                errors[index]['title'] = [f'Post with title={post["title"]} already exist']
+            elif title_counts[post['title']] > 1:
+                errors[index]['title'] = [f'Title {post["title"]} is repeated in request']
+
+        return dict(errors)
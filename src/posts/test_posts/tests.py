@@ -1,18 +1,39 @@
 import logging
-
+import os
+import subprocess
+import sys
+from base64 import b64encode
+from importlib import import_module
+from unittest.mock import patch
+
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.db.models.deletion import Collector
+from django.db.models.signals import post_delete, post_save
+from django.test import RequestFactory, TestCase, override_settings
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APITestCase, APIClient
 
 from companies.serializers import CompanySerializer
+from monitoring.metrics import MetricsRegistry
+from monitoring.models import ProfileResult, SlowQuery
 from posts.models import Post
-from posts.serializers import PostsSerializer, PostSerializer
+from posts.views import PostsView
+from posts.serializers import PostBulkItemSerializer, PostsSerializer, PostSerializer
+from test_task import object_cache
+from test_task.identity_map import IdentityMapMiddleware, forget, forget_written_instance, get_object
+from test_task.pagination import IdCursorPagination
+from users.custom_permissions import IsOwnerOrAccessDenied
 from users.models import User
 from companies.models import Company
 from users.tests_users.conftest import init_login_super_user, init_login_simple_user
+from test_task.query_budget import QueryBudgetMixin, QueryBudgetExceeded, QUERY_BUDGETS
 
 
-class PostsAPITestCase(APITestCase):
+class PostsAPITestCase(QueryBudgetMixin, APITestCase):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.api_client = APIClient()
@@ -100,7 +121,7 @@ class PostsAPITestCase(APITestCase):
 
     @init_login_super_user
     def test_posts_lst(self):
-        posts = Post.objects.select_related('user_id').all()
+        posts = Post.objects.select_related('user_id').order_by('id')
         expected_response = PostsSerializer(posts, many=True)
 
         url = reverse('posts:all_posts')
@@ -108,7 +129,196 @@ class PostsAPITestCase(APITestCase):
         response = self.client.get(url)
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(response.data, expected_response.data)
+        self.assertEqual(response.data['results'], expected_response.data)
+        self.assertIsNone(response.data['next'])
+
+    @init_login_super_user
+    def test_posts_lst_cursor_pagination(self):
+        url = reverse('posts:all_posts')
+
+        response = self.client.get(url, {'page_size': 2})
+        next_response = self.client.get(response.data['next'])
+        previous_response = self.client.get(next_response.data['previous'])
+
+        self.assertEqual([post['id'] for post in response.data['results']], [self.post_1.id, self.post_2.id])
+        self.assertEqual([post['id'] for post in next_response.data['results']], [self.post_3.id])
+        self.assertIsNone(next_response.data['next'])
+        self.assertEqual(previous_response.data['results'], response.data['results'])
+
+    @init_login_super_user
+    def test_posts_lst_page_size_cap(self):
+        url = reverse('posts:all_posts')
+
+        with patch.object(IdCursorPagination, 'max_page_size', 1):
+            response = self.client.get(url, {'page_size': 1000})
+
+        self.assertEqual(len(response.data['results']), 1)
+        self.assertIsNotNone(response.data['next'])
+
+    @init_login_super_user
+    def test_posts_lst_search_ranked(self):
+        in_title = Post.objects.create(title='Django tips', user_id=self.simple_user, text='Short text', topic='dev')
+        in_text = Post.objects.create(title='Other', user_id=self.simple_user, text='A note about django', topic='dev')
+        url = reverse('posts:all_posts')
+
+        response = self.client.get(url, {'q': 'django'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([post['id'] for post in response.data['results']], [in_title.id, in_text.id])
+
+    def test_backfill_search_vector(self):
+        backfill = import_module('posts.migrations.0005_backfill_post_search_vector')
+        with connection.cursor() as cursor:
+            cursor.execute('SET CONSTRAINTS ALL IMMEDIATE')
+            cursor.execute('ALTER TABLE posts_post DISABLE TRIGGER posts_post_search_vector_trigger')
+            cursor.execute('UPDATE posts_post SET search_vector = NULL')
+            cursor.execute('ALTER TABLE posts_post ENABLE TRIGGER posts_post_search_vector_trigger')
+        self.assertTrue(Post.objects.filter(search_vector__isnull=True).exists())
+
+        with patch.object(backfill, 'BATCH_SIZE', 1), connection.schema_editor(atomic=False) as schema_editor:
+            backfill.backfill_search_vector(apps, schema_editor)
+
+        self.assertFalse(Post.objects.filter(search_vector__isnull=True).exists())
+
+    @init_login_super_user
+    def test_posts_lst_search_cursor_pagination(self):
+        for index in range(3):
+            Post.objects.create(title=f'Django {index}', user_id=self.simple_user, text='django', topic='dev')
+        url = reverse('posts:all_posts')
+
+        response = self.client.get(url, {'q': 'django', 'page_size': 2})
+        next_response = self.client.get(response.data['next'])
+
+        found = [post['id'] for post in response.data['results'] + next_response.data['results']]
+        self.assertEqual(len(found), 3)
+        self.assertEqual(len(set(found)), 3)
+        self.assertIsNone(next_response.data['next'])
+
+    @init_login_super_user
+    def test_posts_lst_search_cursor_over_tied_ranks(self):
+        tied = [
+            Post.objects.create(title=f'Same {index}', user_id=self.simple_user, text='django', topic='dev')
+            for index in range(5)
+        ]
+        url = reverse('posts:all_posts')
+
+        found = []
+        response = self.client.get(url, {'q': 'django', 'page_size': 2})
+        while True:
+            found += [post['id'] for post in response.data['results']]
+            if response.data['next'] is None:
+                break
+            self.assertNotIn('o%3D', response.data['next'])
+            response = self.client.get(response.data['next'])
+        previous_response = self.client.get(response.data['previous'])
+
+        ranks = PostsView.search('django', '', '').filter(id__in=found).values_list('rank', flat=True)
+        self.assertEqual(len(set(ranks)), 1)
+        self.assertEqual(found, sorted((post.id for post in tied), reverse=True))
+        self.assertEqual([post['id'] for post in previous_response.data['results']], found[2:4])
+
+    @init_login_super_user
+    def test_negative_posts_lst_search_invalid_cursor(self):
+        url = reverse('posts:all_posts')
+        cursor = b64encode(b'p=%28rank%2Cid%29').decode()
+
+        response = self.client.get(url, {'q': 'django', 'cursor': cursor})
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    @init_login_super_user
+    def test_negative_posts_lst_search_with_title(self):
+        url = reverse('posts:all_posts')
+
+        response = self.client.get(url, {'q': 'django', 'title': 'django'})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @init_login_super_user
+    def test_posts_lst_search_exact_topic_and_company(self):
+        other_company = Company.objects.create(name='name_2', date_created='2001-10-21')
+        other_user = User.objects.create(email='other@email.com', company_id=other_company)
+        other_post = Post.objects.create(title='Text in other company', user_id=other_user, text='text', topic='news')
+        url = reverse('posts:all_posts')
+
+        by_topic = self.client.get(url, {'q': 'text', 'topic': 'news'})
+        by_company = self.client.get(url, {'q': 'text', 'company': 'name_1'})
+        by_partial_company = self.client.get(url, {'q': 'text', 'company': 'name'})
+
+        self.assertEqual({post['id'] for post in by_topic.data['results']}, {self.post_1.id, other_post.id})
+        self.assertEqual(
+            {post['id'] for post in by_company.data['results']}, {self.post_1.id, self.post_2.id, self.post_3.id}
+        )
+        self.assertEqual(by_partial_company.data['results'], [])
+
+    @init_login_super_user
+    def test_posts_lst_icontains_fallback(self):
+        url = reverse('posts:all_posts')
+
+        response = self.client.get(url, {'title': 'title 2', 'company': 'NAME'})
+
+        self.assertEqual([post['id'] for post in response.data['results']], [self.post_2.id])
+
+    @init_login_super_user
+    def test_autocomplete_posts(self):
+        url = reverse('posts:autocomplete_posts')
+
+        response = self.client.get(url, {'prefix': 'new title', 'limit': 2})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['results'], [
+            {'id': self.post_1.id, 'title': self.post_1.title},
+            {'id': self.post_2.id, 'title': self.post_2.title},
+        ])
+
+    @init_login_simple_user
+    def test_negative_autocomplete_posts_wrong_permission(self):
+        url = reverse('posts:autocomplete_posts')
+
+        response = self.client.get(url, {'prefix': 'new'})
+
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def add_posts(self, prefix='more'):
+        for user_index in range(3):
+            user = User.objects.create(email=f'{prefix}_{user_index}@email.com', company_id=self.company_1)
+            Post.objects.bulk_create(
+                Post(title=f'{prefix} news {user_index} {index}', user_id=user, text='More text', topic='news')
+                for index in range(5)
+            )
+
+    @init_login_super_user
+    def test_posts_lst_constant_queries(self):
+        url = reverse('posts:all_posts')
+
+        for index, query in enumerate(({}, {'q': 'news'}, {'topic': 'news'})):
+            with self.subTest(query=query):
+                self.assertQueriesConstant(lambda: self.client.get(url, query), lambda: self.add_posts(f'more_{index}'))
+
+    @init_login_simple_user
+    def test_company_posts_lst_constant_queries(self):
+        url = reverse('posts:one_company_posts')
+
+        self.assertQueriesConstant(lambda: self.client.get(url), self.add_posts)
+
+    @init_login_super_user
+    def test_negative_query_budget_exceeded(self):
+        url = reverse('posts:all_posts')
+
+        with patch.dict(QUERY_BUDGETS, {'posts:all_posts': 1}):
+            with self.assertRaises(QueryBudgetExceeded):
+                self.client.get(url)
+
+    @init_login_simple_user
+    def test_company_posts_lst(self):
+        posts = Post.objects.filter(user_id__company_id=self.company_1).order_by('id')
+        expected_response = PostSerializer(posts, many=True)
+        url = reverse('posts:one_company_posts')
+
+        response = self.client.get(url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['results'], expected_response.data)
 
     def test_negative_get_post_unauthorized(self):
         url = reverse('posts:one_post', args=(self.post_1.id, ))
@@ -154,6 +364,16 @@ class PostsAPITestCase(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(response.data, serializer.data)
 
+    @init_login_simple_user
+    def test_get_post_loaded_once(self):
+        response = self.client.get(reverse('posts:one_post', args=(self.post_1.id, )))
+        missing_response = self.client.get(reverse('posts:one_post', args=(5000, )))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(missing_response.status_code, status.HTTP_404_NOT_FOUND)
+        # The token and the post, the permission and the view share the post
+        self.assertEqual(self.client.last_queries, 2)
+
     @init_login_simple_user
     def test_negative_update_post_wrong_id(self):
         url = reverse('posts:one_post', args=(5000, ))
@@ -239,39 +459,503 @@ class PostsAPITestCase(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_201_CREATED)
         self.assertEqual(response.data['title'], data['title'])
 
-    # @init_login_simple_user
-    # def test_negative_bulk_update_posts_by_client_wrong_permission(self):
-    #     url = reverse('posts:bulk_update_post')
-    #     post_1 = Post.objects.get(id=self.post_1.id)
-    #     post_2 = Post.objects.get(id=self.post_3.id)
-    #     data = {
-    #         'posts_to_update': [{'id': self.post_1.id, 'title': 'Updated Title'}, {'id': self.post_3.id, 'title': 'Updated title 2'}]
-    #     }
-    #
-    #     response = self.client.patch(url, data=data)
-    #     updated_post_1 = Post.objects.get(id=self.post_1.id)
-    #     updated_post_2 = Post.objects.get(id=self.post_3.id)
-    #
-    #     self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
-    #     self.assertEqual(updated_post_1.title, post_1.title)
-    #     self.assertEqual(updated_post_2.title, post_2.title)
-    #
-    # @init_login_super_user
-    # def test_bulk_update_posts_by_admin(self):
-    #     url = reverse('posts:bulk_update_post')
-    #     post_1 = Post.objects.get(id=self.post_1.id)
-    #     post_2 = Post.objects.get(id=self.post_2.id)
-    #     expected_message = 'Successfully update posts'
-    #     data = {
-    #         'posts_to_update': [{'id': self.post_1.id, 'title': 'Updated Title'}, {'id': self.post_2.id, 'title': 'Updated title 2', 'topic': 'new_one'}]
-    #     }
-    #
-    #     response = self.client.patch(url, data=data)
-    #     updated_post_1 = Post.objects.get(id=self.post_1.id)
-    #     updated_post_2 = Post.objects.get(id=self.post_2.id)
-    #
-    #     self.assertEqual(response.status_code, status.HTTP_200_OK)
-    #     self.assertEqual(response.data['message'], expected_message)
-    #     self.assertNotEqual(updated_post_1.title, post_1.title)
-    #     self.assertNotEqual(updated_post_2.title, post_2.title)
-    #     self.assertNotEqual(updated_post_2.topic, post_2.topic)
+    @init_login_simple_user
+    def test_bulk_create_posts(self):
+        url = reverse('posts:bulk_create_post')
+        data = {
+            'posts': [
+                {'title': 'Bulk 1', 'text': 'Text', 'topic': 'news'},
+                {'title': 'Bulk 2', 'text': 'Text', 'user_id': self.simple_user.id},
+            ]
+        }
+
+        response = self.client.post(url, data=data, format='json')
+        created_posts = Post.objects.filter(id__in=response.data['ids']).order_by('id')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['created'], 2)
+        self.assertEqual([post.title for post in created_posts], ['Bulk 1', 'Bulk 2'])
+        self.assertEqual({post.user_id for post in created_posts}, {self.simple_user})
+
+    @init_login_simple_user
+    def test_negative_bulk_create_posts_per_item_errors(self):
+        url = reverse('posts:bulk_create_post')
+        data = {
+            'posts': [
+                {'title': 'Bulk 1', 'text': 'Text'},
+                {'title': self.post_1.title, 'text': 'Text'},
+                {'title': 'Bulk 2', 'text': 'Text', 'user_id': self.simple_user2.id},
+                {'title': 'Bulk 1', 'text': 'Text'},
+            ]
+        }
+
+        response = self.client.post(url, data=data, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual([error['index'] for error in response.data['errors']], [0, 1, 2, 3])
+        self.assertIn('user_id', response.data['errors'][2]['errors'])
+        self.assertFalse(Post.objects.filter(title__startswith='Bulk').exists())
+
+    @init_login_simple_user
+    def test_negative_bulk_create_posts_title_taken_after_validation(self):
+        url = reverse('posts:bulk_create_post')
+        data = {'posts': [{'title': 'Bulk 1', 'text': 'Text'}, {'title': self.post_1.title, 'text': 'Text'}]}
+        original = PostBulkItemSerializer.validate_batch
+        calls = []
+
+        def validate_batch(posts, request_user, check_titles=True):
+            # The first validation runs before another request creates the title
+            calls.append(posts)
+            return original(posts, request_user, check_titles=check_titles and len(calls) > 1)
+
+        with patch.object(PostBulkItemSerializer, 'validate_batch', validate_batch):
+            response = self.client.post(url, data=data, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['errors'], [
+            {'index': 1, 'errors': {'title': [f'Post with title={self.post_1.title} already exist']}},
+        ])
+        self.assertFalse(Post.objects.filter(title='Bulk 1').exists())
+
+    @init_login_super_user
+    def test_negative_bulk_create_posts_wrong_field(self):
+        url = reverse('posts:bulk_create_post')
+        data = {
+            'posts': [{'title': 'Bulk 1', 'text': 'Text', 'user_id': 50000}, {'text': 'Text'}]
+        }
+
+        response = self.client.post(url, data=data, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['errors'], [{'index': 1, 'errors': {'title': ['This field is required.']}}])
+
+    @init_login_super_user
+    def test_bulk_create_posts_constant_queries(self):
+        url = reverse('posts:bulk_create_post')
+
+        data = {'posts': [{'title': 'Bulk', 'text': 'Text', 'user_id': self.simple_user.id}]}
+        self.client.post(url, data=data, format='json')
+        few_posts_queries = self.client.last_queries
+        data = {'posts': [{'title': f'Bulk {index}', 'text': 'Text', 'user_id': self.simple_user2.id} for index in range(20)]}
+        response = self.client.post(url, data=data, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self.client.last_queries, few_posts_queries)
+
+    @init_login_simple_user
+    def test_bulk_upsert_posts(self):
+        url = reverse('posts:bulk_upsert_post')
+        data = {
+            'posts': [
+                {'title': self.post_1.title, 'text': 'Updated text', 'topic': 'updated'},
+                {'title': 'Upsert 1', 'text': 'Text'},
+            ]
+        }
+
+        response = self.client.post(url, data=data, format='json')
+        updated_post = Post.objects.get(id=self.post_1.id)
+        created_post = Post.objects.get(title='Upsert 1')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, {'created': 1, 'updated': 1})
+        self.assertEqual((updated_post.text, updated_post.topic), ('Updated text', 'updated'))
+        self.assertEqual(created_post.user_id, self.simple_user)
+
+    @init_login_simple_user
+    def test_negative_bulk_upsert_posts_of_another_user(self):
+        url = reverse('posts:bulk_upsert_post')
+        data = {
+            'posts': [{'title': 'Upsert 1', 'text': 'Text'}, {'title': self.post_3.title, 'text': 'Updated text'}]
+        }
+
+        response = self.client.post(url, data=data, format='json')
+        not_updated_post = Post.objects.get(id=self.post_3.id)
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual([error['index'] for error in response.data['errors']], [1])
+        self.assertEqual(not_updated_post.text, self.post_3.text)
+        self.assertFalse(Post.objects.filter(title='Upsert 1').exists())
+
+    def test_bulk_upsert_owner_only(self):
+        posts = [
+            {'title': 'Upsert 1', 'text': 'Text', 'topic': '', 'user_id': self.simple_user.id},
+            {'title': self.post_1.title, 'text': 'Updated text', 'topic': '', 'user_id': self.simple_user.id},
+            {'title': self.post_3.title, 'text': 'Updated text', 'topic': '', 'user_id': self.simple_user.id},
+        ]
+
+        created, updated, foreign = Post.objects.bulk_upsert(posts, batch_size=2, owner_only=True)
+
+        self.assertEqual(created, [Post.objects.get(title='Upsert 1').id])
+        self.assertEqual(updated, [self.post_1.id])
+        self.assertEqual(foreign, [2])
+        self.assertEqual(Post.objects.get(id=self.post_3.id).text, self.post_3.text)
+
+    @init_login_super_user
+    def test_bulk_upsert_posts_in_batches(self):
+        url = reverse('posts:bulk_upsert_post')
+        data = {
+            'posts': [{'title': f'Upsert {index}', 'text': 'Text', 'user_id': self.simple_user2.id} for index in range(5)]
+            + [{'title': self.post_3.title, 'text': 'Updated text'}]
+        }
+
+        with self.settings(POSTS_BULK_BATCH_SIZE=2):
+            response = self.client.post(url, data=data, format='json')
+
+        self.assertEqual(response.data, {'created': 5, 'updated': 1})
+        self.assertEqual(Post.objects.get(id=self.post_3.id).text, 'Updated text')
+        self.assertEqual(Post.objects.filter(title__startswith='Upsert', user_id=self.simple_user2).count(), 5)
+
+    @init_login_simple_user
+    def test_negative_bulk_update_posts_by_client_wrong_permission(self):
+        url = reverse('posts:bulk_update_post')
+        data = {
+            'posts_to_update': [{'id': self.post_1.id, 'title': 'Updated Title'}, {'id': self.post_3.id, 'title': 'Updated title 2'}]
+        }
+
+        response = self.client.patch(url, data=data, format='json')
+        updated_post_1 = Post.objects.get(id=self.post_1.id)
+        updated_post_3 = Post.objects.get(id=self.post_3.id)
+
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(updated_post_1.title, self.post_1.title)
+        self.assertEqual(updated_post_3.title, self.post_3.title)
+
+    @init_login_simple_user
+    def test_bulk_update_posts_by_client(self):
+        url = reverse('posts:bulk_update_post')
+        data = {
+            'posts_to_update': [{'id': self.post_1.id, 'title': 'Updated Title'}, {'id': self.post_2.id, 'topic': 'new_one'}]
+        }
+
+        response = self.client.patch(url, data=data, format='json')
+        updated_post_1 = Post.objects.get(id=self.post_1.id)
+        updated_post_2 = Post.objects.get(id=self.post_2.id)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(updated_post_1.title, 'Updated Title')
+        self.assertEqual(updated_post_2.title, self.post_2.title)
+        self.assertEqual(updated_post_2.topic, 'new_one')
+
+    @init_login_super_user
+    def test_bulk_update_posts_by_admin(self):
+        url = reverse('posts:bulk_update_post')
+        expected_message = 'Successfully update posts'
+        data = {
+            'posts_to_update': [{'id': self.post_1.id, 'title': 'Updated Title'}, {'id': self.post_3.id, 'title': 'Updated title 2', 'topic': 'new_one'}]
+        }
+
+        response = self.client.patch(url, data=data, format='json')
+        updated_post_1 = Post.objects.get(id=self.post_1.id)
+        updated_post_3 = Post.objects.get(id=self.post_3.id)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['message'], expected_message)
+        self.assertNotEqual(updated_post_1.title, self.post_1.title)
+        self.assertNotEqual(updated_post_3.title, self.post_3.title)
+        self.assertNotEqual(updated_post_3.topic, self.post_3.topic)
+
+    @init_login_super_user
+    def test_negative_bulk_update_posts_per_item_errors(self):
+        url = reverse('posts:bulk_update_post')
+        data = {
+            'posts_to_update': [
+                {'id': self.post_1.id, 'title': 'Updated Title'},
+                {'id': self.post_2.id, 'title': self.post_3.title},
+                {'id': 5000, 'title': 'Other Title'},
+                {'id': self.post_3.id, 'title': 'Updated Title'},
+            ]
+        }
+
+        response = self.client.patch(url, data=data, format='json')
+        updated_post_1 = Post.objects.get(id=self.post_1.id)
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['errors'], [
+            {'id': self.post_2.id, 'error': f'Post with title={self.post_3.title} already exist'},
+            {'id': 5000, 'error': 'Post with id=5000 does not exist'},
+            {'id': self.post_3.id, 'error': 'Post with title=Updated Title already exist'},
+        ])
+        self.assertEqual(updated_post_1.title, self.post_1.title)
+
+    @init_login_super_user
+    def test_negative_bulk_update_posts_wrong_id(self):
+        url = reverse('posts:bulk_update_post')
+        data = {
+            'posts_to_update': [{'id': 5000, 'title': 'Updated Title'}]
+        }
+
+        response = self.client.patch(url, data=data, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    @init_login_simple_user
+    def test_bulk_update_posts_constant_queries(self):
+        url = reverse('posts:bulk_update_post')
+        posts = Post.objects.bulk_create(
+            Post(title=f'Bulk {index}', user_id=self.simple_user, text='text') for index in range(10)
+        )
+
+        data = {'posts_to_update': [{'id': posts[0].id, 'title': 'First'}]}
+        self.client.patch(url, data=data, format='json')
+        few_posts_queries = self.client.last_queries
+        data = {'posts_to_update': [{'id': post.id, 'title': f'New {post.title}'} for post in posts]}
+        response = self.client.patch(url, data=data, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.client.last_queries, few_posts_queries)
+
+
+    @init_login_super_user
+    @override_settings(OBJECT_CACHE_ENABLED=True)
+    def test_one_post_object_cache(self):
+        cache.clear()
+        url = reverse('posts:one_post', args=(self.post_1.id, ))
+
+        self.client.get(url)
+        uncached_queries = self.client.last_queries
+        cached = self.client.get(url)
+        cached_queries = self.client.last_queries
+        self.client.patch(url, data={'title': 'Patched Title'}, format='json')
+        patched = self.client.get(url)
+
+        self.assertEqual(cached.data, PostSerializer(self.post_1).data)
+        self.assertEqual(cached_queries, uncached_queries - 1)
+        self.assertEqual(patched.data['title'], 'Patched Title')
+
+    @init_login_super_user
+    @override_settings(OBJECT_CACHE_ENABLED=True)
+    def test_bulk_writes_invalidate_object_cache(self):
+        cache.clear()
+        url = reverse('posts:bulk_update_post')
+        self.client.get(reverse('posts:one_post', args=(self.post_1.id, )))
+
+        self.client.patch(url, data={'posts_to_update': [{'id': self.post_1.id, 'title': 'Bulk Title'}]}, format='json')
+        response = self.client.get(reverse('posts:one_post', args=(self.post_1.id, )))
+
+        self.assertEqual(response.data['title'], 'Bulk Title')
+
+
+class OwnerPermissionTestCase(TestCase):
+
+    def setUp(self):
+        self.owner = User.objects.create(email='owner@email.com')
+        self.other = User.objects.create(email='other@email.com')
+        self.admin = User.objects.create(email='admin@email.com', user_type='admin')
+        self.post = Post.objects.create(title='title', text='text', user_id=self.owner)
+
+    def has_permission(self, user, **kwargs):
+        request = RequestFactory().get('/')
+        request.user = user
+        view = type('View', (), {'kwargs': kwargs})()
+        return IsOwnerOrAccessDenied().has_permission(request, view)
+
+    def test_ownership_by_exists_query(self):
+        with self.assertNumQueries(1):
+            self.assertTrue(self.has_permission(self.owner, post_id=self.post.id))
+        with self.assertNumQueries(1):
+            self.assertFalse(self.has_permission(self.other, post_id=self.post.id))
+        with self.assertNumQueries(1):
+            self.assertTrue(self.has_permission(self.other, post_id=5000))
+
+    def test_ownership_without_query(self):
+        with self.assertNumQueries(0):
+            self.assertTrue(self.has_permission(self.admin, post_id=self.post.id))
+            self.assertTrue(self.has_permission(self.other))
+
+    def test_object_ownership(self):
+        request = RequestFactory().get('/')
+        permission = IsOwnerOrAccessDenied()
+
+        with self.assertNumQueries(0):
+            request.user = self.owner
+            self.assertTrue(permission.has_object_permission(request, None, self.post))
+            request.user = self.other
+            self.assertFalse(permission.has_object_permission(request, None, self.post))
+
+
+class IdentityMapTestCase(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create(email='simple@email.com')
+        self.post = Post.objects.create(title='title', text='text', user_id=self.user)
+        self.request = RequestFactory().get('/')
+
+    def in_request(self, view):
+        return IdentityMapMiddleware(view)(self.request)
+
+    def test_get_object_once_per_request(self):
+        def view(request):
+            with self.assertNumQueries(2):
+                post = get_object(Post, self.post.id)
+                self.assertIs(get_object(Post, str(self.post.id)), post)
+                with self.assertRaises(Post.DoesNotExist):
+                    get_object(Post, 5000)
+                with self.assertRaises(Post.DoesNotExist):
+                    get_object(Post, 5000)
+            return post
+
+        self.assertEqual(self.in_request(view), self.post)
+        self.assertEqual(self.in_request(view), self.post)
+
+    def test_get_object_after_write(self):
+        def view(request):
+            post = get_object(Post, self.post.id)
+            Post.objects.filter(id=self.post.id).update(title='updated')
+            forget(Post)
+            updated = get_object(Post, self.post.id)
+            updated.title = 'saved'
+            updated.save()
+            saved = get_object(Post, self.post.id)
+            saved.delete()
+            with self.assertRaises(Post.DoesNotExist):
+                get_object(Post, self.post.id)
+            return post, updated, saved
+
+        post, updated, saved = self.in_request(view)
+
+        self.assertEqual(post.title, 'title')
+        self.assertEqual(updated.title, 'saved')
+        self.assertIsNot(saved, updated)
+
+    def test_get_object_outside_request(self):
+        with self.assertNumQueries(2):
+            get_object(Post, self.post.id)
+            get_object(Post, self.post.id)
+
+    def test_negative_get_object_of_other_model(self):
+        with self.assertRaises(ValueError):
+            get_object(SlowQuery, 1)
+
+    def test_receivers_only_for_identity_map_models(self):
+        def receivers(model):
+            return [receiver for receiver in post_save._live_receivers(model) + post_delete._live_receivers(model)
+                    if receiver is forget_written_instance]
+
+        self.assertEqual(len(receivers(Post)), 2)
+        self.assertEqual(receivers(SlowQuery), [])
+
+
+@override_settings(OBJECT_CACHE_ENABLED=True)
+class ObjectCacheTestCase(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.registry = MetricsRegistry()
+        patcher = patch('test_task.object_cache.registry', self.registry)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.company = Company.objects.create(name='name', date_created='2001-10-21')
+        self.user = User.objects.create(email='simple@email.com', company_id=self.company)
+        self.post = Post.objects.create(title='title', text='text', user_id=self.user)
+
+    def lookups(self, result):
+        return self.registry.collect()[0][('object_cache_total', (('model', 'posts.Post'), ('result', result)))]
+
+    def test_read_through(self):
+        with self.assertNumQueries(1):
+            post = object_cache.get(Post, self.post.id)
+            cached = object_cache.get(Post, self.post.id)
+
+        self.assertEqual(cached, post)
+        self.assertIsNot(cached, post)
+        self.assertEqual((cached.title, cached.user_id_id), ('title', self.user.id))
+        self.assertEqual(cached.get_deferred_fields(), {'search_vector'})
+        self.assertEqual((self.lookups('miss'), self.lookups('hit')), (1, 1))
+
+    def test_negative_caching(self):
+        with self.assertNumQueries(1):
+            for _ in range(2):
+                with self.assertRaises(Post.DoesNotExist):
+                    object_cache.get(Post, 5000)
+        self.assertEqual(self.lookups('negative_hit'), 1)
+
+        created = Post.objects.bulk_create([Post(id=5000, title='created', text='text', user_id=self.user)])
+        object_cache.invalidate(Post, [post.id for post in created])
+
+        self.assertEqual(object_cache.get(Post, 5000).title, 'created')
+
+    def test_write_through(self):
+        object_cache.get(Post, self.post.id)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.post.title = 'saved'
+            self.post.save()
+        with self.assertNumQueries(0):
+            self.assertEqual(object_cache.get(Post, self.post.id).title, 'saved')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Post.objects.filter(id=self.post.id).update(title='updated')
+            Post.objects.get(id=self.post.id).save(update_fields=['text'])
+        self.assertEqual(object_cache.get(Post, self.post.id).title, 'updated')
+
+        post_id = self.post.id
+        with self.captureOnCommitCallbacks(execute=True):
+            self.post.delete()
+        with self.assertNumQueries(0), self.assertRaises(Post.DoesNotExist):
+            object_cache.get(Post, post_id)
+
+    def test_set_null_relations_invalidated(self):
+        object_cache.get(User, self.user.id)
+
+        self.company.delete()
+
+        self.assertIsNone(object_cache.get(User, self.user.id).company_id_id)
+
+    def test_password_not_cached(self):
+        User.objects.filter(id=self.user.id).update(password='hash')
+        object_cache.get(User, self.user.id)
+
+        values = cache.get(object_cache.cache_key(User, self.user.id))
+        with self.assertNumQueries(1):
+            user = object_cache.get(User, self.user.id)
+            self.assertEqual(user.password, 'hash')
+
+        self.assertNotIn('hash', values)
+        self.assertNotIn('password', [field.name for field in object_cache.cached_fields(User)])
+
+    def test_fast_delete_of_not_cached_models(self):
+        collector = Collector(using='default')
+
+        self.assertTrue(collector.can_fast_delete(SlowQuery.objects.all()))
+        self.assertTrue(collector.can_fast_delete(ProfileResult.objects.all()))
+        self.assertFalse(collector.can_fast_delete(Post.objects.all()))
+
+    def test_schema_version_in_key(self):
+        key = object_cache.cache_key(Post, str(self.post.id))
+
+        self.assertEqual(key, f'object-cache:{object_cache.schema_version(Post)}:posts.post:{self.post.id}')
+        self.assertNotEqual(object_cache.schema_version(Post), object_cache.schema_version(User))
+
+    @override_settings(OBJECT_CACHE_MODELS=['users.User'])
+    def test_not_cached_model(self):
+        with self.assertNumQueries(2):
+            object_cache.get(Post, self.post.id)
+            object_cache.get(Post, self.post.id)
+
+    def test_get_object_cached(self):
+        object_cache.get(Post, self.post.id)
+
+        def view(request):
+            with self.assertNumQueries(0):
+                return get_object(Post, self.post.id, cached=True)
+
+        self.assertEqual(IdentityMapMiddleware(view)(RequestFactory().get('/')), self.post)
+
+    def test_negative_local_cache_with_several_workers(self):
+        def check(**variables):
+            env = {name: value for name, value in os.environ.items() if not name.startswith('CACHE_')}
+            return subprocess.run(
+                [sys.executable, 'manage.py', 'check'],
+                cwd=settings.BASE_DIR, env=dict(env, **variables), capture_output=True, text=True,
+            )
+
+        refused = check(WEB_CONCURRENCY='2')
+        disabled = check(WEB_CONCURRENCY='2', OBJECT_CACHE_ENABLED='false', AUTH_TOKEN_CACHE_SIZE='0',
+                         PROFILER_ENABLED='false')
+        shared = check(WEB_CONCURRENCY='2', CACHE_BACKEND='django.core.cache.backends.filebased.FileBasedCache',
+                       CACHE_LOCATION='/tmp/django_cache')
+
+        self.assertNotEqual(refused.returncode, 0)
+        self.assertIn('OBJECT_CACHE_ENABLED, AUTH_TOKEN_CACHE_SIZE, PROFILER_ENABLED need a cache shared', refused.stderr)
+        self.assertEqual(disabled.returncode, 0, disabled.stderr)
+        self.assertEqual(shared.returncode, 0, shared.stderr)
@@ -1,14 +1,18 @@
 from django.contrib import admin
 from django.urls import path, re_path
 
-from .views import PostsView, PostView, PostCreateView, PostBulkUpdateView, CompanyPostsView
+from .views import (PostsView, PostView, PostCreateView, PostBulkCreateView, PostBulkUpsertView, PostBulkUpdateView,
+                    CompanyPostsView, PostAutocompleteView)
 
 app_name = 'posts'
 
 urlpatterns = [
     path('all/', PostsView.as_view(), name='all_posts'),
     path('company', CompanyPostsView.as_view(), name='one_company_posts'),
+    path('autocomplete/', PostAutocompleteView.as_view(), name='autocomplete_posts'),
     path('post/create', PostCreateView.as_view(), name='create_post'),
+    path('bulk_create/', PostBulkCreateView.as_view(), name='bulk_create_post'),
+    path('bulk_upsert/', PostBulkUpsertView.as_view(), name='bulk_upsert_post'),
     path('bulk_update/', PostBulkUpdateView.as_view(), name='bulk_update_post'),
     path('post/<int:post_id>', PostView.as_view(), name='one_post'),
 ]
@@ -1,62 +1,171 @@
 import logging
 
-from django.db.models import Q
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F, FloatField, Q
+from django.db.models.functions import Cast
 from drf_yasg import openapi
 from drf_yasg.utils import swagger_auto_schema
-from rest_framework.authentication import TokenAuthentication
 from rest_framework.permissions import IsAuthenticated
-from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 
+from companies.models import Company
+from monitoring.views import TimedAPIView
+from test_task.autocomplete import PREFIX_PARAM, LIMIT_PARAM, get_autocomplete_limit
+from test_task.identity_map import get_object
+from test_task.object_cache import invalidate
+from test_task.pagination import IdCursorPagination, RankCursorPagination, CURSOR_PARAM, PAGE_SIZE_PARAM
 from users.custom_permissions import IsAdminOrSuperAdmin, IsOwnerOrAccessDenied, IsOwnerAllPostsOrAccessDenied
 from .models import Post
-from .serializers import PostSerializer, PostsSerializer, PostUpdateSerializer, PostBulkUpdateSerializer
+from .serializers import (PostSerializer, PostsSerializer, PostUpdateSerializer, PostBulkUpdateSerializer,
+                          PostBulkItemSerializer)
 
 
 TITLE_PARAM = openapi.Parameter('title', openapi.IN_QUERY, type=openapi.TYPE_STRING)
 TEXT_PARAM = openapi.Parameter('text', openapi.IN_QUERY, type=openapi.TYPE_STRING)
 TOPIC_PARAM = openapi.Parameter('topic', openapi.IN_QUERY, type=openapi.TYPE_STRING)
 COMPANY_PARAM = openapi.Parameter('company', openapi.IN_QUERY, type=openapi.TYPE_STRING)
-
-
-class PostsView(APIView):
-    authentication_classes = [TokenAuthentication]
+SEARCH_PARAM = openapi.Parameter('q', openapi.IN_QUERY, type=openapi.TYPE_STRING)
+
+BULK_POSTS_BODY = openapi.Schema(type=openapi.TYPE_OBJECT, properties={
+    'posts': openapi.Schema(
+        type=openapi.TYPE_ARRAY,
+        items=openapi.Schema(type=openapi.TYPE_OBJECT, properties={
+            'title': openapi.Schema(type=openapi.TYPE_STRING),
+            'text': openapi.Schema(type=openapi.TYPE_STRING),
+            'topic': openapi.Schema(type=openapi.TYPE_STRING),
+            'user_id': openapi.Schema(type=openapi.TYPE_INTEGER),
+        }),
+    ),
+})
+BULK_POSTS_ERROR = openapi.Response(description='Error', examples={
+    "application/json": {
+        "errors": [{"index": 0, "errors": {"title": ["Post with title=New Title already exist"]}}],
+    }
+})
+
+
+def validate_bulk_posts(request, check_titles=True):
+    """
+    Validate the posts list of a bulk request.
+
+    Return (posts, None) with cleaned posts or (None, Response) with the per-item errors.
+    """
+    posts = request.data.get('posts')
+    if not isinstance(posts, list) or not posts:
+        return None, Response({'error': 'Field posts must be a non empty list'}, status=status.HTTP_400_BAD_REQUEST)
+    if len(posts) > settings.POSTS_BULK_MAX_ITEMS:
+        response = {'error': f'No more than {settings.POSTS_BULK_MAX_ITEMS} posts can be sent at once'}
+        return None, Response(response, status=status.HTTP_400_BAD_REQUEST)
+
+    serializer = PostBulkItemSerializer(data=posts, many=True)
+    if serializer.is_valid():
+        posts = serializer.validated_data
+        errors = PostBulkItemSerializer.validate_batch(posts, request.user, check_titles=check_titles)
+    else:
+        errors = dict(enumerate(serializer.errors))
+
+    if any(errors.values()):
+        return None, bulk_errors_response(errors)
+
+    return posts, None
+
+
+def bulk_errors_response(errors):
+    """
+    400 response with the errors of a bulk request, dict item index -> field errors, as a list of
+    {'index', 'errors'} items.
+    """
+    errors = [{'index': index, 'errors': item_errors} for index, item_errors in sorted(errors.items()) if item_errors]
+    return Response({'errors': errors}, status=status.HTTP_400_BAD_REQUEST)
+
+
+class PostsView(TimedAPIView):
     permission_classes = [IsAuthenticated, IsAdminOrSuperAdmin]
+    pagination_class = IdCursorPagination
 
     @swagger_auto_schema(
         operation_summary='List of all posts',
-        operation_description='Return list of all posts, or can filter result by some query param',
+        operation_description='Return one page of all posts, or can filter result by some query param. '
+                              'With q the posts are full-text searched over title, topic and text, ordered by '
+                              'relevance, topic and company must match exactly and title and text can not be sent',
         operation_id='All Posts',
-        manual_parameters=[TITLE_PARAM, TEXT_PARAM, TOPIC_PARAM, COMPANY_PARAM],
+        manual_parameters=[SEARCH_PARAM, TITLE_PARAM, TEXT_PARAM, TOPIC_PARAM, COMPANY_PARAM, CURSOR_PARAM,
+                           PAGE_SIZE_PARAM],
         responses={
-            200: PostsSerializer(many=True)
+            200: PostsSerializer(many=True),
+            400: openapi.Response(description='Error', examples={
+                "application/json": {
+                    "error": "Query params title and text can not be sent with q, it searches them already",
+                }
+            }),
         }
     )
     def get(self, request):
+        search = request.GET.get('q', '')
         title = request.GET.get('title', '')
         text = request.GET.get('text', '')
         topic = request.GET.get('topic', '')
         company = request.GET.get('company', '')
 
-        if title or text or topic or company:
+        if search and (title or text):
+            response = {'error': 'Query params title and text can not be sent with q, it searches them already'}
+            return Response(response, status=status.HTTP_400_BAD_REQUEST)
+        if search:
+            posts = self.search(search, topic, company)
+            paginator = RankCursorPagination()
+        elif title or text or topic or company:
             posts = Post.objects.select_related('user_id').filter(
                 Q(title__icontains=title) &
                 Q(text__icontains=text) &
                 Q(user_id__company_id__name__icontains=company) &
                 Q(topic__icontains=topic)
             )
+            paginator = self.pagination_class()
         else:
             posts = Post.objects.select_related('user_id').all()
+            paginator = self.pagination_class()
+
+        page = paginator.paginate_queryset(posts, request, view=self)
+        response = PostsSerializer(page, many=True)
+
+        return paginator.get_paginated_response(response.data)
 
-        response = PostsSerializer(posts, many=True)
+    @staticmethod
+    def search(search, topic, company):
+        """
+        Full-text search over the GIN indexed search_vector, annotated with a relevance rank.
 
-        return Response(response.data, status=status.HTTP_200_OK)
+        Exact topic and company filters go through their b-tree indexes, the company name is resolved to ids first.
+        """
+        query = SearchQuery(search, config='english', search_type='websearch')
+        posts = Post.objects.select_related('user_id').filter(search_vector=query).annotate(
+            rank=Cast(SearchRank(F('search_vector'), query), FloatField())
+        )
 
+        if topic:
+            posts = posts.filter(topic=topic)
+        if company:
+            company_ids = list(Company.objects.filter(name=company).values_list('id', flat=True))
+            posts = posts.filter(user_id__company_id__in=company_ids)
 
-class PostView(APIView):
-    authentication_classes = [TokenAuthentication]
+        return posts
+
+
+class PostView(TimedAPIView):
     permission_classes = [IsAuthenticated, IsOwnerOrAccessDenied]
+    object_permissions = True
+
+    def get_post(self, request, post_id, cached=False):
+        """
+        The post of the url checked by the object permissions, raises Post.DoesNotExist or PermissionDenied.
+        With cached=True it is read through the object cache, only for reading.
+        """
+        post = get_object(Post, post_id, cached=cached)
+        self.check_object_permissions(request, post)
+        return post
 
     @swagger_auto_schema(
         operation_summary='One Post',
@@ -73,7 +182,7 @@ class PostView(APIView):
     )
     def get(self, request, post_id):
         try:
-            post = Post.objects.get(id=post_id)
+            post = self.get_post(request, post_id, cached=True)
         except Post.DoesNotExist:
             response = {'error': f'Post with id={post_id} does not exist'}
             return Response(response, status=status.HTTP_404_NOT_FOUND)
@@ -107,7 +216,7 @@ class PostView(APIView):
     )
     def patch(self, request, post_id):
         try:
-            post = Post.objects.get(id=post_id)
+            post = self.get_post(request, post_id)
         except Post.DoesNotExist:
             response = {'error': f'Post with id={post_id} does not exist'}
             return Response(response, status=status.HTTP_404_NOT_FOUND)
@@ -140,7 +249,7 @@ class PostView(APIView):
     )
     def delete(self, request, post_id):
         try:
-            post = Post.objects.get(id=post_id)
+            post = self.get_post(request, post_id)
         except Post.DoesNotExist:
             response = {'error': f'Post with id={post_id} does not exist'}
             return Response(response, status=status.HTTP_404_NOT_FOUND)
@@ -150,8 +259,7 @@ class PostView(APIView):
         return Response({'message': f'Successfully delete post with id={post_id}'}, status.HTTP_200_OK)
 
 
-class PostCreateView(APIView):
-    authentication_classes = [TokenAuthentication]
+class PostCreateView(TimedAPIView):
     permission_classes = [IsAuthenticated]
 
     @swagger_auto_schema(
@@ -185,8 +293,87 @@ class PostCreateView(APIView):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
-class PostBulkUpdateView(APIView):
-    authentication_classes = [TokenAuthentication]
+class PostBulkCreateView(TimedAPIView):
+    permission_classes = [IsAuthenticated]
+
+    @swagger_auto_schema(
+        operation_summary='Create few posts at once',
+        operation_description='Create list of posts in one request. Clients can create posts only for themselves, '
+                              'nothing is created if any post is invalid',
+        operation_id='Bulk Create Post',
+        request_body=BULK_POSTS_BODY,
+        responses={
+            201: openapi.Response(description='Success', examples={
+                "application/json": {
+                    "created": 2,
+                    "ids": [1, 2],
+                }
+            }),
+            400: BULK_POSTS_ERROR,
+        }
+    )
+    def post(self, request):
+        posts, error_response = validate_bulk_posts(request)
+        if error_response:
+            return error_response
+
+        new_posts = [
+            Post(title=post['title'], text=post['text'], topic=post['topic'], user_id_id=post['user_id'])
+            for post in posts
+        ]
+        try:
+            with transaction.atomic():
+                created = Post.objects.bulk_create(new_posts, batch_size=settings.POSTS_BULK_BATCH_SIZE)
+                invalidate(Post, [post.id for post in created])
+        except IntegrityError:
+            # A title or a user changed by another request after the validation, validated again to report the items
+            errors = PostBulkItemSerializer.validate_batch(posts, request.user)
+            if any(errors.values()):
+                return bulk_errors_response(errors)
+            return Response({'error': 'Some of titles already exist'}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({'created': len(created), 'ids': [post.id for post in created]}, status=status.HTTP_201_CREATED)
+
+
+class PostBulkUpsertView(TimedAPIView):
+    permission_classes = [IsAuthenticated]
+
+    @swagger_auto_schema(
+        operation_summary='Create or update few posts at once',
+        operation_description='Create posts with new titles and update text and topic of posts whose title already '
+                              'exist. Clients can create and update only their own posts',
+        operation_id='Bulk Upsert Post',
+        request_body=BULK_POSTS_BODY,
+        responses={
+            200: openapi.Response(description='Success', examples={
+                "application/json": {
+                    "created": 2,
+                    "updated": 1,
+                }
+            }),
+            400: BULK_POSTS_ERROR,
+        }
+    )
+    def post(self, request):
+        posts, error_response = validate_bulk_posts(request, check_titles=False)
+        if error_response:
+            return error_response
+
+        with transaction.atomic():
+            created, updated, foreign = Post.objects.bulk_upsert(
+                posts, batch_size=settings.POSTS_BULK_BATCH_SIZE, owner_only=request.user.user_type == 'client'
+            )
+            if foreign:
+                transaction.set_rollback(True)
+                return bulk_errors_response({
+                    index: {'title': ["You're can't update post of another user"]} for index in foreign
+                })
+            invalidate(Post, created + updated)
+
+        return Response({'created': len(created), 'updated': len(updated)}, status=status.HTTP_200_OK)
+
+
+class PostBulkUpdateView(TimedAPIView):
     permission_classes = [IsAuthenticated, IsOwnerAllPostsOrAccessDenied]
 
     @swagger_auto_schema(
@@ -210,55 +397,117 @@ class PostBulkUpdateView(APIView):
                     "message": "Successfully update posts"
                 }
             }),
+            400: openapi.Response(description='Error', examples={
+                "application/json": {
+                    "errors": [{"id": 1, "error": "Post with title=New Title already exist"}],
+                }
+            }),
+            404: openapi.Response(description='Error', examples={
+                "application/json": {
+                    "errors": [{"id": 50, "error": "Post with id=50 does not exist"}],
+                }
+            }),
         }
     )
     def patch(self, request):
         posts = request.data.get('posts_to_update')
+        if not isinstance(posts, list):
+            return Response({'error': 'Field posts_to_update must be a list'}, status=status.HTTP_400_BAD_REQUEST)
 
-        post_to_update = []
+        post_ids = []
         for post in posts:
-            post_id = post.get('id', None)
             try:
-                post_id = int(post_id)
-            except Exception as e:
+                post_ids.append(int(post.get('id', None)))
+            except (AttributeError, TypeError, ValueError):
                 return Response({'error': 'Field id must be integer'}, status=status.HTTP_400_BAD_REQUEST)
-            title = post.get('title', '')
-            text = post.get('text', '')
-            topic = post.get('topic', '')
-            try:
-                real_post = Post.objects.get(id=post_id)
-            except Post.DoesNotExist:
-                return Response({'error': f'Post with id={post_id} does not exist'}, status.HTTP_404_NOT_FOUND)
 
-            exited_title = Post.objects.filter(title=title)
-            if exited_title:
-                return Response({'error': f'Post with title={title} already exist'}, status=status.HTTP_400_BAD_REQUEST)
+        titles = [post.get('title') for post in posts if post.get('title')]
+
+        with transaction.atomic():
+            real_posts = Post.objects.select_for_update().in_bulk(post_ids)
+            existed_titles = set(Post.objects.filter(title__in=titles).values_list('title', flat=True))
+
+            errors = []
+            missing_posts = 0
+            post_to_update = []
+            new_titles = set()
+            for post_id, post in zip(post_ids, posts):
+                title = post.get('title', '')
+                text = post.get('text', '')
+                topic = post.get('topic', '')
+
+                real_post = real_posts.get(post_id)
+                if real_post is None:
+                    errors.append({'id': post_id, 'error': f'Post with id={post_id} does not exist'})
+                    missing_posts += 1
+                    continue
 
-            real_post.title = title or real_post.title
-            real_post.text = text or real_post.text
-            real_post.topic = topic or real_post.topic
+                if title and (title in existed_titles or title in new_titles):
+                    errors.append({'id': post_id, 'error': f'Post with title={title} already exist'})
+                    continue
+                new_titles.add(title)
 
-            post_to_update.append(real_post)
+                real_post.title = title or real_post.title
+                real_post.text = text or real_post.text
+                real_post.topic = topic or real_post.topic
 
-        Post.objects.bulk_update(post_to_update, ['title', 'text', 'topic'])
+                post_to_update.append(real_post)
+
+            if errors:
+                if missing_posts == len(errors):
+                    return Response({'errors': errors}, status=status.HTTP_404_NOT_FOUND)
+                return Response({'errors': errors}, status=status.HTTP_400_BAD_REQUEST)
+
+            Post.objects.bulk_update(post_to_update, ['title', 'text', 'topic'])
+            invalidate(Post, [post.id for post in post_to_update])
 
         return Response({'message': 'Successfully update posts'}, status=status.HTTP_200_OK)
 
 
-class CompanyPostsView(APIView):
-    authentication_classes = [TokenAuthentication]
+class CompanyPostsView(TimedAPIView):
     permission_classes = [IsAuthenticated, ]
+    pagination_class = IdCursorPagination
 
     @swagger_auto_schema(
         operation_summary='List of all posts in one company',
-        operation_description='Return list of all posts in your company',
+        operation_description='Return one page of all posts in your company',
         operation_id='Your Company Posts',
+        manual_parameters=[CURSOR_PARAM, PAGE_SIZE_PARAM],
         responses={
             200: PostSerializer(many=True)
         }
     )
     def get(self, request):
-        posts = Post.objects.select_related('user_id__company_id').filter(user_id__company_id_id=request.user.company_id.id)
-        serializer = PostSerializer(posts, many=True)
+        posts = Post.objects.select_related('user_id__company_id').filter(user_id__company_id_id=request.user.company_id_id)
+        paginator = self.pagination_class()
+        page = paginator.paginate_queryset(posts, request, view=self)
+        serializer = PostSerializer(page, many=True)
 
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        return paginator.get_paginated_response(serializer.data)
+
+
+class PostAutocompleteView(TimedAPIView):
+    permission_classes = [IsAuthenticated, IsAdminOrSuperAdmin]
+
+    @swagger_auto_schema(
+        operation_summary='Autocomplete post titles',
+        operation_description='Return up to limit posts whose title starts with prefix, case insensitive',
+        operation_id='Autocomplete Posts',
+        manual_parameters=[PREFIX_PARAM, LIMIT_PARAM],
+        responses={
+            200: openapi.Response(description='Success', examples={
+                "application/json": {
+                    "results": [{"id": 1, "title": "New Title"}],
+                }
+            }),
+        }
+    )
+    def get(self, request):
+        prefix = request.GET.get('prefix', '')
+        if not prefix:
+            return Response({'results': []}, status=status.HTTP_200_OK)
+
+        posts = Post.objects.filter(title__istartswith=prefix).order_by('title').values('id', 'title')
+        posts = posts[:get_autocomplete_limit(request)]
+
+        return Response({'results': list(posts)}, status=status.HTTP_200_OK)
@@ -0,0 +1,11 @@
+from django.apps import AppConfig
+
+
+class TestTaskConfig(AppConfig):
+    name = 'test_task'
+    verbose_name = 'Test Task'
+
+    def ready(self):
+        from . import identity_map, object_cache
+        identity_map.connect_receivers()
+        object_cache.connect_receivers()
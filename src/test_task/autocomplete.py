@@ -0,0 +1,16 @@
+from django.conf import settings
+from drf_yasg import openapi
+
+PREFIX_PARAM = openapi.Parameter('prefix', openapi.IN_QUERY, type=openapi.TYPE_STRING, required=True)
+LIMIT_PARAM = openapi.Parameter('limit', openapi.IN_QUERY, type=openapi.TYPE_INTEGER)
+
+
+def get_autocomplete_limit(request):
+    """
+    Number of autocomplete suggestions asked for with ?limit=, capped by AUTOCOMPLETE_MAX_LIMIT.
+    """
+    try:
+        limit = int(request.GET.get('limit', settings.AUTOCOMPLETE_LIMIT))
+    except ValueError:
+        limit = settings.AUTOCOMPLETE_LIMIT
+    return max(1, min(limit, settings.AUTOCOMPLETE_MAX_LIMIT))
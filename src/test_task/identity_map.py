@@ -0,0 +1,109 @@
+from contextvars import ContextVar
+
+from django.apps import apps
+from django.conf import settings
+from django.db.models.signals import post_delete, post_save
+
+from . import object_cache
+
+# (concrete model, primary key) -> instance, or MISSING when the row does not exist, of the current request
+_identity_map = ContextVar('identity_map', default=None)
+
+MISSING = object()
+
+
+def identity_key(model, pk):
+    model = model._meta.concrete_model
+    return model, model._meta.pk.to_python(pk)
+
+
+def load(model, pk, cached):
+    if cached:
+        return object_cache.get(model, pk)
+    return model._default_manager.get(pk=pk)
+
+
+def get_object(model, pk, cached=False):
+    """
+    model.objects.get(pk=pk) loaded at most once per request, also a missing row raises DoesNotExist
+    without a second query. Outside of a request with IdentityMapMiddleware it is a plain get.
+
+    The same instance is returned to every caller of the request, a saved or deleted instance is
+    loaded again on the next call. Only models of IDENTITY_MAP_MODELS can be read. With cached=True a row not yet in the request is read through
+    the object cache (test_task.object_cache), only for instances that are not going to be saved.
+    """
+    if model._meta.concrete_model._meta.label not in settings.IDENTITY_MAP_MODELS:
+        raise ValueError(f'{model._meta.label} is not in IDENTITY_MAP_MODELS, its writes would not be seen')
+    identity_map = _identity_map.get()
+    if identity_map is None:
+        return load(model, pk, cached)
+
+    key = identity_key(model, pk)
+    instance = identity_map.get(key)
+    if instance is None:
+        try:
+            instance = load(model, pk, cached)
+        except model.DoesNotExist:
+            instance = MISSING
+        identity_map[key] = instance
+
+    if instance is MISSING:
+        raise model.DoesNotExist(f'{model._meta.object_name} matching query does not exist.')
+    return instance
+
+
+def remember(instance):
+    """
+    Adds an instance loaded some other way, like the authenticated user, to the identity map of the request.
+    """
+    identity_map = _identity_map.get()
+    if identity_map is not None and instance.pk is not None:
+        identity_map[identity_key(type(instance), instance.pk)] = instance
+
+
+def forget(model, pk=None):
+    """
+    Drops one instance or with pk=None all instances of the model, QuerySet.update() and bulk
+    writes send no signals and have to call it themselves.
+    """
+    identity_map = _identity_map.get()
+    if identity_map is None:
+        return
+    if pk is not None:
+        identity_map.pop(identity_key(model, pk), None)
+        return
+    model = model._meta.concrete_model
+    for key in [key for key in identity_map if key[0] is model]:
+        del identity_map[key]
+
+
+def forget_written_instance(sender, instance, **kwargs):
+    if instance.pk is not None:
+        forget(sender, instance.pk)
+
+
+def connect_receivers():
+    """
+    Connects forget_written_instance to the models of IDENTITY_MAP_MODELS only, a receiver without
+    a sender would keep Django from fast deleting the cascaded rows of every model.
+    """
+    for label in settings.IDENTITY_MAP_MODELS:
+        model = apps.get_model(label)
+        post_save.connect(forget_written_instance, sender=model)
+        post_delete.connect(forget_written_instance, sender=model)
+
+
+class IdentityMapMiddleware:
+    """
+    Gives every request its own identity map for get_object(), the map is dropped with the response.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = _identity_map.set({})
+        try:
+            return self.get_response(request)
+        finally:
+            _identity_map.reset(token)
@@ -0,0 +1,163 @@
+import hashlib
+from functools import lru_cache
+
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
+from django.db import router, transaction
+from django.db.models import SET_DEFAULT, SET_NULL
+from django.db.models.fields.files import FieldFile
+from django.db.models.signals import post_delete, post_save, pre_delete
+
+from monitoring.metrics import registry
+
+# Cached value of a primary key without a row, kept for OBJECT_CACHE_NEGATIVE_TTL seconds
+MISSING_ROW = 'missing'
+NOT_CACHED = object()
+# Secrets never written to the cache
+UNCACHED_FIELDS = ('password', )
+
+
+def snapshot(instance, fields=None):
+    """
+    Values of the concrete fields of a model instance, files as their names so no instance is shared.
+    """
+    values = []
+    for field in fields or type(instance)._meta.concrete_fields:
+        value = field.value_from_object(instance)
+        values.append(value.name if isinstance(value, FieldFile) else value)
+    return tuple(values)
+
+
+def restore(model, values, fields=None):
+    """
+    New model instance from a snapshot, like a row loaded from the database.
+    Concrete fields not in fields are deferred and loaded on access.
+    """
+    field_names = [field.attname for field in fields or model._meta.concrete_fields]
+    return model.from_db(router.db_for_read(model), field_names, values)
+
+
+@lru_cache(maxsize=None)
+def cached_fields(model):
+    """
+    Concrete fields kept in the cache, the ones filled by the database (editable=False, like the
+    search vector of a post) are left out because a saved instance does not know their values.
+    UNCACHED_FIELDS are left out too and are loaded on access.
+    """
+    return tuple(
+        field for field in model._meta.concrete_fields
+        if (field.editable or field.primary_key) and field.name not in UNCACHED_FIELDS
+    )
+
+
+@lru_cache(maxsize=None)
+def schema_version(model):
+    """
+    Short hash of the names and types of the cached fields, entries of an older schema are not read after a deploy.
+    """
+    schema = ';'.join(f'{field.attname}:{field.get_internal_type()}' for field in cached_fields(model))
+    return hashlib.md5(schema.encode()).hexdigest()[:8]
+
+
+def cache_key(model, pk):
+    model = model._meta.concrete_model
+    return f'object-cache:{schema_version(model)}:{model._meta.label_lower}:{model._meta.pk.to_python(pk)}'
+
+
+def is_cached(model):
+    return settings.OBJECT_CACHE_ENABLED and model._meta.concrete_model._meta.label in settings.OBJECT_CACHE_MODELS
+
+
+def count(model, result):
+    registry.inc('object_cache_total', (('model', model._meta.label), ('result', result)))
+
+
+def get(model, pk):
+    """
+    model.objects.get(pk=pk) read through the Django cache for the models in OBJECT_CACHE_MODELS,
+    a missing row is cached too and raises DoesNotExist without a query.
+
+    Every call returns a new instance. Use it for reads only, an instance to update should be loaded
+    from the database so a save does not write a stale cached value back.
+    """
+    if not is_cached(model):
+        return model._default_manager.get(pk=pk)
+
+    model = model._meta.concrete_model
+    key = cache_key(model, pk)
+    values = cache.get(key, NOT_CACHED)
+    if values == MISSING_ROW:
+        count(model, 'negative_hit')
+        raise model.DoesNotExist(f'{model._meta.object_name} matching query does not exist.')
+    if values is not NOT_CACHED:
+        count(model, 'hit')
+        return restore(model, values, cached_fields(model))
+
+    count(model, 'miss')
+    try:
+        instance = model._default_manager.get(pk=pk)
+    except model.DoesNotExist:
+        cache.set(key, MISSING_ROW, settings.OBJECT_CACHE_NEGATIVE_TTL)
+        raise
+    cache.set(key, snapshot(instance, cached_fields(model)), settings.OBJECT_CACHE_TTL)
+    return instance
+
+
+def invalidate(model, pks):
+    """
+    Drops the cached rows of the primary keys right away and again after the commit, a concurrent read
+    could cache the old row before it. QuerySet.update() and bulk writes send no signals and have to call it.
+    """
+    if not is_cached(model) or not pks:
+        return
+    keys = [cache_key(model, pk) for pk in pks]
+    cache.delete_many(keys)
+    transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def write_saved_instance(sender, instance, update_fields=None, raw=False, **kwargs):
+    if not is_cached(sender):
+        return
+    key = cache_key(sender, instance.pk)
+    cache.delete(key)
+
+    fields = cached_fields(sender._meta.concrete_model)
+    deferred = instance.get_deferred_fields()
+    if raw or update_fields is not None or any(field.attname in deferred for field in fields):
+        # Not every cached value is known, the next read loads the row
+        transaction.on_commit(lambda: cache.delete(key))
+        return
+    values = tuple(field.to_python(value) for field, value in zip(fields, snapshot(instance, fields)))
+    transaction.on_commit(lambda: cache.set(key, values, settings.OBJECT_CACHE_TTL))
+
+
+def write_deleted_instance(sender, instance, **kwargs):
+    if not is_cached(sender):
+        return
+    key = cache_key(sender, instance.pk)
+    cache.delete(key)
+    transaction.on_commit(lambda: cache.set(key, MISSING_ROW, settings.OBJECT_CACHE_NEGATIVE_TTL))
+
+
+def invalidate_set_null_relations(sender, instance, **kwargs):
+    # on_delete=SET_NULL and SET_DEFAULT are run as QuerySet.update(), like users of a deleted company
+    for relation in sender._meta.related_objects:
+        if relation.on_delete in (SET_NULL, SET_DEFAULT) and is_cached(relation.related_model):
+            related = relation.related_model._default_manager.filter(**{relation.field.name: instance.pk})
+            invalidate(relation.related_model, list(related.values_list('pk', flat=True)))
+
+
+def connect_receivers():
+    """
+    Connects the receivers to the models of OBJECT_CACHE_MODELS and to the models their SET_NULL and
+    SET_DEFAULT foreign keys point to. A receiver without a sender would keep Django from fast deleting
+    the cascaded rows of every model.
+    """
+    for label in settings.OBJECT_CACHE_MODELS:
+        model = apps.get_model(label)
+        post_save.connect(write_saved_instance, sender=model)
+        post_delete.connect(write_deleted_instance, sender=model)
+        for field in model._meta.concrete_fields:
+            if field.remote_field is not None and field.remote_field.on_delete in (SET_NULL, SET_DEFAULT):
+                pre_delete.connect(invalidate_set_null_relations, sender=field.related_model)
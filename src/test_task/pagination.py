@@ -0,0 +1,59 @@
+from django.conf import settings
+from django.db.models import F, Field, Func
+from drf_yasg import openapi
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination
+
+
+CURSOR_PARAM = openapi.Parameter('cursor', openapi.IN_QUERY, type=openapi.TYPE_STRING)
+PAGE_SIZE_PARAM = openapi.Parameter('page_size', openapi.IN_QUERY, type=openapi.TYPE_INTEGER)
+
+
+class IdCursorPagination(CursorPagination):
+    """
+    Keyset pagination over the primary key.
+
+    The opaque cursor encodes the last seen id, so every page is a `WHERE id > X ORDER BY id LIMIT N`
+    query and costs the same no matter how deep the client has paged.
+    """
+    ordering = 'id'
+    page_size = settings.API_PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = settings.API_MAX_PAGE_SIZE
+
+
+class RankPositionField(Field):
+    """
+    Output field of the ROW(rank, id) position, compared with a (rank, id) tuple parsed from the cursor.
+    """
+
+    @staticmethod
+    def parse(position):
+        rank, pk = position.strip('()').split(',')
+        return float(rank), int(pk)
+
+    def get_prep_value(self, value):
+        return self.parse(value) if isinstance(value, str) else value
+
+
+class RankCursorPagination(IdCursorPagination):
+    """
+    Cursor pagination for full-text search results ordered by relevance.
+
+    The queryset must be annotated with a float `rank`. The cursor position is the row (rank, id),
+    so posts with the same rank are paged by `WHERE ROW(rank, id) < (X, Y)` like distinct ones, not by OFFSET.
+    """
+    ordering = '-position'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        position = Func(F('rank'), F('id'), function='ROW', output_field=RankPositionField())
+        return super().paginate_queryset(queryset.annotate(position=position), request, view)
+
+    def decode_cursor(self, request):
+        cursor = super().decode_cursor(request)
+        if cursor is not None and cursor.position is not None:
+            try:
+                RankPositionField.parse(cursor.position)
+            except ValueError:
+                raise NotFound(self.invalid_cursor_message)
+        return cursor
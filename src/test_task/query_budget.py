@@ -0,0 +1,88 @@
+from django.db import connection
+from django.urls import resolve, Resolver404
+from rest_framework.test import APIClient
+
+from monitoring.metrics import QueryCounter
+from users.authentication import token_cache
+
+# Most queries one request to the url may make, whatever the user and the data are.
+# Authentication by token is one query, so every budget includes it: the token cache is emptied before
+# every request and the budgets hold for a cache miss.
+QUERY_BUDGETS = {
+    'users:login': 5,
+    'users:logout': 2,
+    'users:all_users': 2,
+    'users:one_user': 3,
+    'users:create_user': 3,
+    'users:bulk_import_users': 4,
+    'users:account': 4,
+    'users:jwt_create': 2,
+    'users:jwt_refresh': 6,
+    'users:jwt_logout': 4,
+    'companies:all_companies': 4,
+    'companies:one_company': 3,
+    'companies:create_company': 2,
+    'companies:client_company': 3,
+    'companies:autocomplete_companies': 2,
+    'posts:all_posts': 3,
+    'posts:one_company_posts': 3,
+    'posts:autocomplete_posts': 2,
+    'posts:one_post': 5,
+    'posts:create_post': 4,
+    'posts:bulk_create_post': 5,
+    'posts:bulk_upsert_post': 5,
+    'posts:bulk_update_post': 5,
+}
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+class QueryBudgetAPIClient(APIClient):
+    """
+    APIClient that fails a request when it makes more queries than QUERY_BUDGETS allows for its url.
+
+    The number of queries of the last request is kept in last_queries.
+    """
+
+    def request(self, **kwargs):
+        token_cache.clear()
+        counter = QueryCounter(keep_sql=True, skip_savepoints=True)
+        with connection.execute_wrapper(counter):
+            response = super().request(**kwargs)
+            if response.streaming:
+                # Streamed content is made while it is read, read it while the queries are counted
+                response.streaming_content = list(response.streaming_content)
+        self.last_queries = counter.queries
+
+        try:
+            view_name = resolve(kwargs['PATH_INFO']).view_name
+        except Resolver404:
+            return response
+
+        budget = QUERY_BUDGETS.get(view_name)
+        if budget is None:
+            raise QueryBudgetExceeded(f'There is no query budget for {view_name}, add it to QUERY_BUDGETS')
+        if self.last_queries > budget:
+            raise QueryBudgetExceeded(
+                f'{view_name} made {self.last_queries} queries, the budget is {budget}:\n' + '\n'.join(counter.statements)
+            )
+        return response
+
+
+class QueryBudgetMixin:
+    """
+    Test case mixin which sends every request of self.client under its query budget.
+    """
+    client_class = QueryBudgetAPIClient
+
+    def assertQueriesConstant(self, request, grow):
+        """
+        Check that request() makes the same number of queries before and after grow() adds more data.
+        """
+        request()
+        before = self.client.last_queries
+        grow()
+        request()
+        self.assertEqual(self.client.last_queries, before, 'Number of queries grows with the data')
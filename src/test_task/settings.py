@@ -11,7 +11,9 @@ https://docs.djangoproject.com/en/3.2/ref/settings/
 """
 
 import os
+from datetime import timedelta
 from pathlib import Path
+from django.core.exceptions import ImproperlyConfigured
 from dotenv import load_dotenv
 load_dotenv()
 
@@ -40,9 +42,11 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
 
     'rest_framework',
     'rest_framework.authtoken',
+    'rest_framework_simplejwt.token_blacklist',
     'djoser',
     'phonenumber_field',
     'drf_yasg',
@@ -50,9 +54,16 @@ INSTALLED_APPS = [
     'users.apps.UsersConfig',
     'companies',
     'posts.apps.PostsConfig',
+    'dataset.apps.DatasetConfig',
+    'benchmarks.apps.BenchmarksConfig',
+    'monitoring.apps.MonitoringConfig',
+    'test_task.apps.TestTaskConfig',
 ]
 
 MIDDLEWARE = [
+    'monitoring.timing.ServerTimingMiddleware',
+    'monitoring.metrics.MetricsMiddleware',
+    'monitoring.slow_queries.SlowQueryMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -60,6 +71,10 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'test_task.identity_map.IdentityMapMiddleware',
+    'monitoring.nplusone.NPlusOneMiddleware',
+    'monitoring.profiler.ProfilerMiddleware',
+    'monitoring.allocations.AllocationProfilerMiddleware',
 ]
 
 REST_FRAMEWORK = {
@@ -67,13 +82,78 @@ REST_FRAMEWORK = {
         'rest_framework.permissions.IsAuthenticated',
     ],
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
-    ]
+        'users.authentication.CachedTokenAuthentication',
+        'users.authentication.StatelessJWTAuthentication',
+    ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'monitoring.renderers.TimedJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+}
+
+# Cursor pagination of the list endpoints: default page size and the hard cap for ?page_size=
+API_PAGE_SIZE = int(os.getenv('API_PAGE_SIZE', 100))
+API_MAX_PAGE_SIZE = int(os.getenv('API_MAX_PAGE_SIZE', 1000))
+
+# Prefix autocomplete of post titles and company names: default and maximum number of suggestions
+AUTOCOMPLETE_LIMIT = 10
+AUTOCOMPLETE_MAX_LIMIT = 50
+
+# Companies streamed by the full view with ?stream=true are expanded this many at a time, the peak memory of
+# the response is bounded by the employees and posts of one chunk
+COMPANIES_STREAM_CHUNK_SIZE = int(os.getenv('COMPANIES_STREAM_CHUNK_SIZE', 100))
+
+# Bulk post endpoints: maximum posts in one request and rows per INSERT statement
+POSTS_BULK_MAX_ITEMS = int(os.getenv('POSTS_BULK_MAX_ITEMS', 10000))
+POSTS_BULK_BATCH_SIZE = int(os.getenv('POSTS_BULK_BATCH_SIZE', 1000))
+
+# Shared by all worker processes only with a shared backend, like PyMemcacheCache (docker-compose runs memcached)
+# or FileBasedCache in a common directory
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', ''),
+    }
+}
+
+# Worker processes serving the app, gunicorn reads the same variable. With more than one the object cache,
+# the token cache and the profiler need a shared cache backend, see the check after the profiler settings
+WEB_CONCURRENCY = int(os.getenv('WEB_CONCURRENCY', 1))
+
+# Token -> user cache of users.authentication.CachedTokenAuthentication, entries per worker process and
+# their lifetime in seconds. Invalidations reach other processes through the Django cache (CACHES)
+AUTH_TOKEN_CACHE_SIZE = int(os.getenv('AUTH_TOKEN_CACHE_SIZE', 10000))
+AUTH_TOKEN_CACHE_TTL = float(os.getenv('AUTH_TOKEN_CACHE_TTL', 300))
+
+# Models read through test_task.identity_map.get_object, their saves and deletions drop them from the map
+IDENTITY_MAP_MODELS = ['posts.Post', 'users.User', 'companies.Company']
+
+# Read-through cache of primary key reads (test_task.object_cache) of OBJECT_CACHE_MODELS in the Django cache (CACHES),
+# rows are kept for OBJECT_CACHE_TTL seconds and missing rows for OBJECT_CACHE_NEGATIVE_TTL seconds
+OBJECT_CACHE_ENABLED = os.getenv('OBJECT_CACHE_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+OBJECT_CACHE_MODELS = ['posts.Post', 'users.User', 'companies.Company']
+OBJECT_CACHE_TTL = int(os.getenv('OBJECT_CACHE_TTL', 300))
+OBJECT_CACHE_NEGATIVE_TTL = int(os.getenv('OBJECT_CACHE_NEGATIVE_TTL', 30))
+
+# Stateless authentication by signed access tokens (users.authentication.StatelessJWTAuthentication), off by default.
+# Access tokens carry user id, user_type and company_id and are not checked against the database until they
+# expire, refresh tokens are rotated and revoked on logout
+JWT_AUTH_ENABLED = os.getenv('JWT_AUTH_ENABLED', 'false').lower() in ('1', 'true', 'yes')
+SIMPLE_JWT = {
+    'ACCESS_TOKEN_LIFETIME': timedelta(minutes=int(os.getenv('JWT_ACCESS_TOKEN_MINUTES', 5))),
+    'REFRESH_TOKEN_LIFETIME': timedelta(days=int(os.getenv('JWT_REFRESH_TOKEN_DAYS', 1))),
+    'ROTATE_REFRESH_TOKENS': True,
+    'BLACKLIST_AFTER_ROTATION': True,
+    'AUTH_HEADER_TYPES': ('Bearer', ),
+    'TOKEN_USER_CLASS': 'users.authentication.StatelessUser',
 }
 
 DJOSER = {
     "USER_ID_FIELD": "email",
     "LOGIN_FIELD": "email",
+    "SERIALIZERS": {
+        "token_create": "users.serializers.PooledTokenCreateSerializer",
+    },
 }
 
 SWAGGER_SETTINGS = {
@@ -142,6 +222,77 @@ AUTH_PASSWORD_VALIDATORS = [
 
 AUTH_USER_MODEL = 'users.User'
 
+AUTHENTICATION_BACKENDS = [
+    'users.backends.PooledHashingModelBackend',
+]
+
+# Password hashing process pool (users.hashing), used by logins, user creation and bulk import.
+# PASSWORD_HASHING_WORKERS=0 hashes inline in the request worker
+PASSWORD_HASHING_WORKERS = int(os.getenv('PASSWORD_HASHING_WORKERS', os.cpu_count() or 1))
+PASSWORD_HASHING_MAX_QUEUE = int(os.getenv('PASSWORD_HASHING_MAX_QUEUE', 64))
+PASSWORD_HASHING_TIMEOUT = int(os.getenv('PASSWORD_HASHING_TIMEOUT', 10))
+USERS_IMPORT_BATCH_SIZE = int(os.getenv('USERS_IMPORT_BATCH_SIZE', 1000))
+
+# N+1 detector (monitoring.nplusone), reports SELECT templates run more than NPLUSONE_THRESHOLD times per request.
+# NPLUSONE_SAMPLE_RATE of requests are checked and reports are logged. With NPLUSONE_RAISE (on in tests, see
+# TEST_SETTINGS) every request is checked and a report raises
+NPLUSONE_THRESHOLD = int(os.getenv('NPLUSONE_THRESHOLD', 5))
+NPLUSONE_RAISE = os.getenv('NPLUSONE_RAISE', 'false').lower() in ('1', 'true', 'yes')
+NPLUSONE_SAMPLE_RATE = float(os.getenv('NPLUSONE_SAMPLE_RATE', 0.05))
+
+# Server-Timing header with auth, permissions, sql, serialize and render durations (monitoring.timing),
+# the same timings are always logged to the monitoring.timing logger
+SERVER_TIMING_HEADER = os.getenv('SERVER_TIMING_HEADER', 'true').lower() in ('1', 'true', 'yes')
+
+# Request metrics exposed on /metrics (monitoring.metrics). With several worker processes set METRICS_DIR
+# to a directory shared by them and emptied on deploy, every worker writes its metrics there every
+# METRICS_FLUSH_INTERVAL seconds. The scraper has to send METRICS_TOKEN as a bearer token, without it
+# /metrics refuses every request
+METRICS_DIR = os.getenv('METRICS_DIR')
+METRICS_FLUSH_INTERVAL = float(os.getenv('METRICS_FLUSH_INTERVAL', 1.0))
+METRICS_TOKEN = os.getenv('METRICS_TOKEN')
+
+# Sampling profiler (monitoring.profiler) started from the ProfileSession admin, every worker checks the cache
+# for a changed session every PROFILER_POLL_INTERVAL seconds and only then reads the sessions from the database
+PROFILER_ENABLED = os.getenv('PROFILER_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+PROFILER_POLL_INTERVAL = float(os.getenv('PROFILER_POLL_INTERVAL', 5))
+
+# Invalidations and write-through of a LocMemCache reach only its own process, the other workers would keep
+# serving stale objects and revoked tokens, so these features are refused instead
+if WEB_CONCURRENCY > 1 and CACHES['default']['BACKEND'] == 'django.core.cache.backends.locmem.LocMemCache':
+    local_cache_features = [name for name, enabled in (
+        ('OBJECT_CACHE_ENABLED', OBJECT_CACHE_ENABLED),
+        ('AUTH_TOKEN_CACHE_SIZE', AUTH_TOKEN_CACHE_SIZE > 0),
+        ('PROFILER_ENABLED', PROFILER_ENABLED),
+    ) if enabled]
+    if local_cache_features:
+        raise ImproperlyConfigured(
+            f'{", ".join(local_cache_features)} need a cache shared by the {WEB_CONCURRENCY} worker processes, '
+            f'set CACHE_BACKEND and CACHE_LOCATION or turn them off'
+        )
+
+# Allocation profiler (monitoring.allocations) for the comma separated url names of ALLOCATION_PROFILE_VIEWS,
+# logs the peak and the top allocating sites of their requests to the monitoring.allocations logger
+ALLOCATION_PROFILE_VIEWS = [name for name in os.getenv('ALLOCATION_PROFILE_VIEWS', '').split(',') if name]
+ALLOCATION_PROFILE_TOP = int(os.getenv('ALLOCATION_PROFILE_TOP', 10))
+
+# Slow query log (monitoring.slow_queries) of the last SLOW_QUERY_LOG_SIZE queries slower than
+# SLOW_QUERY_THRESHOLD_MS (a negative threshold turns it off), SLOW_QUERY_EXPLAIN_RATE of the SELECT ones
+# are planned with EXPLAIN. SLOW_QUERY_EXPLAIN_ANALYZE runs them again with EXPLAIN (ANALYZE, BUFFERS) instead,
+# which makes the request wait for the slow query a second time
+SLOW_QUERY_THRESHOLD_MS = float(os.getenv('SLOW_QUERY_THRESHOLD_MS', 200))
+SLOW_QUERY_EXPLAIN_RATE = float(os.getenv('SLOW_QUERY_EXPLAIN_RATE', 0.1))
+SLOW_QUERY_EXPLAIN_ANALYZE = os.getenv('SLOW_QUERY_EXPLAIN_ANALYZE', 'false').lower() in ('1', 'true', 'yes')
+SLOW_QUERY_LOG_SIZE = int(os.getenv('SLOW_QUERY_LOG_SIZE', 1000))
+
+
+# Applied on top of these settings while `manage.py test` runs (test_task.test_runner)
+TEST_RUNNER = 'test_task.test_runner.TestRunner'
+TEST_SETTINGS = {
+    'NPLUSONE_RAISE': True,
+    'PROFILER_ENABLED': False,
+    'OBJECT_CACHE_ENABLED': False,
+}
 
 # Internationalization
 # https://docs.djangoproject.com/en/3.2/topics/i18n/
@@ -20,6 +20,8 @@ from rest_framework import authentication
 from drf_yasg.views import get_schema_view
 from drf_yasg import openapi
 
+from monitoring.views import metrics
+
 schema_view = get_schema_view(
    openapi.Info(
       title="Snippets API",
@@ -39,5 +41,6 @@ urlpatterns = [
     path('api/v1/users/', include('users.urls', 'users')),
     path('api/v1/companies/', include('companies.urls', 'companies')),
     path('api/v1/posts/', include('posts.urls', 'posts')),
+    path('metrics', metrics, name='metrics'),
     path('swagger/', schema_view.with_ui('swagger', cache_timeout=0), name='schema-swagger-ui'),
 ]
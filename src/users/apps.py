@@ -6,3 +6,6 @@ class UsersConfig(AppConfig):
     name = 'users'
     verbose_name = 'User'
     verbose_name_plural = 'Users'
+
+    def ready(self):
+        from . import signals  # noqa: F401
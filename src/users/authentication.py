@@ -0,0 +1,152 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.functional import cached_property
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+from rest_framework_simplejwt.authentication import JWTTokenUserAuthentication
+from rest_framework_simplejwt.models import TokenUser
+
+from monitoring.metrics import registry
+from test_task.identity_map import remember
+from test_task.object_cache import cached_fields, restore, snapshot
+from .models import User
+
+
+def version_key(user_id):
+    return f'auth-token-cache:user:{user_id}'
+
+
+def invalidate_user(user_id):
+    """
+    Makes cached tokens of the user stale in every worker process sharing the Django cache.
+    """
+    cache.set(version_key(user_id), uuid.uuid4().hex, None)
+
+
+class TokenCache:
+    """
+    Token key -> (user snapshot, token snapshot) of one process, at most size entries for ttl seconds,
+    the least recently used entries are evicted first.
+
+    Every entry keeps the version of its user from the Django cache at the moment it was loaded,
+    invalidate_user() changes the version and entries with another version are stale.
+    Without a shared cache backend (Redis, Memcached) other processes see the change after ttl seconds,
+    as does an entry loaded from the database right before an invalidation and versioned right after it.
+    """
+
+    def __init__(self, size, ttl):
+        self.size = size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        if self.size <= 0:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, version, user_id, values = entry
+            if expires <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+        if cache.get(version_key(user_id)) != version:
+            self.discard(key)
+            return None
+        return values
+
+    def set(self, key, user_id, version, values):
+        if self.size <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, version, user_id, values)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    def discard(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+token_cache = TokenCache(size=settings.AUTH_TOKEN_CACHE_SIZE, ttl=settings.AUTH_TOKEN_CACHE_TTL)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    TokenAuthentication that keeps the token and its user in token_cache, so a repeated token
+    does not query authtoken_token and users_user on every request.
+
+    Cached users are invalidated on logout, token deletion and every save or deletion of the user
+    (users.signals), every request gets its own User instance built from the snapshot, which leaves out
+    the password hash like the object cache does. The user is added
+    to the identity map of the request, get_object(User, request.user.id) does not load it again.
+    """
+
+    def authenticate_credentials(self, key):
+        values = token_cache.get(key)
+        if values is not None:
+            registry.inc('auth_token_cache_total', (('result', 'hit'), ))
+            user_values, token_values = values
+            user = restore(User, user_values, cached_fields(User))
+            token = restore(Token, token_values)
+            token.user = user
+            remember(user)
+            return user, token
+
+        registry.inc('auth_token_cache_total', (('result', 'miss'), ))
+        user, token = super().authenticate_credentials(key)
+        token_cache.set(key, user.id, cache.get(version_key(user.id)), (snapshot(user, cached_fields(User)), snapshot(token)))
+        remember(user)
+        return user, token
+
+
+class StatelessUser(TokenUser):
+    """
+    User of a signed access token, built from its claims without a query.
+
+    company_id_id is the id of the company like on User, views and permissions that have to work
+    for both kinds of users use it instead of the company_id relation.
+    """
+
+    @cached_property
+    def email(self):
+        return self.token.get('email', '')
+
+    @cached_property
+    def user_type(self):
+        return self.token.get('user_type', User.Role.CLIENT)
+
+    @cached_property
+    def company_id_id(self):
+        return self.token.get('company_id')
+
+    @cached_property
+    def is_super_admin(self):
+        return self.user_type == User.Role.SUPER_ADMIN
+
+
+class StatelessJWTAuthentication(JWTTokenUserAuthentication):
+    """
+    Authentication by a signed access token in "Authorization: Bearer <token>" when JWT_AUTH_ENABLED is on,
+    the user is a StatelessUser and no query is made.
+    """
+
+    def authenticate(self, request):
+        if not settings.JWT_AUTH_ENABLED:
+            return None
+        return super().authenticate(request)
@@ -0,0 +1,58 @@
+from django.contrib.auth import get_user_model, hashers
+from django.contrib.auth.backends import ModelBackend
+
+from .hashing import HashingQueueFull, hashing_service
+
+UserModel = get_user_model()
+
+
+def password_must_update(encoded):
+    """
+    Whether an encoded password is not made by the preferred hasher with its current parameters,
+    the check of hashers.check_password before it calls its setter.
+    """
+    preferred = hashers.get_hasher('default')
+    try:
+        hasher = hashers.identify_hasher(encoded)
+    except ValueError:
+        return False
+    return hasher.algorithm != preferred.algorithm or preferred.must_update(encoded)
+
+
+class PooledHashingModelBackend(ModelBackend):
+    """
+    ModelBackend that checks passwords on the hashing process pool instead of the request worker.
+    """
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        if username is None:
+            username = kwargs.get(UserModel.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+
+        try:
+            user = UserModel._default_manager.get_by_natural_key(username)
+        except UserModel.DoesNotExist:
+            # Hash anyway to keep the response time of a missing user equal to a wrong password
+            hashing_service.make_password(password)
+            return None
+
+        if hashing_service.check_password(password, user.password) and self.user_can_authenticate(user):
+            self.update_password_hash(user, password)
+            return user
+        return None
+
+    @staticmethod
+    def update_password_hash(user, password):
+        """
+        Hash the password again on the pool when it was stored with an outdated hasher or iteration count,
+        like User.check_password does. With a full queue it is left for the next login.
+        """
+        if not password_must_update(user.password):
+            return
+        try:
+            user.password = hashing_service.make_password(password)
+        except HashingQueueFull:
+            return
+        user._password = None
+        user.save(update_fields=['password'])
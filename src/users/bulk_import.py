@@ -0,0 +1,122 @@
+import csv
+import io
+import json
+
+from django.conf import settings
+from django.db import transaction
+
+from companies.models import Company
+from test_task.object_cache import invalidate
+from .hashing import PasswordHashingService, hashing_service
+from .models import User
+from .serializers import UserImportSerializer
+
+FORMATS = ('csv', 'ndjson')
+
+
+def parse_users(stream, file_format):
+    """
+    Yield one dict per user from a text stream in CSV (with header) or NDJSON format.
+    """
+    if file_format == 'csv':
+        for row in csv.DictReader(stream):
+            yield {key: value for key, value in row.items() if value not in (None, '')}
+    elif file_format == 'ndjson':
+        for line in stream:
+            if line.strip():
+                yield json.loads(line)
+    else:
+        raise ValueError(f'Format must be one of {", ".join(FORMATS)} not {file_format}')
+
+
+def parse_uploaded_users(uploaded_file, file_format=None):
+    """
+    Parse users from an uploaded file, the format is taken from the file extension if it is not given.
+    """
+    file_format = file_format or uploaded_file.name.rsplit('.', 1)[-1].lower()
+    stream = io.TextIOWrapper(uploaded_file.file, encoding='utf-8')
+    return list(parse_users(stream, file_format))
+
+
+def hash_passwords(passwords, workers=None):
+    """
+    Hash raw passwords with make_password, keeping the order.
+
+    By default on the shared bounded pool of hashing_service, like all hashing of the web workers.
+    With workers (import_users and load_dataset --workers) on a pool of that many processes made for this call only.
+    """
+    if workers is None:
+        return hashing_service.make_passwords(passwords)
+
+    service = PasswordHashingService(workers=workers, max_queue=max(workers, 1), timeout=settings.PASSWORD_HASHING_TIMEOUT)
+    try:
+        return service.make_passwords(passwords)
+    finally:
+        service.shutdown(wait=True)
+
+
+def validate_users(rows, allowed_user_types=None):
+    """
+    Validate users of one import with one query for all emails and one query for all companies.
+
+    Return (cleaned users, list of per-item errors).
+    """
+    serializer = UserImportSerializer(data=rows, many=True)
+    if not serializer.is_valid():
+        errors = [{'index': index, 'errors': item_errors} for index, item_errors in enumerate(serializer.errors) if item_errors]
+        return [], errors
+
+    users = serializer.validated_data
+    for user in users:
+        user['email'] = User.objects.normalize_email(user['email'])
+
+    emails = [user['email'] for user in users]
+    existed_emails = set(User.objects.filter(email__in=emails).values_list('email', flat=True))
+    company_ids = {user['company_id'] for user in users if user.get('company_id')}
+    existed_companies = set(Company.objects.filter(id__in=company_ids).values_list('id', flat=True))
+
+    errors = []
+    seen_emails = set()
+    for index, user in enumerate(users):
+        item_errors = {}
+        if user['email'] in existed_emails or user['email'] in seen_emails:
+            item_errors['email'] = [f'User with email={user["email"]} already exist']
+        seen_emails.add(user['email'])
+
+        if user.get('company_id') and user['company_id'] not in existed_companies:
+            item_errors['company_id'] = [f'Company with id={user["company_id"]} does not exist']
+
+        if allowed_user_types is not None and user['user_type'] not in allowed_user_types:
+            item_errors['user_type'] = [f"You are can't create user with user_type={user['user_type']}"]
+
+        if item_errors:
+            errors.append({'index': index, 'errors': item_errors})
+
+    return users, errors
+
+
+def import_users(users, batch_size=None, workers=None):
+    """
+    Hash passwords of validated users in parallel (see hash_passwords) and insert them with bulk_create
+    in one transaction.
+
+    Return number of created users.
+    """
+    batch_size = batch_size or settings.USERS_IMPORT_BATCH_SIZE
+    created = 0
+
+    with transaction.atomic():
+        for start in range(0, len(users), batch_size):
+            batch = users[start:start + batch_size]
+            passwords = hash_passwords([user['password'] for user in batch], workers=workers)
+
+            new_users = []
+            for user, password in zip(batch, passwords):
+                company_id = user.pop('company_id', None)
+                new_users.append(User(**dict(user, password=password), company_id_id=company_id))
+
+            new_users = User.objects.bulk_create(new_users, batch_size=batch_size)
+            invalidate(User, [user.id for user in new_users])
+            created += len(new_users)
+
+    return created
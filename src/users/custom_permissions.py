@@ -1,9 +1,11 @@
-import logging
-
 from rest_framework.permissions import BasePermission
 from posts.models import Post
 
 
+def is_admin(user):
+    return user.user_type == 'super_admin' or user.user_type == 'admin'
+
+
 class IsAdminOrSuperAdmin(BasePermission):
     """
     Allows access only to admin or super admin users.
@@ -17,48 +19,59 @@ class IsAdminOrSuperAdmin(BasePermission):
         return bool(request.user.email and (user_type == 'super_admin' or user_type == 'admin'))
 
 
-class IsOwnerOrAccessDenied(BasePermission):
+class OwnerPermission(BasePermission):
+    """
+    Clients may access only the objects of `model` they own by `owner_field`, admins and super admins any object.
+
+    The object is named by the `lookup_kwarg` url kwarg. Views that load the object themselves set
+    `object_permissions = True` and call check_object_permissions() with it, ownership is then checked
+    on the loaded object without a query. For other views has_permission() checks it with one EXISTS
+    query by primary key. A missing object is allowed, the view answers 404.
+    """
+    model = None
+    owner_field = 'user_id'
+    lookup_kwarg = None
 
     def has_permission(self, request, view):
-        if request.user.user_type == 'super_admin' or request.user.user_type == 'admin':
+        if is_admin(request.user) or getattr(view, 'object_permissions', False):
             return True
 
-        post_id = request.path.split('/')[-1]
-        try:
-            post = Post.objects.get(id=int(post_id))
-        except Post.DoesNotExist:
+        object_id = view.kwargs.get(self.lookup_kwarg)
+        if object_id is None:
             return True
-        return bool(request.user.email and post.user_id == request.user)
+        others = self.model.objects.filter(pk=object_id).exclude(**{self.owner_field: request.user.id})
+        return not others.exists()
+
+    def has_object_permission(self, request, view, obj):
+        if is_admin(request.user):
+            return True
+        owner_attname = self.model._meta.get_field(self.owner_field).attname
+        return getattr(obj, owner_attname) == request.user.id
+
+
+class IsOwnerOrAccessDenied(OwnerPermission):
+    model = Post
+    lookup_kwarg = 'post_id'
 
 
 class IsOwnerAllPostsOrAccessDenied(BasePermission):
 
     def has_permission(self, request, view):
-        if request.user.user_type == 'super_admin' or request.user.user_type == 'admin':
+        if is_admin(request.user):
             return True
 
         posts = request.data.get('posts_to_update')
-        logging.getLogger()
-        print(posts)
-        print(type(posts))
-        for post in posts:
-            print(post)
-            post_id = post.get('id')
-            try:
-                post_id = int(post_id)
-            except Exception as e:
-                return True
-            try:
-                real_post = Post.objects.get(id=post_id)
-            except Post.DoesNotExist:
-                return True
-            if real_post.user_id.id != request.user.id:
-                return False
-        return True
+        try:
+            post_ids = [int(post.get('id')) for post in posts]
+        except (AttributeError, TypeError, ValueError):
+            # Malformed payload is reported by the view
+            return True
+
+        return not Post.objects.filter(id__in=post_ids).exclude(user_id=request.user.id).exists()
 
 
 class IsEmployeeOrAccessDenied(BasePermission):
 
     def has_object_permission(self, request, view, obj):
 
-        return bool(request.user.email and obj.id == request.user.company_id)
+        return bool(request.user.email and obj.id == request.user.company_id_id)
@@ -0,0 +1,167 @@
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+import django
+from django.conf import settings
+from django.contrib.auth import hashers
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+from monitoring.metrics import registry
+
+
+class HashingQueueFull(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = 'Too many password operations at once, try again later.'
+    default_code = 'hashing_queue_full'
+
+
+class PasswordHashingService:
+    """
+    Runs make_password and check_password on a bounded pool of processes, so PBKDF2 does not hold
+    the request worker and hashing throughput scales with cores.
+
+    At most max_queue operations may wait or run at once, the next ones are rejected with HashingQueueFull.
+    With workers=0 the operations run inline in the calling thread. Operations in flight, waiting for a process
+    and finished by result are exported on /metrics (password_hashing_*), stats() has the counters of this instance.
+    """
+
+    def __init__(self, workers, max_queue, timeout):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self._executor = None
+        self._executor_pid = None
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max_queue)
+        self._stats = {
+            'submitted': 0,
+            'completed': 0,
+            'rejected': 0,
+            'failed': 0,
+            'in_flight': 0,
+            'seconds_total': 0.0,
+        }
+
+    def make_password(self, password):
+        return self._run(hashers.make_password, password)
+
+    def make_passwords(self, passwords):
+        """
+        make_password of every password, in order. At most workers of them are submitted at once, so operations
+        of other requests like logins are queued between them instead of behind the whole list. A password waits
+        up to timeout seconds for a free queue slot instead of being rejected.
+        """
+        results = []
+        pending = deque()
+        try:
+            for password in passwords:
+                if len(pending) >= max(self.workers, 1):
+                    results.append(self._result(pending.popleft()))
+                pending.append(self._submit(hashers.make_password, password, wait=True))
+            while pending:
+                results.append(self._result(pending.popleft()))
+        finally:
+            for future, _ in pending:
+                future.cancel()
+                self._release()
+        return results
+
+    def check_password(self, password, encoded):
+        return self._run(hashers.check_password, password, encoded)
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, workers=self.workers, max_queue=self.max_queue)
+
+    def _run(self, function, *args):
+        return self._result(self._submit(function, *args))
+
+    def _submit(self, function, *args, wait=False):
+        acquired = self._slots.acquire(timeout=self.timeout) if wait else self._slots.acquire(blocking=False)
+        if not acquired:
+            self._count('rejected')
+            raise HashingQueueFull()
+
+        self._count('submitted')
+        self._count('in_flight')
+        started = time.monotonic()
+        try:
+            if self.workers <= 0:
+                future = Future()
+                try:
+                    future.set_result(function(*args))
+                except Exception as e:
+                    future.set_exception(e)
+            else:
+                future = self._get_executor().submit(function, *args)
+        except BaseException:
+            self._release()
+            raise
+        return future, started
+
+    def _result(self, submitted):
+        future, started = submitted
+        try:
+            result = future.result(timeout=self.timeout)
+        except TimeoutError:
+            self._count('failed')
+            raise HashingQueueFull()
+        except BrokenProcessPool:
+            self._count('failed')
+            self.shutdown()
+            raise
+        finally:
+            self._release()
+
+        self._count('completed')
+        self._count('seconds_total', time.monotonic() - started)
+        return result
+
+    def _release(self):
+        self._count('in_flight', -1)
+        self._slots.release()
+
+    def _count(self, name, value=1):
+        with self._lock:
+            queued = self._queued()
+            self._stats[name] += value
+            queued_change = self._queued() - queued
+
+        if name in ('completed', 'rejected', 'failed'):
+            registry.inc('password_hashing_total', (('result', name), ), value)
+        elif name == 'in_flight':
+            registry.inc('password_hashing_in_flight', (), value)
+            if queued_change:
+                registry.inc('password_hashing_queue_depth', (), queued_change)
+
+    def _queued(self):
+        # Operations in flight beyond the processes of the pool wait in its queue
+        if self.workers <= 0:
+            return 0
+        return max(0, self._stats['in_flight'] - self.workers)
+
+    def _get_executor(self):
+        with self._lock:
+            # A pool inherited from the parent of a forked worker can not be used, start a new one
+            if self._executor is None or self._executor_pid != os.getpid():
+                self._executor = ProcessPoolExecutor(max_workers=self.workers, initializer=django.setup)
+                self._executor_pid = os.getpid()
+            return self._executor
+
+    def shutdown(self, wait=False):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait)
+
+
+hashing_service = PasswordHashingService(
+    workers=settings.PASSWORD_HASHING_WORKERS,
+    max_queue=settings.PASSWORD_HASHING_MAX_QUEUE,
+    timeout=settings.PASSWORD_HASHING_TIMEOUT,
+)
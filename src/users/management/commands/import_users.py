@@ -0,0 +1,35 @@
+import csv
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from users.bulk_import import FORMATS, parse_users, validate_users, import_users
+
+
+class Command(BaseCommand):
+    help = 'Import users from CSV or NDJSON file, passwords are hashed on a pool of processes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV file with header or NDJSON file with one user per line')
+        parser.add_argument('--format', choices=FORMATS, help='File format, by default taken from the file extension')
+        parser.add_argument('--workers', type=int, help='Processes hashing passwords, PASSWORD_HASHING_WORKERS by default')
+        parser.add_argument('--batch-size', type=int, help='Users per INSERT, USERS_IMPORT_BATCH_SIZE by default')
+
+    def handle(self, *args, **options):
+        file_format = options['format'] or options['path'].rsplit('.', 1)[-1].lower()
+        try:
+            with open(options['path'], encoding='utf-8') as file:
+                rows = list(parse_users(file, file_format))
+        except (OSError, ValueError, csv.Error) as e:
+            raise CommandError(f'File can not be parsed: {e}')
+
+        users, errors = validate_users(rows)
+        if errors:
+            for error in errors:
+                self.stderr.write(f'Line {error["index"] + 1}: {error["errors"]}')
+            raise CommandError(f'{len(errors)} users are invalid, nothing is imported')
+
+        # A pool of its own for this import, the shared one of hashing_service is bounded for web requests
+        workers = options['workers'] or settings.PASSWORD_HASHING_WORKERS
+        created = import_users(users, batch_size=options['batch_size'], workers=workers)
+        self.stdout.write(self.style.SUCCESS(f'Successfully import {created} users'))
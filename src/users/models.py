@@ -3,6 +3,8 @@ from django.db import models
 from phonenumber_field.modelfields import PhoneNumberField
 from django.contrib.auth.models import AbstractUser, UserManager
 
+from .hashing import hashing_service
+
 
 class MyUserManager(BaseUserManager):
     def create_user(self, email, password=None):
@@ -16,7 +18,7 @@ class MyUserManager(BaseUserManager):
             email=self.normalize_email(email),
         )
 
-        user.set_password(password)
+        user.password = hashing_service.make_password(password)
         user.save(using=self._db)
         return user
 
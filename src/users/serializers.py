@@ -1,8 +1,16 @@
 import logging
 
+from django.contrib.auth import authenticate
+from djoser.conf import settings as djoser_settings
+from djoser.serializers import TokenCreateSerializer
 from rest_framework.serializers import ModelSerializer
 from rest_framework import serializers
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from rest_framework_simplejwt.tokens import RefreshToken
 
+from .hashing import hashing_service
 from .models import User
 from phonenumber_field.serializerfields import PhoneNumberField
 
@@ -46,10 +54,27 @@ class CreateUserSerializer(ModelSerializer):
         fields = ('id', 'email', 'first_name', 'last_name', 'user_type', 'company_id', 'avatar', 'telephone_number', 'password')
 
     def create(self, validated_data):
-        user = super(CreateUserSerializer, self).create(validated_data)
-        user.set_password(validated_data['password'])
-        user.save()
-        return user
+        validated_data['password'] = hashing_service.make_password(validated_data['password'])
+        return super(CreateUserSerializer, self).create(validated_data)
+
+
+class UserImportSerializer(ModelSerializer):
+    """
+    One user of a bulk import.
+
+    Email uniqueness and company existence are checked for the whole import in users.bulk_import.validate_users.
+    """
+    email = serializers.EmailField(required=True)
+    password = serializers.CharField(required=True, max_length=128, min_length=8)
+    first_name = serializers.CharField(max_length=30, required=False)
+    last_name = serializers.CharField(max_length=50, required=False)
+    user_type = serializers.ChoiceField(['client', 'admin', 'super_admin'], default='client')
+    company_id = serializers.IntegerField(required=False, allow_null=True, min_value=1)
+    telephone_number = PhoneNumberField(required=False)
+
+    class Meta:
+        model = User
+        fields = ('email', 'first_name', 'last_name', 'user_type', 'company_id', 'telephone_number', 'password')
 
 
 class UserUpdateSerializer(ModelSerializer):
@@ -62,3 +87,59 @@ class UserUpdateSerializer(ModelSerializer):
         model = User
         fields = ('first_name', 'last_name', 'avatar', 'telephone_number')
 
+
+
+class PooledTokenCreateSerializer(TokenCreateSerializer):
+    """
+    djoser login without its fallback for a failed authenticate(), which loads the user and checks the
+    password again on the request worker. PooledHashingModelBackend has checked it on the hashing pool already.
+    """
+
+    def validate(self, attrs):
+        params = {djoser_settings.LOGIN_FIELD: attrs.get(djoser_settings.LOGIN_FIELD)}
+        self.user = authenticate(request=self.context.get('request'), **params, password=attrs.get('password'))
+        if self.user is None or not self.user.is_active:
+            self.fail('invalid_credentials')
+        return attrs
+
+
+class StatelessTokenObtainSerializer(TokenObtainPairSerializer):
+    """
+    Refresh and access token pair for an email and a password, the tokens carry the claims of add_user_claims.
+    """
+
+    @classmethod
+    def get_token(cls, user):
+        token = super().get_token(user)
+        StatelessTokenObtainSerializer.add_user_claims(token, user)
+        return token
+
+    @staticmethod
+    def add_user_claims(token, user):
+        token['email'] = user.email
+        token['user_type'] = user.user_type
+        token['company_id'] = user.company_id_id
+
+
+class StatelessTokenRefreshSerializer(TokenRefreshSerializer):
+    """
+    New access token and rotated refresh token, claims are read again from the user so a changed role or
+    company is seen on the next refresh and an inactive or deleted user can not refresh at all.
+    """
+
+    def validate(self, attrs):
+        refresh = RefreshToken(attrs['refresh'])
+
+        user = User.objects.filter(id=refresh[jwt_settings.USER_ID_CLAIM], is_active=True).first()
+        if user is None:
+            raise TokenError('User inactive or deleted')
+        StatelessTokenObtainSerializer.add_user_claims(refresh, user)
+
+        data = {'access': str(refresh.access_token)}
+        if jwt_settings.ROTATE_REFRESH_TOKENS:
+            if jwt_settings.BLACKLIST_AFTER_ROTATION:
+                refresh.blacklist()
+            refresh.set_jti()
+            refresh.set_exp()
+            data['refresh'] = str(refresh)
+        return data
@@ -1,14 +1,30 @@
+import os
+import tempfile
+from io import StringIO
+from unittest.mock import patch
+
+from django.contrib.auth.hashers import PBKDF2PasswordHasher, check_password
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command, CommandError
+from django.test import override_settings
 from django.urls import reverse
 from rest_framework import status
+from rest_framework.authtoken.models import Token
 from rest_framework.test import APITestCase, APIClient
+from rest_framework_simplejwt.tokens import AccessToken
 
+from monitoring.metrics import MetricsRegistry
 from users.models import User
 from companies.models import Company
+from test_task.query_budget import QueryBudgetMixin
 from .conftest import init_login_super_user, init_login_simple_user, init_login_admin
+from ..authentication import CachedTokenAuthentication, TokenCache, token_cache
+from ..backends import password_must_update
+from ..hashing import PasswordHashingService, HashingQueueFull
 from ..serializers import UserListSerializers, UserSerializer, CreateUserSerializer
 
 
-class UsersAPITestCase(APITestCase):
+class UsersAPITestCase(QueryBudgetMixin, APITestCase):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.api_client = APIClient()
@@ -87,7 +103,7 @@ class UsersAPITestCase(APITestCase):
 
     @init_login_super_user
     def test_user_lst_view(self):
-        users = User.objects.select_related('company_id').all()
+        users = User.objects.select_related('company_id').order_by('id')
         expected_data = UserListSerializers.get_response_with_company_info(users)
 
         url = reverse('users:all_users')
@@ -95,7 +111,56 @@ class UsersAPITestCase(APITestCase):
         response = self.client.get(url)
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(response.data, expected_data)
+        self.assertEqual(response.data['results'], expected_data)
+
+    @init_login_super_user
+    def test_user_lst_view_cursor_pagination(self):
+        url = reverse('users:all_users')
+
+        response = self.client.get(url, {'page_size': 2})
+        next_response = self.client.get(response.data['next'])
+
+        self.assertEqual([user['id'] for user in response.data['results']], [self.super_admin.id, self.admin.id])
+        self.assertEqual([user['id'] for user in next_response.data['results']], [self.simple_user.id])
+        self.assertIsNone(next_response.data['next'])
+
+    @init_login_super_user
+    def test_user_lst_view_constant_queries(self):
+        url = reverse('users:all_users')
+
+        def add_users():
+            for index in range(5):
+                company = Company.objects.create(name=f'company_{index}', date_created='2001-10-21')
+                User.objects.create(email=f'user_{index}@email.com', company_id=company)
+
+        self.assertQueriesConstant(lambda: self.client.get(url), add_users)
+
+    @init_login_super_user
+    def test_account_view(self):
+        url = reverse('users:account')
+
+        response = self.client.get(url)
+        update_response = self.client.patch(url, data={'first_name': 'New'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['email'], self.super_admin.email)
+        self.assertEqual(update_response.status_code, status.HTTP_200_OK)
+        self.assertEqual(User.objects.get(id=self.super_admin.id).first_name, 'New')
+
+    @init_login_super_user
+    def test_account_view_reuses_authenticated_user(self):
+        response = self.client.get(reverse('users:account'))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        # Only the token lookup, the account is the user loaded by the authentication
+        self.assertEqual(self.client.last_queries, 1)
+
+    @init_login_simple_user
+    def test_account_view_client(self):
+        response = self.client.get(reverse('users:account'))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['email'], self.simple_user.email)
 
     def test_negative_user_view_unauthorized(self):
         url = reverse('users:one_user', args=(self.simple_user.id, ))
@@ -264,3 +329,370 @@ class UsersAPITestCase(APITestCase):
 
         self.assertEqual(response.status_code, status.HTTP_201_CREATED)
         self.assertEqual(serializer.data['email'], data['email'])
+
+    @init_login_super_user
+    def test_bulk_import_users_csv(self):
+        url = reverse('users:bulk_import_users')
+        content = (
+            'email,password,first_name,user_type,company_id\n'
+            f'first@email.com,newpassword,First,admin,{self.company_1.id}\n'
+            'second@email.com,newpassword,Second,client,\n'
+        )
+        file = SimpleUploadedFile('users.csv', content.encode())
+
+        response = self.client.post(url, data={'file': file})
+        first_user = User.objects.get(email='first@email.com')
+        second_user = User.objects.get(email='second@email.com')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['created'], 2)
+        self.assertEqual((first_user.user_type, first_user.company_id), ('admin', self.company_1))
+        self.assertIsNone(second_user.company_id)
+        self.assertTrue(second_user.check_password('newpassword'))
+
+    @init_login_super_user
+    def test_bulk_import_users_constant_queries(self):
+        url = reverse('users:bulk_import_users')
+        users = [
+            {'email': f'import_{index}@email.com', 'password': 'newpassword', 'company_id': self.company_1.id}
+            for index in range(10)
+        ]
+
+        with patch('users.bulk_import.hash_passwords', lambda passwords, workers=None: ['hashed'] * len(passwords)):
+            self.client.post(url, data={'users': users[:1]}, format='json')
+            few_users_queries = self.client.last_queries
+            response = self.client.post(url, data={'users': users[1:]}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self.client.last_queries, few_users_queries)
+
+    @init_login_admin
+    def test_negative_bulk_import_users_per_item_errors(self):
+        url = reverse('users:bulk_import_users')
+        data = {
+            'users': [
+                {'email': 'new@email.com', 'password': 'newpassword'},
+                {'email': 'simple@email.com', 'password': 'newpassword'},
+                {'email': 'new@email.com', 'password': 'newpassword'},
+                {'email': 'other@email.com', 'password': 'newpassword', 'user_type': 'admin', 'company_id': 50000},
+            ]
+        }
+
+        response = self.client.post(url, data=data, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual([error['index'] for error in response.data['errors']], [1, 2, 3])
+        self.assertEqual(set(response.data['errors'][2]['errors']), {'company_id', 'user_type'})
+        self.assertFalse(User.objects.filter(email='new@email.com').exists())
+
+    def test_import_users_command_ndjson(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'users.ndjson')
+            with open(path, 'w') as file:
+                file.write('{"email": "first@email.com", "password": "newpassword"}\n')
+                file.write('{"email": "second@email.com", "password": "otherpassword", "last_name": "Second"}\n')
+
+            call_command('import_users', path, workers=2, batch_size=1, stdout=StringIO())
+
+        self.assertTrue(User.objects.get(email='first@email.com').check_password('newpassword'))
+        self.assertTrue(User.objects.get(email='second@email.com').check_password('otherpassword'))
+
+    def test_negative_import_users_command_invalid_user(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'users.csv')
+            with open(path, 'w') as file:
+                file.write('email,password\nnot_email,newpassword\n')
+
+            with self.assertRaises(CommandError):
+                call_command('import_users', path, stderr=StringIO())
+
+    def test_hashing_service_process_pool(self):
+        service = PasswordHashingService(workers=1, max_queue=2, timeout=30)
+        self.addCleanup(service.shutdown)
+
+        encoded = service.make_password('testpassword')
+
+        self.assertTrue(service.check_password('testpassword', encoded))
+        self.assertFalse(service.check_password('wrongpassword', encoded))
+        self.assertEqual(service.stats()['completed'], 3)
+        self.assertEqual(service.stats()['in_flight'], 0)
+
+    def test_hashing_service_make_passwords(self):
+        service = PasswordHashingService(workers=2, max_queue=2, timeout=30)
+        self.addCleanup(service.shutdown)
+
+        passwords = ['first', 'second', 'third']
+
+        encoded = service.make_passwords(passwords)
+
+        self.assertTrue(all(check_password(password, hashed) for password, hashed in zip(passwords, encoded)))
+        self.assertEqual(service.stats()['completed'], 3)
+        self.assertEqual(service.stats()['in_flight'], 0)
+
+    def test_negative_hashing_service_make_passwords_queue_full(self):
+        service = PasswordHashingService(workers=0, max_queue=1, timeout=0.01)
+        service._slots.acquire()
+
+        with self.assertRaises(HashingQueueFull):
+            service.make_passwords(['first', 'second'])
+
+        self.assertEqual(service.stats()['in_flight'], 0)
+
+    @init_login_super_user
+    def test_bulk_import_users_on_shared_hashing_pool(self):
+        url = reverse('users:bulk_import_users')
+        service = PasswordHashingService(workers=0, max_queue=0, timeout=0.01)
+
+        with patch('users.bulk_import.hashing_service', service):
+            response = self.client.post(url, data={'users': [{'email': 'new@email.com', 'password': 'newpassword'}]},
+                                        format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(service.stats()['rejected'], 1)
+        self.assertFalse(User.objects.filter(email='new@email.com').exists())
+
+    def test_hashing_service_metrics(self):
+        registry = MetricsRegistry()
+        service = PasswordHashingService(workers=0, max_queue=1, timeout=30)
+
+        with patch('users.hashing.registry', registry):
+            service.make_password('testpassword')
+            service._slots.acquire()
+            with self.assertRaises(HashingQueueFull):
+                service.make_password('testpassword')
+            pool = PasswordHashingService(workers=1, max_queue=3, timeout=30)
+            for _ in range(3):
+                pool._count('in_flight')
+        values = registry.collect()[0]
+
+        self.assertEqual(values[('password_hashing_total', (('result', 'completed'), ))], 1)
+        self.assertEqual(values[('password_hashing_total', (('result', 'rejected'), ))], 1)
+        self.assertEqual(values[('password_hashing_in_flight', ())], 3)
+        self.assertEqual(values[('password_hashing_queue_depth', ())], 2)
+
+    def test_negative_hashing_service_queue_full(self):
+        service = PasswordHashingService(workers=0, max_queue=1, timeout=30)
+        service._slots.acquire()
+
+        with self.assertRaises(HashingQueueFull):
+            service.make_password('testpassword')
+
+        self.assertEqual(service.stats()['rejected'], 1)
+
+    def test_user_login_updates_outdated_password_hash(self):
+        url = reverse('users:login')
+        self.super_admin.password = PBKDF2PasswordHasher().encode('testpassword', 'salt', iterations=1000)
+        self.super_admin.save()
+
+        response = self.client.post(url, data={'password': 'testpassword', 'email': 'super_admin@email.com'})
+        self.super_admin.refresh_from_db()
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(password_must_update(self.super_admin.password))
+        self.assertTrue(self.super_admin.check_password('testpassword'))
+
+    def test_negative_user_login_checks_password_only_on_pool(self):
+        url = reverse('users:login')
+        User.objects.filter(id=self.simple_user.id).update(is_active=False)
+
+        with patch.object(User, 'check_password') as check_password:
+            wrong_password = self.client.post(url, data={'password': 'wrong', 'email': 'super_admin@email.com'})
+            inactive = self.client.post(url, data={'password': 'testpassword', 'email': 'simple@email.com'})
+            missing = self.client.post(url, data={'password': 'testpassword', 'email': 'missing@email.com'})
+
+        check_password.assert_not_called()
+        for response in (wrong_password, inactive, missing):
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertIn('non_field_errors', response.data)
+
+    def test_negative_user_login_hashing_queue_full(self):
+        url = reverse('users:login')
+        data = {
+            'password': 'testpassword',
+            'email': 'super_admin@email.com'
+        }
+
+        with patch('users.backends.hashing_service', PasswordHashingService(workers=0, max_queue=0, timeout=30)):
+            response = self.client.post(url, data=data)
+
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+
+
+class TokenCacheAPITestCase(APITestCase):
+
+    def setUp(self):
+        token_cache.clear()
+        company = Company.objects.create(name='name_1', date_created='2001-10-21')
+        self.super_admin = User.objects.create(email='super_admin@email.com', user_type='super_admin', company_id=company)
+        self.admin = User.objects.create(email='admin@email.com', user_type='admin', company_id=company)
+        self.super_admin_client = self.client_for(self.super_admin)
+        self.admin_client = self.client_for(self.admin)
+
+    @staticmethod
+    def client_for(user):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION='Token ' + Token.objects.create(user=user).key)
+        return client
+
+    def test_cached_token_skips_auth_query(self):
+        url = reverse('users:all_users')
+
+        with self.assertNumQueries(2):
+            first_response = self.admin_client.get(url)
+        with self.assertNumQueries(1):
+            response = self.admin_client.get(url)
+
+        self.assertEqual(first_response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, first_response.data)
+
+    def test_cached_token_without_password(self):
+        User.objects.filter(id=self.admin.id).update(password='hash')
+        self.admin_client.get(reverse('users:all_users'))
+
+        key = Token.objects.get(user=self.admin).key
+        user_values = token_cache.get(key)[0]
+        user, token = CachedTokenAuthentication().authenticate_credentials(key)
+
+        self.assertNotIn('hash', user_values)
+        self.assertIn('password', user.get_deferred_fields())
+        with self.assertNumQueries(1):
+            self.assertEqual(user.password, 'hash')
+
+    def test_negative_cached_token_after_soft_delete(self):
+        url = reverse('users:all_users')
+        self.admin_client.get(url)
+
+        delete_url = reverse('users:one_user', args=(self.admin.id, )) + '?soft_delete=true'
+        self.super_admin_client.delete(delete_url)
+        response = self.admin_client.get(url)
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_negative_cached_token_after_logout(self):
+        url = reverse('users:all_users')
+        self.admin_client.get(url)
+
+        logout_response = self.admin_client.post(reverse('users:logout'))
+        response = self.admin_client.get(url)
+
+        self.assertEqual(logout_response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_negative_cached_token_after_user_change(self):
+        url = reverse('users:all_users')
+        self.admin_client.get(url)
+
+        self.admin.user_type = 'client'
+        self.admin.save()
+        response = self.admin_client.get(url)
+
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_token_cache_lru_and_ttl(self):
+        # No user has id 0, so its version is never changed
+        cache = TokenCache(size=2, ttl=60)
+        for key in ('a', 'b'):
+            cache.set(key, 0, None, key)
+        cache.get('a')
+        cache.set('c', 0, None, 'c')
+        expired = TokenCache(size=2, ttl=0)
+        expired.set('a', 0, None, 'a')
+
+        self.assertEqual([cache.get(key) for key in ('a', 'b', 'c')], ['a', None, 'c'])
+        self.assertIsNone(expired.get('a'))
+
+
+@override_settings(JWT_AUTH_ENABLED=True)
+class StatelessAuthAPITestCase(QueryBudgetMixin, APITestCase):
+
+    def setUp(self):
+        self.company = Company.objects.create(name='name_1', date_created='2001-10-21')
+        self.admin = User.objects.create_user('admin@email.com', 'testpassword')
+        self.client_user = User.objects.create_user('client@email.com', 'testpassword')
+        User.objects.filter(id=self.admin.id).update(user_type='admin', company_id=self.company)
+        User.objects.filter(id=self.client_user.id).update(company_id=self.company)
+
+    def create_tokens(self, email):
+        response = self.client.post(reverse('users:jwt_create'), {'email': email, 'password': 'testpassword'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def test_create_tokens_with_claims(self):
+        access = AccessToken(self.create_tokens('admin@email.com')['access'])
+
+        self.assertEqual(access['user_id'], self.admin.id)
+        self.assertEqual(access['user_type'], 'admin')
+        self.assertEqual(access['company_id'], self.company.id)
+
+    def test_stateless_requests_skip_auth_queries(self):
+        admin_access = self.create_tokens('admin@email.com')['access']
+        client_access = self.create_tokens('client@email.com')['access']
+
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer ' + admin_access)
+        with self.assertNumQueries(1):
+            users_response = self.client.get(reverse('users:all_users'))
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer ' + client_access)
+        with self.assertNumQueries(1):
+            posts_response = self.client.get(reverse('posts:one_company_posts'))
+        with self.assertNumQueries(1):
+            company_response = self.client.get(reverse('companies:client_company'))
+        forbidden_response = self.client.get(reverse('users:all_users'))
+
+        self.assertEqual(users_response.status_code, status.HTTP_200_OK)
+        self.assertEqual(posts_response.status_code, status.HTTP_200_OK)
+        self.assertEqual(company_response.data['id'], self.company.id)
+        self.assertEqual(forbidden_response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_refresh_rotates_and_revokes(self):
+        refresh = self.create_tokens('admin@email.com')['refresh']
+
+        response = self.client.post(reverse('users:jwt_refresh'), {'refresh': refresh})
+        reused_response = self.client.post(reverse('users:jwt_refresh'), {'refresh': refresh})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response.data['refresh'], refresh)
+        self.assertEqual(AccessToken(response.data['access'])['user_type'], 'admin')
+        self.assertEqual(reused_response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_refresh_reads_claims_again(self):
+        refresh = self.create_tokens('client@email.com')['refresh']
+        User.objects.filter(id=self.client_user.id).update(user_type='admin')
+
+        response = self.client.post(reverse('users:jwt_refresh'), {'refresh': refresh})
+
+        self.assertEqual(AccessToken(response.data['access'])['user_type'], 'admin')
+
+    def test_negative_refresh_inactive_user(self):
+        refresh = self.create_tokens('client@email.com')['refresh']
+        User.objects.filter(id=self.client_user.id).update(is_active=False)
+
+        response = self.client.post(reverse('users:jwt_refresh'), {'refresh': refresh})
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_negative_refresh_after_logout(self):
+        refresh = self.create_tokens('client@email.com')['refresh']
+
+        logout_response = self.client.post(reverse('users:jwt_logout'), {'refresh': refresh})
+        response = self.client.post(reverse('users:jwt_refresh'), {'refresh': refresh})
+
+        self.assertEqual(logout_response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(response.data, {'error': 'Token is blacklisted'})
+
+    def test_negative_logout_without_refresh(self):
+        response = self.client.post(reverse('users:jwt_logout'), {})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @override_settings(JWT_AUTH_ENABLED=False)
+    def test_negative_stateless_mode_disabled(self):
+        access = str(AccessToken.for_user(self.admin))
+
+        create_response = self.client.post(reverse('users:jwt_create'),
+                                           {'email': 'admin@email.com', 'password': 'testpassword'})
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer ' + access)
+        response = self.client.get(reverse('users:all_users'))
+
+        self.assertEqual(create_response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
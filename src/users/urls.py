@@ -1,6 +1,7 @@
 from django.contrib import admin
 from django.urls import path, include
-from .views import UsersView, UserCreateView, UserView, AccountView
+from .views import (UsersView, UserCreateView, UserBulkImportView, UserView, AccountView, StatelessTokenCreateView,
+                    StatelessTokenRefreshView, StatelessTokenLogoutView)
 
 
 app_name = 'users'
@@ -8,7 +9,11 @@ app_name = 'users'
 urlpatterns = [
     path('all/', UsersView.as_view(), name='all_users'),
     path('user/create', UserCreateView.as_view(), name='create_user'),
+    path('bulk_import/', UserBulkImportView.as_view(), name='bulk_import_users'),
     path('user/<int:user_id>', UserView.as_view(), name='one_user'),
     path('user/account', AccountView.as_view(), name='account'),
     path('user/', include('djoser.urls.authtoken')),
+    path('jwt/create', StatelessTokenCreateView.as_view(), name='jwt_create'),
+    path('jwt/refresh', StatelessTokenRefreshView.as_view(), name='jwt_refresh'),
+    path('jwt/logout', StatelessTokenLogoutView.as_view(), name='jwt_logout'),
 ]
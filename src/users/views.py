@@ -1,28 +1,38 @@
+import csv
 import logging
 
+from django.conf import settings
 from drf_yasg import openapi
 from drf_yasg.utils import swagger_auto_schema
 from rest_framework import status
-from rest_framework.authentication import SessionAuthentication, BasicAuthentication, TokenAuthentication
-from rest_framework.permissions import IsAuthenticated
-from rest_framework.views import APIView
+from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.tokens import RefreshToken
 
+from monitoring.views import TimedAPIView
+from test_task.identity_map import get_object
+from test_task.pagination import IdCursorPagination, CURSOR_PARAM, PAGE_SIZE_PARAM
+from .bulk_import import parse_uploaded_users, validate_users, import_users
 from .models import User
-from .serializers import UserSerializer, CreateUserSerializer, UserUpdateSerializer, UserListSerializers
+from .serializers import (UserSerializer, CreateUserSerializer, UserUpdateSerializer, UserListSerializers,
+                          StatelessTokenObtainSerializer, StatelessTokenRefreshSerializer)
 from .custom_permissions import IsAdminOrSuperAdmin, IsOwnerOrAccessDenied
 
 SOFT_DELETE_PARAM = openapi.Parameter('soft_delete', openapi.IN_QUERY, type=openapi.TYPE_BOOLEAN)
+IMPORT_FILE_PARAM = openapi.Parameter('file', openapi.IN_FORM, type=openapi.TYPE_FILE)
+IMPORT_FORMAT_PARAM = openapi.Parameter('format', openapi.IN_FORM, type=openapi.TYPE_STRING, enum=['csv', 'ndjson'])
 
 
-class UsersView(APIView):
-    authentication_classes = [TokenAuthentication]
+class UsersView(TimedAPIView):
     permission_classes = [IsAuthenticated, IsAdminOrSuperAdmin]
+    pagination_class = IdCursorPagination
 
     @swagger_auto_schema(
         operation_summary='List of all users',
-        operation_description='Return list of all users with base information about there company',
+        operation_description='Return one page of all users with base information about there company',
         operation_id='All Users',
+        manual_parameters=[CURSOR_PARAM, PAGE_SIZE_PARAM],
         responses={
             200: UserListSerializers(many=True)
         }
@@ -30,13 +40,14 @@ class UsersView(APIView):
     def get(self, request):
         users = User.objects.select_related('company_id').all()
 
-        response = UserListSerializers.get_response_with_company_info(users)
+        paginator = self.pagination_class()
+        page = paginator.paginate_queryset(users, request, view=self)
+        response = UserListSerializers.get_response_with_company_info(page)
 
-        return Response(response, status=status.HTTP_200_OK)
+        return paginator.get_paginated_response(response)
 
 
-class UserView(APIView):
-    authentication_classes = [TokenAuthentication]
+class UserView(TimedAPIView):
     permission_classes = [IsAuthenticated, IsAdminOrSuperAdmin]
 
     @swagger_auto_schema(
@@ -54,7 +65,7 @@ class UserView(APIView):
     )
     def get(self, request, user_id):
         try:
-            user = User.objects.get(id=user_id)
+            user = get_object(User, user_id, cached=True)
         except User.DoesNotExist:
             response = {'error': f'User with id={user_id} does not exist'}
             return Response(response, status=status.HTTP_404_NOT_FOUND)
@@ -140,8 +151,7 @@ class UserView(APIView):
         return Response({'message': f'Successfully delete user with id={user_id}'}, status.HTTP_200_OK)
 
 
-class UserCreateView(APIView):
-    authentication_classes = [TokenAuthentication]
+class UserCreateView(TimedAPIView):
     permission_classes = [IsAuthenticated, IsAdminOrSuperAdmin]
 
     @swagger_auto_schema(
@@ -185,8 +195,52 @@ class UserCreateView(APIView):
                             status=status.HTTP_400_BAD_REQUEST)
 
 
-class AccountView(APIView):
-    authentication_classes = [TokenAuthentication]
+class UserBulkImportView(TimedAPIView):
+    permission_classes = [IsAuthenticated, IsAdminOrSuperAdmin]
+
+    @swagger_auto_schema(
+        operation_summary='Import many users',
+        operation_description='Create users from uploaded CSV or NDJSON file or from users list in JSON body. '
+                              'Admin can import only clients, nothing is created if any user is invalid',
+        operation_id='Bulk Import Users',
+        manual_parameters=[IMPORT_FILE_PARAM, IMPORT_FORMAT_PARAM],
+        responses={
+            201: openapi.Response(description='Success', examples={
+                "application/json": {
+                    "created": 2,
+                }
+            }),
+            400: openapi.Response(description='Error', examples={
+                "application/json": {
+                    "errors": [{"index": 0, "errors": {"email": ["User with email=new@email.com already exist"]}}],
+                }
+            }),
+        }
+    )
+    def post(self, request):
+        uploaded_file = request.FILES.get('file')
+        if uploaded_file:
+            try:
+                rows = parse_uploaded_users(uploaded_file, request.data.get('format'))
+            except (ValueError, csv.Error) as e:
+                return Response({'error': f'File can not be parsed: {e}'}, status=status.HTTP_400_BAD_REQUEST)
+        else:
+            rows = request.data.get('users')
+
+        if not isinstance(rows, list) or not rows:
+            return Response({'error': 'Send users file or non empty users list'}, status=status.HTTP_400_BAD_REQUEST)
+
+        allowed_user_types = None if request.user.user_type == 'super_admin' else ['client']
+        users, errors = validate_users(rows, allowed_user_types)
+        if errors:
+            return Response({'errors': errors}, status=status.HTTP_400_BAD_REQUEST)
+
+        created = import_users(users)
+
+        return Response({'created': created}, status=status.HTTP_201_CREATED)
+
+
+class AccountView(TimedAPIView):
     permission_classes = [IsAuthenticated, IsOwnerOrAccessDenied]
 
     @swagger_auto_schema(
@@ -200,7 +254,7 @@ class AccountView(APIView):
     def get(self, request):
         user_id = request.user.id
 
-        user = User.objects.get(id=user_id)
+        user = get_object(User, user_id)
         serializer = UserSerializer(user)
 
         return Response(serializer.data, status=status.HTTP_200_OK)
@@ -226,7 +280,7 @@ class AccountView(APIView):
     def patch(self, request):
         user_id = request.user.id
 
-        user = User.objects.get(id=user_id)
+        user = get_object(User, user_id)
         data = request.data
         serializer = UserUpdateSerializer(user, data=data, partial=True)
 
@@ -235,3 +289,102 @@ class AccountView(APIView):
             return Response({'message': f'Successfully update user with id={user_id}'}, status=status.HTTP_200_OK)
 
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+class StatelessTokenView(TimedAPIView):
+    """
+    Base of the signed token endpoints, they answer 404 unless JWT_AUTH_ENABLED is on.
+    """
+    authentication_classes = []
+    permission_classes = [AllowAny]
+    serializer_class = None
+
+    def issue_tokens(self, request):
+        if not settings.JWT_AUTH_ENABLED:
+            return Response({'error': 'Stateless authentication is disabled'}, status=status.HTTP_404_NOT_FOUND)
+
+        serializer = self.serializer_class(data=request.data, context={'request': request})
+        try:
+            serializer.is_valid(raise_exception=True)
+        except TokenError as e:
+            return Response({'error': str(e)}, status=status.HTTP_401_UNAUTHORIZED)
+        return Response(serializer.validated_data, status=status.HTTP_200_OK)
+
+
+class StatelessTokenCreateView(StatelessTokenView):
+    serializer_class = StatelessTokenObtainSerializer
+
+    @swagger_auto_schema(
+        operation_summary='Create signed tokens',
+        operation_description='Return a short lived access token with user id, user type and company id '
+                              'and a refresh token for email and password',
+        operation_id='Create Signed Tokens',
+        request_body=StatelessTokenObtainSerializer(),
+        responses={
+            200: openapi.Response(description='Success', examples={
+                "application/json": {
+                    "refresh": "eyJhbGciOiJIUzI1NiIsInR5cCI6IkpXVCJ9...",
+                    "access": "eyJhbGciOiJIUzI1NiIsInR5cCI6IkpXVCJ9...",
+                }
+            }),
+        }
+    )
+    def post(self, request):
+        return self.issue_tokens(request)
+
+
+class StatelessTokenRefreshView(StatelessTokenView):
+    serializer_class = StatelessTokenRefreshSerializer
+
+    @swagger_auto_schema(
+        operation_summary='Refresh signed tokens',
+        operation_description='Return a new access token and a new refresh token, the sent refresh token is revoked',
+        operation_id='Refresh Signed Tokens',
+        request_body=StatelessTokenRefreshSerializer(),
+        responses={
+            200: openapi.Response(description='Success', examples={
+                "application/json": {
+                    "refresh": "eyJhbGciOiJIUzI1NiIsInR5cCI6IkpXVCJ9...",
+                    "access": "eyJhbGciOiJIUzI1NiIsInR5cCI6IkpXVCJ9...",
+                }
+            }),
+            401: openapi.Response(description='Error', examples={
+                "application/json": {
+                    "error": "Token is blacklisted",
+                }
+            }),
+        }
+    )
+    def post(self, request):
+        return self.issue_tokens(request)
+
+
+class StatelessTokenLogoutView(StatelessTokenView):
+
+    @swagger_auto_schema(
+        operation_summary='Revoke refresh token',
+        operation_description='Add the refresh token to the revocation list, access tokens stay valid until they '
+                              'expire',
+        operation_id='Revoke Refresh Token',
+        request_body=StatelessTokenRefreshSerializer(),
+        responses={
+            200: openapi.Response(description='Success', examples={
+                "application/json": {
+                    "message": "Successfully revoked refresh token",
+                }
+            }),
+        }
+    )
+    def post(self, request):
+        if not settings.JWT_AUTH_ENABLED:
+            return Response({'error': 'Stateless authentication is disabled'}, status=status.HTTP_404_NOT_FOUND)
+
+        refresh = request.data.get('refresh')
+        if not isinstance(refresh, str) or not refresh:
+            return Response({'error': 'Send refresh token'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            RefreshToken(refresh).blacklist()
+        except TokenError as e:
+            return Response({'error': str(e)}, status=status.HTTP_401_UNAUTHORIZED)
+
+        return Response({'message': 'Successfully revoked refresh token'}, status=status.HTTP_200_OK)